@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: __init__.py
+
+:Synopsis:
+    Benchmarks of the application's hot paths, run from the repository
+    root, e.g.:
+
+        python -m benchmarks.bench_persistence --output results.json
+
+    Each benchmark writes its results as JSON, and can compare them with
+    the results of an earlier run (--compare), so that a change can be
+    measured against the commit before it.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
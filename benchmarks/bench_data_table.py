@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: bench_data_table.py
+
+:Synopsis:
+    Benchmark of load_data_table(), which profiles an uploaded data file
+    and builds the dataTable describing it. Synthetic CSV and TSV files are
+    generated for each combination of the requested row counts, column
+    counts and formats. Each run profiles one file in a fresh Python
+    process, so the peak RSS of the process can be measured along with the
+    wall time. The dataTable produced is checked against the generated
+    data: number of records, measurement scales, number types, bounds and
+    missing value codes.
+
+        python -m benchmarks.bench_data_table --rows 10000 100000 \\
+            --columns 10 50 --output after.json --compare before.json
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.csv_generator import (
+    DELIMITERS, generate_table, parse_mix
+)
+
+from benchmarks.harness import (
+    print_comparison, print_results, read_results, REPO_DIR, run_info, summarize,
+    write_results
+)
+
+
+BENCHMARK = 'data_table'
+MAX_REPORTED_ERRORS = 10
+
+
+def max_rss_mb():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        max_rss /= 1024
+    return max_rss / 1024
+
+
+def expected_to_json(expected:list=None):
+    def number(value):
+        return None if value is None else float(value)
+    return [{'name': column.name, 'kind': column.kind, 'scale': column.scale,
+             'missing_value_codes': sorted(column.missing_value_codes),
+             'minimum': number(column.minimum), 'maximum': number(column.maximum)}
+            for column in expected]
+
+
+def child_content(node=None, name:str=None):
+    child = node.find_child(name) if node is not None else None
+    return child.content if child is not None else None
+
+
+def check_data_table(dt_node=None, expected:list=None, rows:int=None):
+    '''
+    Returns a list of the ways the dataTable differs from what was
+    generated.
+    '''
+    from metapype.eml2_1_1 import names
+
+    errors = []
+    if dt_node is None:
+        return ['No dataTable was created']
+    if child_content(dt_node, names.NUMBEROFRECORDS) != str(rows):
+        errors.append(f'numberOfRecords is {child_content(dt_node, names.NUMBEROFRECORDS)}, not {rows}')
+    attribute_list_node = dt_node.find_child(names.ATTRIBUTELIST)
+    attribute_nodes = attribute_list_node.find_all_children(names.ATTRIBUTE) if attribute_list_node else []
+    if len(attribute_nodes) != len(expected):
+        errors.append(f'{len(attribute_nodes)} attributes, not {len(expected)}')
+        return errors
+
+    for attribute_node, column in zip(attribute_nodes, expected):
+        name = child_content(attribute_node, names.ATTRIBUTENAME)
+        if name != column['name']:
+            errors.append(f"attribute {name} is in the place of {column['name']}")
+            continue
+        scale_node = attribute_node.find_child(names.MEASUREMENTSCALE)
+        scale = scale_node.children[0].name if scale_node and scale_node.children else None
+        if scale != column['scale']:
+            errors.append(f"{name}: measurementScale is {scale}, not {column['scale']}")
+        codes = sorted(child_content(node, names.CODE)
+                       for node in attribute_node.find_all_children(names.MISSINGVALUECODE))
+        if codes != column['missing_value_codes']:
+            errors.append(f"{name}: missing value codes are {codes}, not {column['missing_value_codes']}")
+        if scale == 'ratio':
+            number_type = child_content(scale_node.find_single_node_by_path(
+                [names.RATIO, names.NUMERICDOMAIN]), names.NUMBERTYPE)
+            expected_type = 'integer' if column['kind'] == 'int' else 'real'
+            if number_type != expected_type:
+                errors.append(f'{name}: numberType is {number_type}, not {expected_type}')
+            bounds_node = scale_node.find_single_node_by_path([names.RATIO, names.NUMERICDOMAIN, names.BOUNDS])
+            for bound in ('minimum', 'maximum'):
+                value = child_content(bounds_node, bound)
+                if column[bound] is not None and \
+                        (value is None or not math.isclose(float(value), column[bound], rel_tol=1e-9)):
+                    errors.append(f'{name}: {bound} is {value}, not {column[bound]}')
+    return errors
+
+
+def run_case(data_path:str=None, expected_path:str=None, result_path:str=None):
+    '''
+    Runs in a child process: profiles one data file and writes the wall
+    time, the peak RSS before and after, and any errors in the output.
+    '''
+    from metapype.eml2_1_1 import names
+    from metapype.model.node import Node
+    from webapp.home.load_data_table import load_data_table
+
+    with open(expected_path, 'r') as fh:
+        expected = json.load(fh)
+    eml_node = Node(names.EML)
+    dataset_node = Node(names.DATASET, parent=eml_node)
+    eml_node.add_child(dataset_node)
+
+    baseline_rss = max_rss_mb()
+    start = time.perf_counter()
+    dt_node, _ = load_data_table(dataset_node, os.path.dirname(data_path), os.path.basename(data_path))
+    seconds = time.perf_counter() - start
+    peak_rss = max_rss_mb()
+
+    result = {
+        'seconds': seconds,
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': peak_rss,
+        'errors': check_data_table(dt_node, expected['columns'], expected['rows'])
+    }
+    with open(result_path, 'w') as fh:
+        json.dump(result, fh)
+
+
+def run_child(data_path:str=None, expected_path:str=None, result_path:str=None):
+    command = [sys.executable, '-m', 'benchmarks.bench_data_table', '--run-case',
+               data_path, expected_path, result_path]
+    completed = subprocess.run(command, cwd=REPO_DIR, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise Exception(f'Profiling {os.path.basename(data_path)} failed:\n{completed.stderr}')
+    with open(result_path, 'r') as fh:
+        return json.load(fh)
+
+
+def run_benchmark(work_dir:str=None, rows_list:list=None, columns_list:list=None, formats:list=None,
+                  mix:dict=None, missing:float=0.05, repeat:int=3):
+    results = {}
+    for file_format in formats:
+        for rows in rows_list:
+            for columns in columns_list:
+                case = f'{file_format}_{rows}x{columns}'
+                data_path = f'{work_dir}/{case}.{file_format}'
+                expected = generate_table(data_path, rows, columns, mix, missing, DELIMITERS[file_format])
+                expected_path = f'{work_dir}/{case}.expected.json'
+                with open(expected_path, 'w') as fh:
+                    json.dump({'rows': rows, 'columns': expected_to_json(expected)}, fh)
+
+                runs = [run_child(data_path, expected_path, f'{work_dir}/{case}.result.json')
+                        for _ in range(repeat)]
+                stats = summarize([run['seconds'] for run in runs])
+                errors = runs[-1]['errors']
+                stats.update({
+                    'file_bytes': os.path.getsize(data_path),
+                    'peak_rss_mb': round(max(run['peak_rss_mb'] for run in runs), 1),
+                    'rss_growth_mb': round(max(run['peak_rss_mb'] - run['baseline_rss_mb'] for run in runs), 1),
+                    'correct': not errors,
+                    'errors': errors[:MAX_REPORTED_ERRORS]
+                })
+                results[case] = stats
+                os.remove(data_path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark profiling data files with load_data_table.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--columns', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--formats', nargs='+', choices=sorted(DELIMITERS), default=['csv', 'tsv'])
+    parser.add_argument('--mix', help='Weights of the column kinds, e.g. '
+                                      'int=2,float=3,bool=1,code=2,text=1,date=1')
+    parser.add_argument('--missing', type=float, default=0.05, help='Fraction of missing cells per column')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare with the results in this JSON file')
+    parser.add_argument('--run-case', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case(*args.run_case)
+        return 0
+
+    mix = parse_mix(args.mix)
+    parameters = {
+        'rows': args.rows,
+        'columns': args.columns,
+        'formats': args.formats,
+        'mix': mix,
+        'missing': args.missing,
+        'repeat': args.repeat
+    }
+    work_dir = tempfile.mkdtemp(prefix='bench_data_table_')
+    try:
+        timings = run_benchmark(work_dir, args.rows, args.columns, args.formats, mix, args.missing, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = run_info(BENCHMARK, parameters)
+    results['results'] = timings
+    print_results(results)
+    for case, stats in timings.items():
+        print(f"  {case:<32} peak RSS {stats['peak_rss_mb']} MB (+{stats['rss_growth_mb']} MB), "
+              f"{'correct' if stats['correct'] else 'INCORRECT'}")
+        for error in stats['errors']:
+            print(f'      {error}')
+    if args.output:
+        write_results(results, args.output)
+    if args.compare:
+        baseline = read_results(args.compare)
+        print_comparison(baseline, results)
+        print_comparison(baseline, results, key='peak_rss_mb', unit='MB', scale=1)
+    return 0 if all(stats['correct'] for stats in timings.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
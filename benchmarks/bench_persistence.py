@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: bench_persistence.py
+
+:Synopsis:
+    Benchmark of loading, saving, exporting and validating an EML package.
+    A synthetic document of the requested size is generated into a scratch
+    user folder and each operation is timed on it:
+
+        read_xml                read_xml_file() of the generated XML
+        export_to_xml           metapype's export.to_xml()
+        serialize_json          serialize_eml() to JSON
+        serialize_xml           serialize_eml() to XML
+        save_json               save_eml() as JSON after a one-node edit
+        save_xml                save_eml() as XML after a one-node edit,
+                                re-rendering only the edited subtree
+        save_xml_cold           save_eml() as XML of a package with no
+                                cached fragments
+        load_eml                load_eml() from the saved JSON
+        list_attributes         list_attributes() of every data table
+        validate_tree           validate_tree() of the whole tree
+        validate_tree_memoized  validate_tree() of a loaded package after a
+                                one-node edit
+
+    For example:
+
+        python -m benchmarks.bench_persistence --data-tables 10 \\
+            --attributes 100 --output after.json --compare before.json
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+from metapype.eml2_1_1 import export, names
+
+from webapp.config import Config
+
+from webapp.home.metapype_client import (
+    list_attributes, load_eml, read_xml_file, save_eml, serialize_eml, validate_tree
+)
+
+from webapp.instrumentation.metrics import count_tree_nodes
+
+from benchmarks.eml_generator import generate_eml
+
+from benchmarks.harness import (
+    print_comparison, print_results, read_results, run_info, time_operation,
+    write_results
+)
+
+
+BENCHMARK = 'persistence'
+PACKAGEID = 'bench.1.1'
+
+
+def edit_title(eml_node=None, counter=None):
+    title_node = eml_node.find_child(names.DATASET).find_child(names.TITLE)
+    title_node.content = f'Synthetic dataset, revision {next(counter)}'
+
+
+def run_benchmark(work_dir:str=None, repeat:int=5, data_tables:int=2, attributes:int=20,
+                  codes:int=10, coverages:int=5, parties:int=5):
+    user_folder = f'{work_dir}/user'
+    os.makedirs(user_folder)
+    xml_path = generate_eml(f'{work_dir}/generated.xml', data_tables=data_tables, attributes=attributes,
+                            codes=codes, coverages=coverages, parties=parties, packageid=PACKAGEID)
+    counter = itertools.count()
+    results = {}
+
+    results['read_xml'] = time_operation(lambda: read_xml_file(xml_path), repeat)
+    eml_node = read_xml_file(xml_path)
+    results['export_to_xml'] = time_operation(lambda: export.to_xml(eml_node), repeat)
+    results['serialize_json'] = time_operation(lambda: serialize_eml(eml_node, 'json'), repeat)
+    results['serialize_xml'] = time_operation(lambda: serialize_eml(eml_node, 'xml'), repeat)
+
+    def save(format):
+        save_eml(PACKAGEID, eml_node, format, user_folder)
+
+    results['save_json'] = time_operation(lambda: save('json'), repeat,
+                                          setup=lambda: edit_title(eml_node, counter))
+    results['save_xml'] = time_operation(lambda: save('xml'), repeat,
+                                         setup=lambda: edit_title(eml_node, counter))
+    # Each save is of a new package, so there are no fragments to reuse
+    cold_packageids = (f'{PACKAGEID}.cold{i}' for i in itertools.count())
+    results['save_xml_cold'] = time_operation(
+        lambda: save_eml(next(cold_packageids), eml_node, 'xml', user_folder), repeat)
+
+    results['load_eml'] = time_operation(lambda: load_eml(PACKAGEID, user_folder), repeat)
+    loaded_node = load_eml(PACKAGEID, user_folder)
+    data_table_nodes = loaded_node.find_child(names.DATASET).find_all_children(names.DATATABLE)
+    results['list_attributes'] = time_operation(
+        lambda: [list_attributes(node) for node in data_table_nodes], repeat)
+    results['validate_tree'] = time_operation(lambda: validate_tree(loaded_node), repeat)
+    validate_tree(loaded_node, PACKAGEID, user_folder)
+    results['validate_tree_memoized'] = time_operation(
+        lambda: validate_tree(loaded_node, PACKAGEID, user_folder), repeat,
+        setup=lambda: edit_title(loaded_node, counter))
+
+    document = {
+        'nodes': count_tree_nodes(eml_node),
+        'xml_bytes': os.path.getsize(f'{user_folder}/{PACKAGEID}.xml'),
+        'json_bytes': os.path.getsize(f'{user_folder}/{PACKAGEID}.json')
+    }
+    return document, results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark loading, saving, exporting and validating EML.')
+    parser.add_argument('--data-tables', type=int, default=2)
+    parser.add_argument('--attributes', type=int, default=20, help='Attributes per data table')
+    parser.add_argument('--codes', type=int, default=10, help='Code definitions per categorical attribute')
+    parser.add_argument('--coverages', type=int, default=5, help='Geographic, temporal and taxonomic coverages of each kind')
+    parser.add_argument('--parties', type=int, default=5, help='Creators, metadata providers and associated parties of each kind')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare with the results in this JSON file')
+    args = parser.parse_args()
+
+    parameters = {
+        'data_tables': args.data_tables,
+        'attributes': args.attributes,
+        'codes': args.codes,
+        'coverages': args.coverages,
+        'parties': args.parties,
+        'repeat': args.repeat,
+        'document_fsync': Config.DOCUMENT_FSYNC
+    }
+    work_dir = tempfile.mkdtemp(prefix='bench_persistence_')
+    # Keeps the benchmark's counters out of a running application's metrics
+    Config.METRICS_DIR = f'{work_dir}/metrics'
+    try:
+        document, timings = run_benchmark(work_dir, args.repeat, args.data_tables, args.attributes,
+                                          args.codes, args.coverages, args.parties)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = run_info(BENCHMARK, parameters)
+    results['document'] = document
+    results['results'] = timings
+    print_results(results)
+    print(f"  document: {document['nodes']} nodes, {document['xml_bytes']} bytes of XML, "
+          f"{document['json_bytes']} bytes of JSON")
+    if args.output:
+        write_results(results, args.output)
+    if args.compare:
+        print_comparison(read_results(args.compare), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: bench_subtree.py
+
+:Synopsis:
+    Benchmark of building the attributeList of a wide dataTable. The same
+    attribute specs, as made by load_data_table() from column profiles, are
+    built node by node with Node() and the rule-aware add_child(), which is
+    how the attributeList used to be built, and with build_subtree(). Both
+    trees are checked to be the same apart from node ids.
+
+        python -m benchmarks.bench_subtree --attributes 3000 \\
+            --output after.json --compare before.json
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import argparse
+import sys
+
+from benchmarks.harness import (
+    print_comparison, print_results, read_results, run_info, time_operation,
+    write_results
+)
+
+
+BENCHMARK = 'subtree'
+DTYPES = ('int64', 'float64', 'object', 'bool', 'datetime64[ns]')
+
+
+def column_profiles(attributes:int=None):
+    from webapp.home.load_data_table import Column_Profile
+
+    profiles = []
+    for i in range(attributes):
+        dtype = DTYPES[i % len(DTYPES)]
+        numeric = dtype in ('int64', 'float64')
+        missing_value_codes = {'NA': 'Not available'} if i % 3 == 0 else {}
+        profiles.append(Column_Profile(f'column_{i}', dtype, missing_value_codes,
+                                       0 if numeric else None, i if numeric else None))
+    return profiles
+
+
+def build_node_by_node(spec=None, parent_node=None):
+    from metapype.model.node import Node
+    from webapp.home.metapype_client import add_child
+
+    node = Node(spec.name, parent=parent_node)
+    if spec.content is not None:
+        node.content = spec.content
+    for name, value in (spec.attributes or {}).items():
+        node.add_attribute(name, value)
+    for child_spec in spec.children or ():
+        if child_spec:
+            add_child(node, build_node_by_node(child_spec, node))
+    return node
+
+
+def tree_shape(node=None):
+    return (node.name, node.content, tuple(sorted(node.attributes.items())),
+            tuple(tree_shape(child) for child in node.children))
+
+
+def count_nodes(node=None):
+    return 1 + sum(count_nodes(child) for child in node.children)
+
+
+def run_benchmark(attributes:int=None, repeat:int=5):
+    from metapype.eml2_1_1 import names
+    from webapp.home.load_data_table import attribute_spec
+    from webapp.home.metapype_client import build_subtree, Node_Spec
+
+    spec = Node_Spec(names.ATTRIBUTELIST,
+                     children=[attribute_spec(profile) for profile in column_profiles(attributes)])
+    built = build_subtree(spec)
+    if tree_shape(built) != tree_shape(build_node_by_node(spec)):
+        raise Exception('build_subtree() and add_child() built different trees')
+
+    results = {
+        'node_by_node': time_operation(lambda: build_node_by_node(spec), repeat),
+        'build_subtree': time_operation(lambda: build_subtree(spec), repeat)
+    }
+    results['build_subtree']['nodes'] = count_nodes(built)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark building an attributeList node by node and with build_subtree.')
+    parser.add_argument('--attributes', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare with the results in this JSON file')
+    args = parser.parse_args()
+
+    parameters = {
+        'attributes': args.attributes,
+        'repeat': args.repeat
+    }
+    results = run_info(BENCHMARK, parameters)
+    results['results'] = run_benchmark(args.attributes, args.repeat)
+    print_results(results)
+    timings = results['results']
+    print(f"  {timings['build_subtree']['nodes']} nodes, build_subtree is "
+          f"{timings['node_by_node']['median'] / timings['build_subtree']['median']:.1f}x faster")
+    if args.output:
+        write_results(results, args.output)
+    if args.compare:
+        print_comparison(read_results(args.compare), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: csv_generator.py
+
+:Synopsis:
+    Synthetic delimited data files for the data table benchmark, with a
+    chosen number of rows and columns and a mix of column kinds: integers,
+    reals, booleans, category codes, free text and dates. A fraction of the
+    cells in each column is left blank or set to a missing value code.
+    Along with the file, the generator returns what profiling the file
+    should find for each column, so the benchmark can check the output.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import collections
+
+import numpy as np
+import pandas as pd
+
+
+# Column kinds
+INTEGER = 'int'
+REAL = 'float'
+BOOLEAN = 'bool'
+CODE = 'code'
+TEXT = 'text'
+DATETIME = 'datetime'
+KINDS = (INTEGER, REAL, BOOLEAN, CODE, TEXT, DATETIME)
+
+DEFAULT_MIX = {INTEGER: 2, REAL: 3, BOOLEAN: 1, CODE: 2, TEXT: 1, DATETIME: 1}
+
+# dtype and measurementScale that load_data_table should find for each kind
+EXPECTED_DTYPES = {INTEGER: 'int64', REAL: 'float64', BOOLEAN: 'bool',
+                   CODE: 'object', TEXT: 'object', DATETIME: 'object'}
+EXPECTED_SCALES = {INTEGER: 'ratio', REAL: 'ratio', BOOLEAN: 'nominal',
+                   CODE: 'nominal', TEXT: 'nominal', DATETIME: 'dateTime'}
+
+# Missing value codes written into columns of each kind
+NUMERIC_MISSING_CODE = '-9999'
+STRING_MISSING_CODE = 'NA'
+
+DELIMITERS = {'csv': ',', 'tsv': '\t'}
+
+WORDS = np.array(['soil', 'water', 'carbon', 'plot', 'transect', 'canopy', 'stream', 'lake',
+                  'grassland', 'forest', 'survey', 'sample', 'station', 'annual', 'biomass'])
+
+Expected_Column = collections.namedtuple(
+    'Expected_Column',
+    ["name", "kind", "dtype", "scale", "missing_value_codes", "minimum", "maximum"],
+    rename=False)
+
+
+def parse_mix(mix:str=None):
+    '''
+    Parses a column mix such as 'int=2,float=3,date=1' into a dict of
+    weights by kind.
+    '''
+    if not mix:
+        return dict(DEFAULT_MIX)
+    weights = {}
+    for item in mix.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind == 'date':
+            kind = DATETIME
+        if kind not in KINDS:
+            raise ValueError(f'Unknown column kind: {kind}')
+        weights[kind] = int(weight or 1)
+    return weights
+
+
+def column_kinds(columns:int=10, mix:dict=None):
+    # Kinds are dealt out in proportion to their weights
+    pattern = [kind for kind, weight in (mix or DEFAULT_MIX).items() for _ in range(weight)]
+    return [pattern[i % len(pattern)] for i in range(columns)]
+
+
+def column_values(kind:str=None, rows:int=0, rng=None):
+    '''
+    Returns the column as an array of strings, with the numbers found in it
+    for numeric kinds.
+    '''
+    numbers = None
+    if kind == INTEGER:
+        numbers = rng.integers(-1000, 100000, rows)
+        values = numbers.astype(str)
+    elif kind == REAL:
+        numbers = np.round(rng.normal(50, 25, rows), 3)
+        values = np.char.mod('%.3f', numbers)
+    elif kind == BOOLEAN:
+        values = np.where(rng.random(rows) < 0.5, 'true', 'false')
+    elif kind == CODE:
+        values = np.char.add('C', rng.integers(0, 20, rows).astype(str))
+    elif kind == TEXT:
+        values = np.char.add(np.char.add(rng.choice(WORDS, rows), ' '), rng.choice(WORDS, rows))
+    else:
+        days = rng.integers(0, 365 * 30, rows)
+        dates = np.datetime64('1990-01-01') + days.astype('timedelta64[D]')
+        values = np.datetime_as_string(dates, unit='D')
+    return values.astype(object), numbers
+
+
+def generate_table(filename:str=None, rows:int=1000, columns:int=10, mix:dict=None,
+                   missing:float=0.05, delimiter:str=',', seed:int=1):
+    '''
+    Writes the data file and returns a list of Expected_Column, one per
+    column. A column with missing values gets blank cells and, except for
+    booleans, cells holding its kind's missing value code.
+    '''
+    rng = np.random.default_rng(seed)
+    data = {}
+    expected = []
+    for i, kind in enumerate(column_kinds(columns, mix)):
+        if kind == DATETIME:
+            # Profiling recognizes date columns by name
+            name = 'date' if 'date' not in data else f'datetime_{i}'
+        else:
+            name = f'{kind}_{i}'
+        values, numbers = column_values(kind, rows, rng)
+        is_missing = rng.random(rows) < missing if missing else np.zeros(rows, dtype=bool)
+        missing_value_codes = set()
+        if is_missing.any():
+            code = NUMERIC_MISSING_CODE if kind in (INTEGER, REAL) else STRING_MISSING_CODE
+            use_code = is_missing & (rng.random(rows) < 0.5)
+            if kind == BOOLEAN:
+                use_code[:] = False
+            if use_code.any():
+                values[use_code] = code
+                missing_value_codes.add(code)
+            values[is_missing & ~use_code] = ''
+        minimum = maximum = None
+        present = ~is_missing
+        if numbers is not None and present.any():
+            minimum, maximum = numbers[present].min(), numbers[present].max()
+        data[name] = values
+        expected.append(Expected_Column(name, kind, EXPECTED_DTYPES[kind], EXPECTED_SCALES[kind],
+                                        missing_value_codes, minimum, maximum))
+    pd.DataFrame(data).to_csv(filename, sep=delimiter, index=False)
+    return expected
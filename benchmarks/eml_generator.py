@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: eml_generator.py
+
+:Synopsis:
+    Synthetic EML 2.1.1 documents of a chosen size: numbers of data tables,
+    attributes per table, code definitions per categorical attribute,
+    coverages and responsible parties. Elements are in schema order and
+    the content is drawn from a seeded generator, so the same parameters
+    always give the same document.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import random
+from xml.etree import ElementTree
+
+
+EML_NAMESPACE = 'eml://ecoinformatics.org/eml-2.1.1'
+XSI_NAMESPACE = 'http://www.w3.org/2001/XMLSchema-instance'
+
+WORDS = ('soil', 'water', 'carbon', 'nitrogen', 'plot', 'transect', 'biomass', 'canopy',
+         'temperature', 'precipitation', 'stream', 'lake', 'grassland', 'forest', 'survey',
+         'sample', 'station', 'annual', 'monthly', 'long-term', 'ecological', 'research')
+
+UNITS = ('meter', 'kilogram', 'celsius', 'milligramPerLiter', 'dimensionless', 'second')
+
+# Attribute kinds, in the proportions they are generated
+NOMINAL = 'nominal'
+RATIO = 'ratio'
+DATETIME = 'dateTime'
+TEXT = 'text'
+ATTRIBUTE_KINDS = (NOMINAL, RATIO, RATIO, DATETIME, TEXT)
+
+
+class EML_Generator(object):
+
+    def __init__(self, data_tables:int=2, attributes:int=20, codes:int=10, coverages:int=5,
+                 parties:int=5, packageid:str='bench.1.1', seed:int=1):
+        self.data_tables = data_tables
+        self.attributes = attributes
+        self.codes = codes
+        self.coverages = coverages
+        self.parties = parties
+        self.packageid = packageid
+        self.random = random.Random(seed)
+
+    def words(self, n:int=5):
+        return ' '.join(self.random.choice(WORDS) for _ in range(n))
+
+    def child(self, parent=None, name:str=None, text:str=None, **attributes):
+        element = ElementTree.SubElement(parent, name, attributes)
+        if text is not None:
+            element.text = text
+        return element
+
+    def party(self, parent=None, name:str=None, i:int=0):
+        party = self.child(parent, name)
+        individual = self.child(party, 'individualName')
+        self.child(individual, 'givenName', f'Given{i}')
+        self.child(individual, 'surName', f'Surname{i}')
+        self.child(party, 'organizationName', f'{self.words(2).title()} Institute')
+        address = self.child(party, 'address')
+        self.child(address, 'deliveryPoint', f'{i + 1} Research Way')
+        self.child(address, 'city', 'Albuquerque')
+        self.child(address, 'country', 'USA')
+        self.child(party, 'electronicMailAddress', f'person{i}@example.org')
+        return party
+
+    def coverage(self, parent=None):
+        coverage = self.child(parent, 'coverage')
+        for i in range(self.coverages):
+            geographic = self.child(coverage, 'geographicCoverage')
+            self.child(geographic, 'geographicDescription', f'Site {i}: {self.words(6)}')
+            bounds = self.child(geographic, 'boundingCoordinates')
+            west = round(self.random.uniform(-120, -70), 4)
+            south = round(self.random.uniform(25, 45), 4)
+            self.child(bounds, 'westBoundingCoordinate', str(west))
+            self.child(bounds, 'eastBoundingCoordinate', str(round(west + 0.5, 4)))
+            self.child(bounds, 'northBoundingCoordinate', str(round(south + 0.5, 4)))
+            self.child(bounds, 'southBoundingCoordinate', str(south))
+        for i in range(self.coverages):
+            temporal = self.child(coverage, 'temporalCoverage')
+            date_range = self.child(temporal, 'rangeOfDates')
+            self.child(self.child(date_range, 'beginDate'), 'calendarDate', f'{1990 + i}-01-01')
+            self.child(self.child(date_range, 'endDate'), 'calendarDate', f'{1991 + i}-12-31')
+        taxonomic = self.child(coverage, 'taxonomicCoverage')
+        for i in range(self.coverages):
+            classification = self.child(taxonomic, 'taxonomicClassification')
+            self.child(classification, 'taxonRankName', 'Genus')
+            self.child(classification, 'taxonRankValue', f'Genus{i}')
+            species = self.child(classification, 'taxonomicClassification')
+            self.child(species, 'taxonRankName', 'Species')
+            self.child(species, 'taxonRankValue', f'Genus{i} species{i}')
+        return coverage
+
+    def attribute(self, parent=None, i:int=0):
+        kind = ATTRIBUTE_KINDS[i % len(ATTRIBUTE_KINDS)]
+        attribute = self.child(parent, 'attribute')
+        self.child(attribute, 'attributeName', f'{kind}_{i}')
+        self.child(attribute, 'attributeDefinition', self.words(8))
+        scale = self.child(attribute, 'measurementScale')
+        if kind == NOMINAL:
+            domain = self.child(self.child(scale, 'nominal'), 'nonNumericDomain')
+            enumerated = self.child(domain, 'enumeratedDomain')
+            for j in range(self.codes):
+                code_definition = self.child(enumerated, 'codeDefinition')
+                self.child(code_definition, 'code', f'C{j}')
+                self.child(code_definition, 'definition', self.words(4))
+        elif kind == RATIO:
+            ratio = self.child(scale, 'ratio')
+            self.child(self.child(ratio, 'unit'), 'standardUnit', self.random.choice(UNITS))
+            self.child(ratio, 'precision', '0.01')
+            numeric = self.child(ratio, 'numericDomain')
+            self.child(numeric, 'numberType', 'real')
+        elif kind == DATETIME:
+            date_time = self.child(scale, 'dateTime')
+            self.child(date_time, 'formatString', 'YYYY-MM-DD')
+            self.child(date_time, 'dateTimePrecision', '1')
+        else:
+            text_domain = self.child(self.child(self.child(scale, 'nominal'), 'nonNumericDomain'), 'textDomain')
+            self.child(text_domain, 'definition', self.words(3))
+        self.child(self.child(attribute, 'missingValueCode'), 'code', 'NA')
+        return attribute
+
+    def data_table(self, parent=None, i:int=0):
+        data_table = self.child(parent, 'dataTable')
+        self.child(data_table, 'entityName', f'table_{i}.csv')
+        self.child(data_table, 'entityDescription', self.words(10))
+        physical = self.child(data_table, 'physical')
+        self.child(physical, 'objectName', f'table_{i}.csv')
+        self.child(physical, 'size', str(self.random.randint(1000, 10 ** 8)), unit='byte')
+        text_format = self.child(self.child(physical, 'dataFormat'), 'textFormat')
+        self.child(text_format, 'numHeaderLines', '1')
+        self.child(text_format, 'recordDelimiter', '\\n')
+        self.child(text_format, 'attributeOrientation', 'column')
+        simple = self.child(text_format, 'simpleDelimited')
+        self.child(simple, 'fieldDelimiter', ',')
+        attribute_list = self.child(data_table, 'attributeList')
+        for j in range(self.attributes):
+            self.attribute(attribute_list, j)
+        self.child(data_table, 'numberOfRecords', str(self.random.randint(100, 10 ** 6)))
+        return data_table
+
+    def element(self):
+        ElementTree.register_namespace('eml', EML_NAMESPACE)
+        ElementTree.register_namespace('xsi', XSI_NAMESPACE)
+        eml = ElementTree.Element(f'{{{EML_NAMESPACE}}}eml', {
+            'packageId': self.packageid,
+            'system': 'https://pasta.edirepository.org',
+            f'{{{XSI_NAMESPACE}}}schemaLocation': f'{EML_NAMESPACE} eml.xsd'
+        })
+        access = self.child(eml, 'access', authSystem='https://pasta.edirepository.org/authentication',
+                            order='allowFirst', scope='document', system='https://pasta.edirepository.org')
+        allow = self.child(access, 'allow')
+        self.child(allow, 'principal', 'public')
+        self.child(allow, 'permission', 'read')
+
+        dataset = self.child(eml, 'dataset')
+        self.child(dataset, 'title', f'Synthetic dataset: {self.words(8)}')
+        for i in range(max(1, self.parties)):
+            self.party(dataset, 'creator', i)
+        for i in range(self.parties):
+            self.party(dataset, 'metadataProvider', self.parties + i)
+        for i in range(self.parties):
+            party = self.party(dataset, 'associatedParty', 2 * self.parties + i)
+            self.child(party, 'role', 'Field technician')
+        self.child(dataset, 'pubDate', '2018')
+        self.child(self.child(dataset, 'abstract'), 'para', self.words(60))
+        keyword_set = self.child(dataset, 'keywordSet')
+        for word in WORDS[:10]:
+            self.child(keyword_set, 'keyword', word)
+        self.child(self.child(dataset, 'intellectualRights'), 'para', 'This data package is released to the public domain.')
+        if self.coverages:
+            self.coverage(dataset)
+        self.party(dataset, 'contact', 3 * self.parties)
+        methods = self.child(dataset, 'methods')
+        for i in range(3):
+            self.child(self.child(self.child(methods, 'methodStep'), 'description'), 'para', self.words(20))
+        for i in range(self.data_tables):
+            self.data_table(dataset, i)
+        return eml
+
+    def write(self, filename:str=None):
+        tree = ElementTree.ElementTree(self.element())
+        tree.write(filename, encoding='utf-8', xml_declaration=True)
+        return filename
+
+
+def generate_eml(filename:str=None, **parameters):
+    '''
+    Writes a synthetic EML document to filename; parameters are those of
+    EML_Generator.
+    '''
+    return EML_Generator(**parameters).write(filename)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: harness.py
+
+:Synopsis:
+    Timing, result files and comparisons shared by the benchmarks. A result
+    file records the commit, Python version and parameters of the run along
+    with the statistics for each measured operation, so runs on different
+    commits can be compared.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ratio of medians beyond which compare_results() flags a change
+DEFAULT_THRESHOLD = 0.10
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_info(benchmark:str=None, parameters:dict=None):
+    return {
+        'benchmark': benchmark,
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': parameters or {}
+    }
+
+
+def summarize(seconds:list=None):
+    return {
+        'repeat': len(seconds),
+        'min': min(seconds),
+        'median': statistics.median(seconds),
+        'mean': statistics.mean(seconds),
+        'stdev': statistics.stdev(seconds) if len(seconds) > 1 else 0.0
+    }
+
+
+def time_operation(operation=None, repeat:int=5, warmup:int=1, setup=None):
+    '''
+    Times operation() repeat times after warmup untimed calls and returns
+    the summary statistics in seconds. setup(), if given, is called before
+    each call and is not timed. Garbage collection is held off while an
+    operation is being timed.
+    '''
+    seconds = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            operation()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        if i >= warmup:
+            seconds.append(elapsed)
+    return summarize(seconds)
+
+
+def write_results(results:dict=None, filename:str=None):
+    with open(filename, 'w') as fh:
+        json.dump(results, fh, indent=2)
+
+
+def read_results(filename:str=None):
+    with open(filename, 'r') as fh:
+        return json.load(fh)
+
+
+def compare_results(baseline:dict=None, results:dict=None, key:str='median',
+                    threshold:float=DEFAULT_THRESHOLD):
+    '''
+    Returns (operation, baseline value, value, ratio, flag) for each
+    operation in both result sets, where flag is 'slower' or 'faster' if
+    the ratio is beyond the threshold.
+    '''
+    rows = []
+    for operation, stats in results['results'].items():
+        old_stats = baseline['results'].get(operation)
+        if not old_stats or key not in old_stats or key not in stats or not old_stats[key]:
+            continue
+        ratio = stats[key] / old_stats[key]
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'slower'
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        rows.append((operation, old_stats[key], stats[key], ratio, flag))
+    return rows
+
+
+def print_results(results:dict=None, key:str='median', unit:str='ms', scale:float=1000):
+    print(f"{results['benchmark']} at {results['commit']} (Python {results['python']})")
+    for operation, stats in results['results'].items():
+        if key in stats:
+            print(f'  {operation:<32} {stats[key] * scale:12.3f} {unit}')
+
+
+def print_comparison(baseline:dict=None, results:dict=None, key:str='median',
+                     threshold:float=DEFAULT_THRESHOLD, unit:str='ms', scale:float=1000):
+    if baseline.get('parameters') != results.get('parameters'):
+        print('Warning: the runs were made with different parameters', file=sys.stderr)
+    print(f"{key} vs {baseline['benchmark']} at {baseline['commit']}")
+    for operation, old, new, ratio, flag in compare_results(baseline, results, key, threshold):
+        print(f'  {operation:<32} {old * scale:12.3f} -> {new * scale:12.3f} {unit} '
+              f'{ratio:6.2f}x {flag}')
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: load_generator.py
+
+:Synopsis:
+    Load test of a running server by virtual users replaying scripted
+    editing sessions. Each virtual user logs in (against the PASTA stub,
+    see pasta_stub.py) and repeatedly:
+
+        creates a package
+        sets its title
+        adds creators and moves one of them up
+        loads a generated data table
+        edits a few of its attributes and moves one of them up
+        downloads the package's EML
+
+    Pages are fetched and forms submitted as a browser would, with the
+    CSRF token and field values taken from each page. Redirects are not
+    followed automatically, so each request is timed on its own. Latency
+    percentiles and throughput are reported per route, e.g.
+
+        python -m benchmarks.load_generator http://127.0.0.1:5000 \\
+            --users 20 --sessions 5 --start-stub 8088 --output load.json
+
+    The server must be configured to authenticate against the stub.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import argparse
+import collections
+import html.parser
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from benchmarks.csv_generator import generate_table
+
+from benchmarks.harness import (
+    print_comparison, read_results, run_info, write_results
+)
+
+from benchmarks.pasta_stub import start_stub
+
+
+BENCHMARK = 'load'
+PERCENTILES = (50, 90, 95, 99)
+
+# Values of the buttons on list pages that are not a move up
+LIST_BUTTON_VALUES = ('Edit', 'Remove', '[  ]')
+
+Request_Record = collections.namedtuple(
+    'Request_Record',
+    ["route", "seconds", "status", "ok"],
+    rename=False)
+
+
+class Form_Parser(html.parser.HTMLParser):
+    '''
+    Collects the fields of the forms on a page: the values a browser would
+    submit, and the submit buttons as (name, value) pairs.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.fields = {}
+        self.buttons = []
+        self._select = None
+        self._select_value = None
+        self._option = None
+        self._textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        name = attrs.get('name')
+        if tag == 'input' and name:
+            input_type = attrs.get('type', 'text').lower()
+            if input_type == 'submit':
+                self.buttons.append((name, attrs.get('value', '')))
+            elif input_type in ('checkbox', 'radio'):
+                if 'checked' in attrs:
+                    self.fields[name] = attrs.get('value', 'y')
+            elif input_type != 'file':
+                self.fields[name] = attrs.get('value', '')
+        elif tag == 'select' and name:
+            self._select = name
+            self._select_value = None
+        elif tag == 'option' and self._select:
+            value = attrs.get('value')
+            if self._select_value is None or 'selected' in attrs:
+                self._select_value = value
+            self._option = value is None
+        elif tag == 'textarea' and name:
+            self._textarea = name
+            self.fields[name] = ''
+
+    def handle_data(self, data):
+        if self._textarea:
+            self.fields[self._textarea] += data
+        elif self._option and self._select and self._select_value is None:
+            self._select_value = data.strip()
+
+    def handle_endtag(self, tag):
+        if tag == 'select' and self._select:
+            self.fields[self._select] = self._select_value or ''
+            self._select = None
+        elif tag == 'option':
+            self._option = None
+        elif tag == 'textarea':
+            self._textarea = None
+
+
+def parse_form(page:str=None):
+    parser = Form_Parser()
+    parser.feed(page)
+    return parser.fields, parser.buttons
+
+
+def list_entries(buttons:list=None):
+    '''
+    Groups the buttons of a list page (creators, attributes) by node id,
+    in page order, as node id -> list of button values.
+    '''
+    entries = collections.OrderedDict()
+    for name, value in buttons:
+        entries.setdefault(name, []).append(value)
+    return collections.OrderedDict((name, values) for name, values in entries.items() if 'Edit' in values)
+
+
+def up_button(entries:dict=None, index:int=1):
+    # The first button of an entry moves it up, unless it is the first entry
+    items = list(entries.items())
+    if len(items) > index:
+        node_id, values = items[index]
+        if values[0] not in LIST_BUTTON_VALUES:
+            return node_id, values[0]
+    return None, None
+
+
+class Session_Error(Exception):
+    pass
+
+
+class Virtual_User(object):
+
+    def __init__(self, base_url:str=None, index:int=0, data_file:str=None, options=None, records:list=None):
+        self.base_url = base_url.rstrip('/')
+        self.index = index
+        self.data_file = data_file
+        self.options = options
+        self.records = records
+        self.http = requests.Session()
+        self.random = random.Random(index)
+
+    def url(self, path:str=None):
+        return urljoin(self.base_url + '/', path.lstrip('/'))
+
+    def request(self, route:str=None, method:str='GET', path:str=None, expect=(200,), **kwargs):
+        start = time.perf_counter()
+        status = None
+        response = None
+        try:
+            response = self.http.request(method, self.url(path), allow_redirects=False,
+                                         timeout=self.options.timeout, **kwargs)
+            # Read the whole body, as a browser would
+            response.content
+            status = response.status_code
+        except requests.RequestException:
+            pass
+        seconds = time.perf_counter() - start
+        ok = status in expect
+        self.records.append(Request_Record(f'{method} {route}', seconds, status, ok))
+        if not ok:
+            raise Session_Error(f'{method} {path} returned {status}')
+        return response
+
+    def get_form(self, route:str=None, path:str=None):
+        response = self.request(route, 'GET', path)
+        return parse_form(response.text)
+
+    def submit(self, route:str=None, path:str=None, fields:dict=None, button:tuple=None, files:dict=None):
+        data = dict(fields)
+        if button:
+            data[button[0]] = button[1]
+        response = self.request(route, 'POST', path, expect=(302, 303), data=data, files=files)
+        return urlparse(response.headers.get('Location', '')).path
+
+    def login(self):
+        fields, _ = self.get_form('login', '/eml/auth/login')
+        fields.update({'username': f'loadtest{self.index}', 'password': 'loadtest', 'domain': 'edi'})
+        self.submit('login', '/eml/auth/login', fields)
+
+    def run_session(self, iteration:int=0):
+        packageid = f'loadtest.{self.index}.{iteration}'
+
+        fields, _ = self.get_form('create', '/eml/create')
+        fields['packageid'] = packageid
+        self.submit('create', '/eml/create', fields, ('Next', 'Next'))
+
+        path = f'/eml/title/{packageid}'
+        fields, _ = self.get_form('title', path)
+        fields['title'] = f'Load test package {packageid} of virtual user {self.index}'
+        self.submit('title', path, fields, ('Next', 'Next'))
+
+        for i in range(self.options.creators):
+            path = f'/eml/creator/{packageid}/1'
+            fields, _ = self.get_form('creator', path)
+            fields.update({'gn': f'Given{i}', 'sn': f'Surname{i}', 'organization': 'Load Test Institute',
+                           'email': f'user{self.index}.{i}@example.org'})
+            self.submit('creator', path, fields)
+        path = f'/eml/creator_select/{packageid}'
+        fields, buttons = self.get_form('creator_select', path)
+        node_id, value = up_button(list_entries(buttons))
+        if node_id:
+            self.submit('creator_reorder', path, fields, (node_id, value))
+
+        fields, _ = self.get_form('load_data', '/eml/load_data')
+        fields.update({'temporal_coverage': 'dataset', 'geographic_coverage': 'none'})
+        with open(self.data_file, 'rb') as fh:
+            location = self.submit('load_data', '/eml/load_data', fields,
+                                   files={'file': (os.path.basename(self.data_file), fh, 'text/csv')})
+        dt_node_id = location.rstrip('/').rsplit('/', 1)[-1]
+        self.request('data_table', 'GET', location)
+
+        select_path = f'/eml/attribute_select/{packageid}/{dt_node_id}'
+        fields, buttons = self.get_form('attribute_select', select_path)
+        attributes = list(list_entries(buttons))
+        for node_id in self.random.sample(attributes, min(self.options.attribute_edits, len(attributes))):
+            attribute_path = self.submit('attribute_select', select_path, fields, (node_id, 'Edit'))
+            route = attribute_path.split('/')[2]
+            attribute_fields, _ = self.get_form(route, attribute_path)
+            attribute_fields['attribute_definition'] = f'Edited by virtual user {self.index} at {time.time()}'
+            self.submit(route, attribute_path, attribute_fields, ('Back', 'Back'))
+            fields, buttons = self.get_form('attribute_select', select_path)
+        node_id, value = up_button(list_entries(buttons), self.random.randrange(1, max(2, len(attributes))))
+        if node_id:
+            self.submit('attribute_reorder', select_path, fields, (node_id, value))
+
+        self.request('download', 'GET', '/eml/download_current')
+
+    def run(self, sessions:int=1, deadline:float=None, errors:list=None):
+        try:
+            self.login()
+        except Session_Error as e:
+            errors.append(f'user {self.index}: {e}')
+            return
+        for iteration in range(sessions):
+            if deadline and time.monotonic() > deadline:
+                break
+            try:
+                self.run_session(iteration)
+            except Session_Error as e:
+                errors.append(f'user {self.index}, session {iteration}: {e}')
+            if self.options.think_time:
+                time.sleep(self.random.uniform(0, 2 * self.options.think_time))
+
+
+def percentile(sorted_values:list=None, p:float=50):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize_records(records:list=None, elapsed:float=None):
+    by_route = collections.OrderedDict()
+    for record in sorted(records, key=lambda record: record.route):
+        by_route.setdefault(record.route, []).append(record)
+    results = collections.OrderedDict()
+    for route, route_records in by_route.items():
+        seconds = sorted(record.seconds for record in route_records)
+        stats = {
+            'count': len(route_records),
+            'errors': sum(1 for record in route_records if not record.ok),
+            'throughput': len(route_records) / elapsed if elapsed else None,
+            'mean': statistics.mean(seconds),
+            'median': percentile(seconds, 50),
+            'max': seconds[-1]
+        }
+        for p in PERCENTILES:
+            stats[f'p{p}'] = percentile(seconds, p)
+        results[route] = stats
+    return results
+
+
+def run_load(base_url:str=None, options=None):
+    work_dir = tempfile.mkdtemp(prefix='load_generator_')
+    data_file = f'{work_dir}/loadtest.csv'
+    generate_table(data_file, options.rows, options.columns)
+
+    records = []
+    errors = []
+    users = [Virtual_User(base_url, i, data_file, options, records) for i in range(options.users)]
+    deadline = time.monotonic() + options.duration if options.duration else None
+    threads = []
+    start = time.perf_counter()
+    for user in users:
+        thread = threading.Thread(target=user.run, args=(options.sessions, deadline, errors), daemon=True)
+        thread.start()
+        threads.append(thread)
+        if options.ramp_up:
+            time.sleep(options.ramp_up / options.users)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    os.remove(data_file)
+    os.rmdir(work_dir)
+    return records, errors, elapsed
+
+
+def print_load_results(results:dict=None, totals:dict=None):
+    print(f"{results['benchmark']} at {results['commit']}: {totals['requests']} requests "
+          f"in {totals['elapsed']:.1f} s, {totals['throughput']:.1f} requests/s, "
+          f"{totals['sessions']} sessions, {totals['errors']} errors")
+    print(f"  {'route':<28} {'count':>6} {'errors':>6} {'req/s':>7} "
+          + ' '.join(f'{f"p{p} ms":>9}' for p in PERCENTILES) + f" {'max ms':>9}")
+    for route, stats in results['results'].items():
+        print(f"  {route:<28} {stats['count']:>6} {stats['errors']:>6} {stats['throughput']:>7.2f} "
+              + ' '.join(f"{stats[f'p{p}'] * 1000:>9.1f}" for p in PERCENTILES)
+              + f" {stats['max'] * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replay scripted editing sessions against a running server.')
+    parser.add_argument('base_url', nargs='?', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--sessions', type=int, default=3, help='Editing sessions per user')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Stop starting new sessions after this many seconds')
+    parser.add_argument('--ramp-up', type=float, default=0, help='Seconds over which the users start')
+    parser.add_argument('--think-time', type=float, default=0,
+                        help='Mean pause in seconds between a user\'s sessions')
+    parser.add_argument('--creators', type=int, default=3)
+    parser.add_argument('--attribute-edits', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=1000, help='Rows of the loaded data table')
+    parser.add_argument('--columns', type=int, default=10, help='Columns of the loaded data table')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--start-stub', type=int, metavar='PORT',
+                        help='Also serve the PASTA stub on this port')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Compare with the results in this JSON file')
+    args = parser.parse_args()
+
+    if args.start_stub:
+        start_stub(args.start_stub)
+
+    records, errors, elapsed = run_load(args.base_url, args)
+    parameters = {name: value for name, value in vars(args).items()
+                  if name not in ('output', 'compare', 'start_stub')}
+    results = run_info(BENCHMARK, parameters)
+    results['results'] = summarize_records(records, elapsed)
+    totals = {
+        'requests': len(records),
+        'errors': sum(1 for record in records if not record.ok),
+        'sessions': sum(1 for record in records if record.route == 'GET download' and record.ok),
+        'elapsed': elapsed,
+        'throughput': len(records) / elapsed if elapsed else 0
+    }
+    results['totals'] = totals
+    results['session_errors'] = errors[:100]
+
+    print_load_results(results, totals)
+    for error in errors[:10]:
+        print(f'  {error}')
+    if args.output:
+        write_results(results, args.output)
+    if args.compare:
+        print_comparison(read_results(args.compare), results, key='p95')
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: pasta_stub.py
+
+:Synopsis:
+    A local stand-in for the PASTA authentication service, for load tests
+    against a development server. It accepts any user with a non-empty
+    password and answers with an auth-token cookie in PASTA's format, from
+    which the application takes the user's distinguished name. Point the
+    development server at it in webapp/config.py, e.g.
+
+        PASTA_URL = 'http://127.0.0.1:8088/package'
+
+    and run it with:
+
+        python -m benchmarks.pasta_stub --port 8088
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import argparse
+import base64
+import http.server
+import os
+import sys
+import threading
+import time
+
+import daiquiri
+
+
+logger = daiquiri.getLogger('pasta_stub: ' + __name__)
+
+DEFAULT_PORT = 8088
+AUTH_SYSTEM = 'https://pasta.edirepository.org/authentication'
+TOKEN_LIFETIME = 24 * 60 * 60
+
+
+def make_auth_token(user_dn:str=None, now:float=None):
+    # <base64 of dn*system*expiry*groups>-<base64 signature>
+    if now is None:
+        now = time.time()
+    expiry = int((now + TOKEN_LIFETIME) * 1000)
+    token = f'{user_dn}*{AUTH_SYSTEM}*{expiry}*authenticated'
+    signature = base64.b64encode(os.urandom(32)).decode('ascii')
+    return base64.b64encode(token.encode('utf-8')).decode('ascii') + '-' + signature
+
+
+def parse_basic_auth(header:str=None):
+    if not header or not header.startswith('Basic '):
+        return None, None
+    try:
+        user_dn, _, password = base64.b64decode(header[len('Basic '):]).decode('utf-8').partition(':')
+    except Exception:
+        return None, None
+    return user_dn, password
+
+
+class PASTA_Stub_Handler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        user_dn, password = parse_basic_auth(self.headers.get('Authorization'))
+        if not user_dn or not password:
+            self.send_response(401)
+            self.send_header('WWW-Authenticate', 'Basic realm="PASTA"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Set-Cookie', f'auth-token={make_auth_token(user_dn)}; Path=/')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # One line per login would swamp a load test's output
+        pass
+
+
+def start_stub(port:int=DEFAULT_PORT, host:str='127.0.0.1'):
+    '''
+    Serves the stub from a daemon thread and returns the server.
+    '''
+    server = http.server.ThreadingHTTPServer((host, port), PASTA_Stub_Handler)
+    thread = threading.Thread(target=server.serve_forever, name='pasta-stub', daemon=True)
+    thread.start()
+    logger.info(f'PASTA stub listening on http://{host}:{port}/package')
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for PASTA authentication.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    server = http.server.ThreadingHTTPServer((args.host, args.port), PASTA_Stub_Handler)
+    print(f'PASTA stub listening on http://{args.host}:{args.port}/package')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: __init__.py
+
+:Synopsis:
+    Tests of the application, run from the repository root with:
+
+        python -m pytest tests
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
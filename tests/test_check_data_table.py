@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_check_data_table.py
+
+:Synopsis:
+    Checks that a data file is found congruent with the data table that
+    load_data_table() made from it, whatever the chunk size, and that
+    the checker reports each kind of mismatch once the file is changed.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from metapype.eml2_1_1 import names
+from metapype.model.node import Node
+
+from webapp.config import Config
+
+from webapp.home.check_data_table import (
+    check_data_table, format_string_to_strptime, BOUNDS, COLUMN_COUNT, COLUMN_NAME,
+    NUMBER_OF_RECORDS, NUMBER_TYPE, SIZE
+)
+from webapp.home.load_data_table import load_data_table
+
+
+SAMPLES = ('site,depth,nitrate\n'
+           'a,12,0.5\n'
+           'b,-9999,NA\n'
+           'c,3,1.25\n'
+           'd,7,0.75\n')
+
+
+@pytest.fixture
+def dataset_node(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    eml_node = Node(names.EML)
+    dataset_node = Node(names.DATASET, parent=eml_node)
+    eml_node.add_child(dataset_node)
+    return dataset_node
+
+
+def described_file(tmp_path, dataset_node:Node=None, data_file:str='samples.csv', content:str=SAMPLES):
+    path = tmp_path / data_file
+    path.write_text(content)
+    dt_node, _ = load_data_table(dataset_node, str(tmp_path), data_file)
+    return dt_node, str(path)
+
+
+def checks(mismatches:list=None):
+    return sorted((mismatch.attribute, mismatch.check) for mismatch in mismatches)
+
+
+@pytest.mark.parametrize('chunksize', [1, 3, 100000])
+def test_profiled_file_is_congruent(tmp_path, dataset_node, chunksize):
+    dt_node, path = described_file(tmp_path, dataset_node)
+    assert check_data_table(dt_node, path, chunksize) == []
+
+
+def test_parquet_file_is_congruent(tmp_path, dataset_node):
+    pq.write_table(pa.table({'count': [4, None, 9], 'mass': [1.5, 0.25, None]}),
+                   str(tmp_path / 'samples.parquet'))
+    dt_node, _ = load_data_table(dataset_node, str(tmp_path), 'samples.parquet')
+    assert check_data_table(dt_node, str(tmp_path / 'samples.parquet'), 2) == []
+
+
+def test_changed_file_is_reported(tmp_path, dataset_node):
+    dt_node, path = described_file(tmp_path, dataset_node)
+    with open(path, 'a') as fh:
+        fh.write('e,2.5,9.5\n')
+    assert checks(check_data_table(dt_node, path, 2)) == [
+        ('', NUMBER_OF_RECORDS),
+        ('', SIZE),
+        ('depth', BOUNDS),
+        ('depth', NUMBER_TYPE),
+        ('nitrate', BOUNDS)
+    ]
+
+
+def test_changed_columns_are_reported(tmp_path, dataset_node):
+    dt_node, path = described_file(tmp_path, dataset_node)
+    with open(path, 'w') as fh:
+        fh.write('station,depth\na,12\nb,-9999\nc,3\nd,7\n')
+    assert checks(check_data_table(dt_node, path)) == [
+        ('', COLUMN_COUNT),
+        ('', SIZE),
+        ('site', COLUMN_NAME)
+    ]
+
+
+def test_format_string_to_strptime():
+    assert format_string_to_strptime('YYYY-MM-DDThh:mm:ss') == '%Y-%m-%dT%H:%M:%S'
+    assert format_string_to_strptime('DD/MMM/YY') == '%d/%b/%y'
+    # Day of year has no translation, so the check is skipped
+    assert format_string_to_strptime('YYYY-DDD') is None
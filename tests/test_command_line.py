@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_command_line.py
+
+:Synopsis:
+    Checks that the command-line tools run without building the web
+    application, which would import its views, in a fresh interpreter as
+    they are run.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import json
+import os
+import subprocess
+import sys
+
+from webapp.config import Config
+
+from webapp.home.metapype_client import read_xml_file, save_eml
+
+from benchmarks.eml_generator import generate_eml
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=REPO_DIR, capture_output=True, text=True)
+
+
+def imported(module:str=None, *names):
+    result = run_python('-c', f'import sys, {module}; print([name in sys.modules for name in {names!r}])')
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1].lower())
+
+
+def test_validate_store_imports_no_flask():
+    assert imported('webapp.home.validate_store', 'flask', 'webapp.home.views') == [False, False]
+
+
+def test_check_data_table_does_not_build_application():
+    assert imported('webapp.home.check_data_table', 'webapp.home.views') == [False]
+
+
+def test_validate_store_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    user_folder = tmp_path / 'user-data' / 'a-user'
+    user_folder.mkdir(parents=True)
+    xml_path = generate_eml(str(tmp_path / 'generated.xml'), data_tables=1, attributes=2,
+                            packageid='test.1.1')
+    save_eml('test.1.1', read_xml_file(xml_path), 'json', str(user_folder))
+
+    summary_filename = str(tmp_path / 'summary.json')
+    result = run_python('-m', 'webapp.home.validate_store', str(tmp_path / 'user-data'),
+                        '--processes', '1', '--json', summary_filename)
+    assert result.returncode in (0, 1), result.stderr
+    with open(summary_filename, 'r') as fh:
+        summary = json.load(fh)
+    assert summary['packages'] == 1
+    assert summary['results'][0]['packageid'] == 'test.1.1'
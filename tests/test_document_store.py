@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_document_store.py
+
+:Synopsis:
+    Checks that atomic_write() keeps the permissions of the document it
+    replaces and gives new documents the umask's default, and that a tree
+    remembers the version of the JSON file it was read from even if the
+    file is replaced while it is being parsed. Also checks that saves skip
+    writing unchanged content whether or not fragments are cached, and
+    that a lock file left by a process that has exited doesn't block saves
+    while a lock held by a live process does.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+from metapype.model import mp_io
+
+from webapp.config import Config
+
+from webapp.home.document_lock import (
+    document_lock, get_lock_filename, Document_Lock_Timeout, Stale_Document_Error
+)
+from webapp.home.document_store import atomic_write, file_stamp, write_document
+from webapp.home.metapype_client import (
+    get_eml_filename, load_eml, read_xml_file, save_eml
+)
+
+from webapp.instrumentation import metrics
+
+from benchmarks.eml_generator import generate_eml
+
+
+PACKAGEID = 'test.1.1'
+
+
+def mode(filename):
+    return stat.S_IMODE(os.stat(filename).st_mode)
+
+
+def test_new_file_gets_umask_default(tmp_path):
+    filename = str(tmp_path / 'new.json')
+    umask = os.umask(0)
+    os.umask(umask)
+    atomic_write(filename, ('{}',))
+    assert mode(filename) == 0o666 & ~umask
+
+
+def test_replaced_file_keeps_its_mode(tmp_path):
+    filename = str(tmp_path / 'existing.json')
+    with open(filename, 'w') as fh:
+        fh.write('{}')
+    os.chmod(filename, 0o640)
+    atomic_write(filename, ('{"a": 1}',))
+    assert mode(filename) == 0o640
+    with open(filename) as fh:
+        assert fh.read() == '{"a": 1}'
+
+
+def test_save_after_concurrent_replace_is_stale(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    user_folder = str(tmp_path)
+    xml_path = generate_eml(str(tmp_path / 'generated.xml'), data_tables=1, attributes=2,
+                            packageid=PACKAGEID)
+    save_eml(PACKAGEID, read_xml_file(xml_path), 'json', user_folder)
+    json_filename = get_eml_filename(PACKAGEID, 'json', user_folder)
+    with open(json_filename, 'r') as fh:
+        json_str = fh.read()
+
+    from_json = mp_io.from_json
+
+    def from_json_during_save(*args, **kwargs):
+        # Another worker saves the package after the file has been read
+        write_document(json_filename, (json_str + ' ',))
+        return from_json(*args, **kwargs)
+
+    monkeypatch.setattr(mp_io, 'from_json', from_json_during_save)
+    eml_node = load_eml(PACKAGEID, user_folder)
+    monkeypatch.setattr(mp_io, 'from_json', from_json)
+
+    with pytest.raises(Stale_Document_Error):
+        save_eml(PACKAGEID, eml_node, 'json', user_folder)
+
+
+def lookups(cache:str=None):
+    return sum(value for (name, labels), value in metrics._values.items()
+               if name == 'cache_requests_total' and ('cache', cache) in labels)
+
+
+def test_unchanged_xml_is_not_rewritten_without_fragments(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    user_folder = str(tmp_path)
+    xml_path = generate_eml(str(tmp_path / 'generated.xml'), data_tables=1, attributes=2,
+                            packageid=PACKAGEID)
+    # Never loaded or saved as JSON, so no fragments are cached for it
+    eml_node = read_xml_file(xml_path)
+    xml_filename = get_eml_filename(PACKAGEID, 'xml', user_folder)
+    save_eml(PACKAGEID, eml_node, 'xml', user_folder)
+    stamp = file_stamp(xml_filename)
+    save_eml(PACKAGEID, eml_node, 'xml', user_folder)
+    assert file_stamp(xml_filename) == stamp
+
+
+def test_json_save_does_not_look_up_fragments(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    xml_path = generate_eml(str(tmp_path / 'generated.xml'), data_tables=1, attributes=2,
+                            packageid=PACKAGEID)
+    before = lookups('xml_fragments')
+    save_eml(PACKAGEID, read_xml_file(xml_path), 'json', str(tmp_path))
+    assert lookups('xml_fragments') == before
+
+
+# Locks the package's lock file in another process, then either exits
+# without removing it or holds it until its input is closed
+LOCK_HOLDER = """
+import fcntl, os, sys
+fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT, 0o644)
+fcntl.flock(fd, fcntl.LOCK_EX)
+print('locked', flush=True)
+if sys.argv[2] == 'hold':
+    sys.stdin.read()
+"""
+
+
+def lock_in_other_process(lock_filename:str=None, hold:bool=False):
+    process = subprocess.Popen([sys.executable, '-c', LOCK_HOLDER, lock_filename, 'hold' if hold else 'exit'],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    assert process.stdout.readline().strip() == 'locked'
+    return process
+
+
+def test_lock_left_by_exited_process_is_not_held(tmp_path):
+    lock_filename = get_lock_filename(PACKAGEID, str(tmp_path))
+    lock_in_other_process(lock_filename).wait()
+    assert os.path.exists(lock_filename)
+    with document_lock(PACKAGEID, str(tmp_path), timeout=1):
+        # Reentrant within the thread
+        with document_lock(PACKAGEID, str(tmp_path), timeout=0):
+            pass
+
+
+def test_lock_held_by_live_process_times_out(tmp_path):
+    process = lock_in_other_process(get_lock_filename(PACKAGEID, str(tmp_path)), hold=True)
+    try:
+        with pytest.raises(Document_Lock_Timeout):
+            with document_lock(PACKAGEID, str(tmp_path), timeout=0.2):
+                pass
+    finally:
+        process.stdin.close()
+        process.wait()
+    with document_lock(PACKAGEID, str(tmp_path), timeout=1):
+        pass
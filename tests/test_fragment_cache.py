@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_fragment_cache.py
+
+:Synopsis:
+    Checks that the XML saved from cached fragments after an edit is the
+    same as the XML rendered from scratch, and that only the edited
+    subtrees are rendered again.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import pytest
+
+from metapype.eml2_1_1 import names
+from metapype.model.node import Node
+
+from webapp.config import Config
+
+from webapp.home.fragment_cache import get_fragments
+from webapp.home.metapype_client import (
+    get_eml_filename, load_eml, read_xml_file, save_eml
+)
+from webapp.home.xml_writer import iter_eml
+
+from benchmarks.eml_generator import generate_eml
+
+
+PACKAGEID = 'test.1.1'
+
+
+@pytest.fixture
+def user_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    folder = tmp_path / 'user'
+    folder.mkdir()
+    xml_path = generate_eml(str(tmp_path / 'generated.xml'), data_tables=3, attributes=10,
+                            packageid=PACKAGEID)
+    eml_node = read_xml_file(xml_path)
+    save_eml(PACKAGEID, eml_node, 'json', str(folder))
+    return str(folder)
+
+
+def save_both(eml_node:Node=None, user_folder:str=None):
+    save_eml(PACKAGEID, eml_node, 'json', user_folder)
+    save_eml(PACKAGEID, eml_node, 'xml', user_folder)
+    with open(get_eml_filename(PACKAGEID, 'xml', user_folder), 'r') as fh:
+        return fh.read()
+
+
+def data_tables(eml_node:Node=None):
+    return eml_node.find_child(names.DATASET).find_all_children(names.DATATABLE)
+
+
+def test_edits_are_rendered(user_folder):
+    eml_node = load_eml(PACKAGEID, user_folder)
+    # Fills the cache
+    save_both(eml_node, user_folder)
+
+    # Each kind of edit is made in a different data table, so that one
+    # edit cannot make the subtree of another render again
+    attribute_lists = [node.find_child(names.ATTRIBUTELIST) for node in data_tables(eml_node)]
+    definition_node = attribute_lists[0].children[0].find_child(names.ATTRIBUTEDEFINITION)
+    definition_node.content = 'An edited definition'
+    attribute_lists[1].children[0].add_attribute('id', 'edited-attribute')
+    removed_node = attribute_lists[2].children[-1]
+    attribute_lists[2].remove_child(removed_node)
+
+    xml = save_both(eml_node, user_folder)
+    assert xml == ''.join(iter_eml(eml_node))
+    assert 'An edited definition' in xml
+    assert 'id="edited-attribute"' in xml
+    assert len(attribute_lists[2].children) == 9
+
+    # And again from a tree loaded from the saved JSON
+    loaded_node = load_eml(PACKAGEID, user_folder)
+    assert save_both(loaded_node, user_folder) == xml
+
+
+def test_only_edited_subtrees_are_rendered(user_folder):
+    eml_node = load_eml(PACKAGEID, user_folder)
+    save_both(eml_node, user_folder)
+    json_filename = get_eml_filename(PACKAGEID, 'json', user_folder)
+
+    edited_node, unchanged_node = data_tables(eml_node)[:2]
+    edited_node.find_child(names.ENTITYNAME).content = 'edited_table'
+
+    fragments = get_fragments(eml_node, PACKAGEID, json_filename)
+    assert fragments.get(unchanged_node.id) is not None
+    assert fragments.get(edited_node.id) is None
+    assert fragments.get(eml_node.id) is None
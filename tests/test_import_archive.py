@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_import_archive.py
+
+:Synopsis:
+    Checks that importing a zip archive reports a result for every XML
+    member: documents are imported, or skipped if their packageId is
+    already taken, and malformed documents and unusable packageIds fail
+    without stopping the rest of the import. Archives over the member or
+    size limits are refused before anything is imported.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import os
+import zipfile
+
+import pytest
+
+from webapp.auth import user_data
+from webapp.config import Config
+
+from webapp.home import import_archive as import_archive_module
+from webapp.home.import_archive import (
+    import_archive, FAILED, IMPORTED, REPLACED, SKIPPED
+)
+from webapp.home.metapype_client import get_eml_filename
+
+from benchmarks.eml_generator import generate_eml
+
+
+@pytest.fixture
+def user_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    monkeypatch.setattr(Config, 'IMPORT_ARCHIVE_WORKERS', 2)
+    folder = tmp_path / 'user'
+    folder.mkdir()
+    monkeypatch.setattr(user_data, 'get_user_folder_name', lambda: str(folder))
+    monkeypatch.setattr(import_archive_module, 'get_user_folder_name', lambda: str(folder))
+    return str(folder)
+
+
+def eml_xml(tmp_path, packageid:str=None):
+    path = generate_eml(str(tmp_path / 'generated.xml'), data_tables=1, attributes=2,
+                        packageid=packageid)
+    with open(path, 'r') as fh:
+        return fh.read()
+
+
+def make_archive(tmp_path, members:dict=None):
+    archive_path = str(tmp_path / 'archive.zip')
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return archive_path
+
+
+def run_import(tmp_path, archive_path:str=None, overwrite:bool=False):
+    scratch_dir = tmp_path / 'scratch'
+    scratch_dir.mkdir(exist_ok=True)
+    results = import_archive(archive_path, str(scratch_dir), overwrite)
+    return [(result.filename, result.packageid, result.status) for result in results]
+
+
+def test_import_reports_every_member(tmp_path, user_folder):
+    archive_path = make_archive(tmp_path, {
+        'a/first.xml': eml_xml(tmp_path, 'test.1.1'),
+        'a/readme.txt': 'Not EML',
+        '__MACOSX/a/._first.xml': 'Resource fork',
+        'b/second.xml': eml_xml(tmp_path, 'test.2.1'),
+        'b/again.xml': eml_xml(tmp_path, 'test.1.1'),
+        '../../escape.xml': eml_xml(tmp_path, '..'),
+        'broken.xml': '<eml:eml xmlns:eml="eml://ecoinformatics.org/eml-2.1.1"><dataset>'
+    })
+    results = run_import(tmp_path, archive_path)
+    assert results == [
+        ('a/first.xml', 'test.1.1', IMPORTED),
+        ('b/second.xml', 'test.2.1', IMPORTED),
+        ('b/again.xml', 'test.1.1', SKIPPED),
+        ('../../escape.xml', '..', FAILED),
+        ('broken.xml', None, FAILED)
+    ]
+    for packageid in ('test.1.1', 'test.2.1'):
+        assert os.path.isfile(get_eml_filename(packageid, 'json', user_folder))
+        assert os.path.isfile(get_eml_filename(packageid, 'xml', user_folder))
+    # Members are extracted under numbered names inside the scratch directory
+    assert not os.path.exists(tmp_path.parent / 'escape.xml')
+    assert sorted(os.listdir(tmp_path / 'scratch')) == [
+        '00000_first.xml', '00001_second.xml', '00002_again.xml', '00003_escape.xml', '00004_broken.xml']
+
+
+def test_existing_documents_are_kept_unless_overwritten(tmp_path, user_folder):
+    archive_path = make_archive(tmp_path, {'first.xml': eml_xml(tmp_path, 'test.1.1')})
+    assert run_import(tmp_path, archive_path) == [('first.xml', 'test.1.1', IMPORTED)]
+    assert run_import(tmp_path, archive_path) == [('first.xml', 'test.1.1', SKIPPED)]
+    assert run_import(tmp_path, archive_path, overwrite=True) == [('first.xml', 'test.1.1', REPLACED)]
+
+
+@pytest.mark.parametrize('limit, value, match', [
+    ('MAX_IMPORT_ARCHIVE_FILES', 1, 'at most 1 can be imported'),
+    ('MAX_IMPORT_ARCHIVE_BYTES', 1000, 'expands to more than 1000 bytes')
+])
+def test_archive_over_limit_is_refused(tmp_path, user_folder, monkeypatch, limit, value, match):
+    monkeypatch.setattr(Config, limit, value)
+    archive_path = make_archive(tmp_path, {
+        'first.xml': eml_xml(tmp_path, 'test.1.1'),
+        'second.xml': eml_xml(tmp_path, 'test.2.1')
+    })
+    with pytest.raises(Exception, match=match):
+        run_import(tmp_path, archive_path)
+    assert not os.path.exists(get_eml_filename('test.1.1', 'json', user_folder))
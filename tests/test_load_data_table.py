@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_load_data_table.py
+
+:Synopsis:
+    Checks the data tables, missing value codes and coverage that
+    load_data_table() derives from uploaded CSV, TSV, Parquet and Feather
+    files.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import datetime
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from metapype.eml2_1_1 import names
+from metapype.model.node import Node
+
+from webapp.home.load_data_table import load_data_table
+
+
+@pytest.fixture
+def dataset_node():
+    eml_node = Node(names.EML)
+    dataset_node = Node(names.DATASET, parent=eml_node)
+    eml_node.add_child(dataset_node)
+    return dataset_node
+
+
+def bounding_boxes(parent_node:Node=None):
+    boxes = []
+    coverage_node = parent_node.find_child(names.COVERAGE)
+    if coverage_node:
+        for gc_node in coverage_node.find_all_children(names.GEOGRAPHICCOVERAGE):
+            bc_node = gc_node.find_child(names.BOUNDINGCOORDINATES)
+            boxes.append(tuple(float(bc_node.find_child(name).content) for name in (
+                names.WESTBOUNDINGCOORDINATE, names.EASTBOUNDINGCOORDINATE,
+                names.NORTHBOUNDINGCOORDINATE, names.SOUTHBOUNDINGCOORDINATE)))
+    return boxes
+
+
+def test_feather_coordinates(tmp_path, dataset_node):
+    table = pa.table({
+        'site': ['a', 'b', 'b', 'c'],
+        'lat': [40.5, 41.25, 41.25, None],
+        'lon': [-105.0, -104.5, -104.5, -106.75],
+        'value': [1.0, 2.0, 3.0, 4.0]
+    })
+    feather.write_feather(table, str(tmp_path / 'stations.feather'))
+
+    dt_node, messages = load_data_table(dataset_node, str(tmp_path), 'stations.feather',
+                                        geographic_coverage='entity', stations=True)
+    boxes = bounding_boxes(dt_node)
+    # The bounding box, then one point per distinct complete station
+    assert boxes[0] == (-106.75, -104.5, 41.25, 40.5)
+    assert sorted(boxes[1:]) == [(-105.0, -105.0, 40.5, 40.5), (-104.5, -104.5, 41.25, 41.25)]
+    assert messages == []
+
+
+def temporal_range_of(parent_node:Node=None):
+    tc_node = parent_node.find_child(names.COVERAGE).find_child(names.TEMPORALCOVERAGE)
+    return tuple(tc_node.find_single_node_by_path([names.RANGEOFDATES, end, names.CALENDARDATE]).content
+                 for end in (names.BEGINDATE, names.ENDDATE))
+
+
+@pytest.mark.parametrize('dates', [
+    pa.array([datetime.date(2020, 3, 1), None, datetime.date(2019, 12, 31)]),
+    pa.array(['2020-03-01', '', '2019-12-31'])
+])
+@pytest.mark.parametrize('data_file, write', [
+    ('observations.feather', feather.write_feather),
+    ('observations.parquet', pq.write_table)
+])
+def test_arrow_temporal_coverage(tmp_path, dataset_node, dates, data_file, write):
+    write(pa.table({'date': dates, 'value': [1, 2, 3]}), str(tmp_path / data_file))
+    dt_node, messages = load_data_table(dataset_node, str(tmp_path), data_file,
+                                        temporal_coverage='entity')
+    assert temporal_range_of(dt_node) == ('2019-12-31', '2020-03-01')
+    assert messages == []
+
+
+def test_missing_coverage_is_reported(tmp_path, dataset_node):
+    with open(tmp_path / 'counts.csv', 'w') as fh:
+        fh.write('site,count\na,1\nb,2\n')
+    dt_node, messages = load_data_table(dataset_node, str(tmp_path), 'counts.csv',
+                                        temporal_coverage='dataset', geographic_coverage='entity')
+    assert dataset_node.find_child(names.COVERAGE) is None
+    assert len(messages) == 2
+    assert 'no temporal coverage' in messages[0]
+    assert 'no geographic coverage' in messages[1]
+
+
+def attribute_names(dt_node:Node=None):
+    return [attribute_node.find_child(names.ATTRIBUTENAME).content
+            for attribute_node in dt_node.find_child(names.ATTRIBUTELIST).find_all_children(names.ATTRIBUTE)]
+
+
+def test_tsv_is_split_on_tabs(tmp_path, dataset_node):
+    with open(tmp_path / 'counts.tsv', 'w') as fh:
+        fh.write('site\tcount\tnote\na\t1\tfirst, dry\nb\t2\tsecond\n')
+    dt_node, _ = load_data_table(dataset_node, str(tmp_path), 'counts.tsv')
+    assert attribute_names(dt_node) == ['site', 'count', 'note']
+    assert dt_node.find_child(names.NUMBEROFRECORDS).content == '2'
+
+
+def attribute_node_named(dt_node:Node=None, name:str=None):
+    for attribute_node in dt_node.find_child(names.ATTRIBUTELIST).find_all_children(names.ATTRIBUTE):
+        if attribute_node.find_child(names.ATTRIBUTENAME).content == name:
+            return attribute_node
+
+
+def missing_value_codes_of(attribute_node:Node=None):
+    return {mvc_node.find_child(names.CODE).content: mvc_node.find_child(names.CODEEXPLANATION).content
+            for mvc_node in attribute_node.find_all_children(names.MISSINGVALUECODE)}
+
+
+def numeric_domain_of(attribute_node:Node=None):
+    numeric_domain_node = attribute_node.find_single_node_by_path(
+        [names.MEASUREMENTSCALE, names.RATIO, names.NUMERICDOMAIN])
+    bounds_node = numeric_domain_node.find_child(names.BOUNDS)
+    return (numeric_domain_node.find_child(names.NUMBERTYPE).content,
+            float(bounds_node.find_child(names.MINIMUM).content),
+            float(bounds_node.find_child(names.MAXIMUM).content))
+
+
+def test_missing_value_codes(tmp_path, dataset_node):
+    with open(tmp_path / 'samples.csv', 'w') as fh:
+        fh.write('site,depth,nitrate,flag\n'
+                 'a,12,0.5,NA\n'
+                 'b,-9999,,NA\n'
+                 'c,3, NaN ,NA\n'
+                 'd,7,1.25,\n')
+    dt_node, _ = load_data_table(dataset_node, str(tmp_path), 'samples.csv')
+
+    # Codes and blank cells are left out when the type and bounds are inferred
+    depth_node = attribute_node_named(dt_node, 'depth')
+    assert missing_value_codes_of(depth_node) == {'-9999': 'Missing value'}
+    assert numeric_domain_of(depth_node) == ('integer', 3, 12)
+    nitrate_node = attribute_node_named(dt_node, 'nitrate')
+    assert missing_value_codes_of(nitrate_node) == {'NaN': 'Not a number'}
+    assert numeric_domain_of(nitrate_node) == ('real', 0.5, 1.25)
+    # Blank cells are missing but are not a code
+    assert missing_value_codes_of(attribute_node_named(dt_node, 'site')) == {}
+    # A column with nothing but missing values is still described
+    flag_node = attribute_node_named(dt_node, 'flag')
+    assert missing_value_codes_of(flag_node) == {'NA': 'Not available'}
+    assert flag_node.find_single_node_by_path([names.MEASUREMENTSCALE, names.NOMINAL]) is not None
+
+
+def scale_of(attribute_node:Node=None):
+    return attribute_node.find_child(names.MEASUREMENTSCALE).children[0].name
+
+
+def test_parquet_profile_from_footer(tmp_path, dataset_node):
+    table = pa.table({
+        'count': pa.array([4, 9, None, 2, None, None], pa.int32()),
+        'mass': [1.5, 0.25, 3.0, 2.0, None, 8.5],
+        'present': [True, False, True, True, False, None],
+        'species': ['a', 'b', 'c', 'd', 'e', 'f']
+    })
+    # Bounds are combined across row groups; the last one has no counts
+    pq.write_table(table, str(tmp_path / 'samples.parquet'), row_group_size=2)
+
+    dt_node, _ = load_data_table(dataset_node, str(tmp_path), 'samples.parquet')
+    assert dt_node.find_child(names.NUMBEROFRECORDS).content == '6'
+    assert dt_node.find_single_node_by_path([names.PHYSICAL, names.DATAFORMAT,
+                                             names.EXTERNALLYDEFINEDFORMAT,
+                                             names.FORMATNAME]).content == 'Apache Parquet'
+    assert numeric_domain_of(attribute_node_named(dt_node, 'count')) == ('integer', 2, 9)
+    assert numeric_domain_of(attribute_node_named(dt_node, 'mass')) == ('real', 0.25, 8.5)
+    assert scale_of(attribute_node_named(dt_node, 'present')) == names.NOMINAL
+    assert scale_of(attribute_node_named(dt_node, 'species')) == names.NOMINAL
+
+
+def test_feather_profile(tmp_path, dataset_node):
+    table = pa.table({'count': [4, 9, 2, 7, 1], 'species': ['a', 'b', 'c', 'd', 'e']})
+    feather.write_feather(table, str(tmp_path / 'samples.feather'), chunksize=2)
+
+    dt_node, _ = load_data_table(dataset_node, str(tmp_path), 'samples.feather')
+    assert dt_node.find_child(names.NUMBEROFRECORDS).content == '5'
+    assert dt_node.find_single_node_by_path([names.PHYSICAL, names.DATAFORMAT,
+                                             names.EXTERNALLYDEFINEDFORMAT,
+                                             names.FORMATNAME]).content == 'Apache Arrow IPC'
+    assert attribute_names(dt_node) == ['count', 'species']
+    assert attribute_node_named(dt_node, 'count').find_single_node_by_path(
+        [names.MEASUREMENTSCALE, names.RATIO, names.NUMERICDOMAIN, names.NUMBERTYPE]).content == 'integer'
+
+
+@pytest.mark.parametrize('data_file, write', [
+    ('broken.parquet', pq.write_table),
+    ('broken.feather', feather.write_feather)
+])
+def test_truncated_arrow_file_is_rejected(tmp_path, dataset_node, data_file, write):
+    path = tmp_path / data_file
+    write(pa.table({'count': list(range(1000))}), str(path))
+    # Cut off the footer
+    with open(path, 'r+b') as fh:
+        fh.truncate(path.stat().st_size - 16)
+
+    with pytest.raises(Exception):
+        load_data_table(dataset_node, str(tmp_path), data_file)
+    # Nothing is added for a file that can't be read
+    assert dataset_node.find_child(names.DATATABLE) is None
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_memory.py
+
+:Synopsis:
+    Checks that the memory accounting tells the trees in the node store
+    that are still in use from those only the store refers to, counts the
+    nodes removed from a tree apart, follows the data frames read by
+    load_data_table only while they are alive, and reports all of it as
+    gauges labelled with the worker.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import contextlib
+import os
+
+import pandas as pd
+import pytest
+
+from metapype.eml2_1_1 import names
+from metapype.model.node import Node
+
+from webapp.config import Config
+
+from webapp.instrumentation import metrics
+from webapp.instrumentation.memory import (
+    data_frame_stats, memory_snapshot, node_store_stats, record_memory,
+    track_data_frame, DETACHED, IN_USE, UNREFERENCED
+)
+
+
+@pytest.fixture
+def node_store(monkeypatch):
+    store = {}
+    monkeypatch.setattr(Node, 'store', store, raising=False)
+    # Newer metapype registers nodes in a scoped store rather than Node.store
+    scope = Node.store_scope(store, clear_on_exit=False) if hasattr(Node, 'store_scope') \
+        else contextlib.nullcontext()
+    with scope:
+        yield store
+
+
+def new_tree(children:int=None):
+    root = Node(names.DATASET)
+    for _ in range(children):
+        child = Node(names.TITLE, parent=root)
+        root.add_child(child)
+    return root
+
+
+def test_trees_in_use_and_unreferenced(node_store):
+    in_use = new_tree(children=2)
+    new_tree(children=3)
+    # Removed from the tree, but not from the store
+    detached = in_use.children[1]
+    in_use.remove_child(detached)
+    del detached
+
+    stats = node_store_stats(sample=100)
+    assert stats['entries'] == 7
+    assert stats['trees'] == {IN_USE: 1, UNREFERENCED: 1, DETACHED: 0}
+    assert stats['nodes'] == {IN_USE: 2, UNREFERENCED: 4, DETACHED: 1}
+    assert stats['bytes'] > 0
+    assert in_use.name == names.DATASET
+
+
+def test_data_frames_are_followed_while_alive():
+    before = data_frame_stats()
+    data_frame = pd.DataFrame({'site': ['a', 'b', 'c'], 'count': [1, 2, 3]})
+    track_data_frame(data_frame)
+    stats = data_frame_stats()
+    assert stats['retained'] == before['retained'] + 1
+    assert stats['bytes'] > before['bytes']
+    del data_frame
+    assert data_frame_stats() == before
+
+
+def test_snapshot_is_recorded_per_worker(tmp_path, monkeypatch, node_store):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    tree = new_tree(children=2)
+    record_memory(memory_snapshot())
+    worker = str(os.getpid())
+    assert metrics._values[metrics._key('node_store_entries', {'worker': worker})] == 3
+    assert metrics._values[metrics._key('node_trees', {'worker': worker, 'state': IN_USE})] == 1
+    assert metrics._values[metrics._key('memory_accounting_seconds', {'worker': worker})] >= 0
+    assert tree.children
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_metrics.py
+
+:Synopsis:
+    Checks that the metrics of all workers are added up, leaving out the
+    gauges of workers that have exited and dropping their files once they
+    are past retention; that histograms and cache hit ratios are rendered
+    in the Prometheus text format; and that /eml/metrics is only served to
+    the configured addresses.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import json
+import os
+import subprocess
+import time
+
+import pytest
+
+from webapp.config import Config
+
+from webapp.instrumentation import metrics
+from webapp.instrumentation.metrics import (
+    _key, collect, get_metrics_filename, observe, render_metrics, PREFIX
+)
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    os.makedirs(Config.METRICS_DIR)
+    return Config.METRICS_DIR
+
+
+def exited_pid():
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return process.pid
+
+
+def write_worker_file(pid:int=None, entries:list=None, age:float=0):
+    filename = get_metrics_filename(pid)
+    with open(filename, 'w') as fh:
+        json.dump(entries, fh)
+    mtime = time.time() - age
+    os.utime(filename, (mtime, mtime))
+    return filename
+
+
+def test_workers_are_added_up(metrics_dir):
+    endpoint = {'endpoint': 'test_workers_are_added_up', 'status': '200'}
+    resident = {'worker': 'exited'}
+    entries = [['requests_total', endpoint, 3], ['worker_resident_bytes', resident, 1000]]
+    exited_file = write_worker_file(exited_pid(), entries)
+    write_worker_file(exited_pid(), [['requests_total', endpoint, 2]],
+                      age=Config.METRICS_RETENTION + 60)
+    metrics.inc('requests_total', **endpoint)
+
+    totals = collect()
+    # This worker's own request, and the counters of the exited worker
+    assert totals[_key('requests_total', endpoint)] == 4
+    assert _key('worker_resident_bytes', resident) not in totals
+    # Past retention, the file of an exited worker is removed
+    assert sorted(os.listdir(metrics_dir)) == sorted([os.path.basename(exited_file),
+                                                      os.path.basename(get_metrics_filename(os.getpid()))])
+
+
+def test_render_metrics():
+    values = {
+        _key('cache_requests_total', {'cache': 'validation', 'result': 'hit'}): 3,
+        _key('cache_requests_total', {'cache': 'validation', 'result': 'miss'}): 1,
+        _key('tree_nodes', {}): [1, 2, 0, 0, 0, 0, 1, 1234.0]
+    }
+    lines = render_metrics(values).splitlines()
+    assert f'# TYPE {PREFIX}tree_nodes histogram' in lines
+    assert f'{PREFIX}tree_nodes_bucket{{le="10.0"}} 1' in lines
+    assert f'{PREFIX}tree_nodes_bucket{{le="100.0"}} 3' in lines
+    assert f'{PREFIX}tree_nodes_bucket{{le="+Inf"}} 4' in lines
+    assert f'{PREFIX}tree_nodes_count 4' in lines
+    assert f'{PREFIX}tree_nodes_sum 1234.0' in lines
+    assert f'{PREFIX}cache_hit_ratio{{cache="validation"}} 0.75' in lines
+
+
+def test_endpoint_is_only_served_to_allowed_addresses(metrics_dir):
+    from webapp import app
+
+    observe('tree_nodes', 50)
+    client = app.test_client()
+    response = client.get('/eml/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    assert f'{PREFIX}tree_nodes_count' in response.get_data(as_text=True)
+    response = client.get('/eml/metrics', environ_base={'REMOTE_ADDR': '192.0.2.1'})
+    assert response.status_code == 404
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_profiling.py
+
+:Synopsis:
+    Checks that a request is profiled only when profiling is enabled and
+    the request carries the configured token, that the number of profiles
+    per window is limited, and that the oldest dumps beyond the limit are
+    removed.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import os
+
+import pytest
+
+from webapp.config import Config
+
+from webapp.instrumentation.profiling import (
+    list_dumps, remove_old_dumps, PROFILE_FILE_HEADER, PROFILE_SUFFIX,
+    PROFILE_TOKEN_HEADER, SUMMARY_SUFFIX
+)
+
+
+TOKEN = 'test-token'
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from webapp import app
+
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    monkeypatch.setattr(Config, 'PROFILING_ENABLED', True)
+    monkeypatch.setattr(Config, 'PROFILING_TOKEN', TOKEN)
+    monkeypatch.setattr(Config, 'PROFILING_DIR', str(tmp_path / 'profiles'))
+    monkeypatch.setattr(Config, 'PROFILING_MAX_PER_WINDOW', 5)
+    return app.test_client()
+
+
+def get_metrics(client=None, token:str=None):
+    headers = {PROFILE_TOKEN_HEADER: token} if token else {}
+    return client.get('/eml/metrics', headers=headers, environ_base={'REMOTE_ADDR': '127.0.0.1'})
+
+
+def test_request_with_token_is_profiled(client):
+    response = get_metrics(client, TOKEN)
+    assert response.status_code == 200
+    dump_filename = response.headers[PROFILE_FILE_HEADER]
+    assert dump_filename.endswith(PROFILE_SUFFIX)
+    path = f'{Config.PROFILING_DIR}/{dump_filename}'
+    assert os.path.isfile(path)
+    with open(path[:-len(PROFILE_SUFFIX)] + SUMMARY_SUFFIX, 'r') as fh:
+        assert fh.readline().startswith('GET /eml/metrics 200 OK in ')
+
+
+@pytest.mark.parametrize('enabled, token', [
+    (True, None),
+    (True, 'wrong-token'),
+    (False, TOKEN)
+])
+def test_request_is_not_profiled(client, monkeypatch, enabled, token):
+    monkeypatch.setattr(Config, 'PROFILING_ENABLED', enabled)
+    response = get_metrics(client, token)
+    assert response.status_code == 200
+    assert PROFILE_FILE_HEADER not in response.headers
+    assert list_dumps(Config.PROFILING_DIR) == []
+
+
+def test_profiles_are_rate_limited(client, monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILING_MAX_PER_WINDOW', 1)
+    assert PROFILE_FILE_HEADER in get_metrics(client, TOKEN).headers
+    assert PROFILE_FILE_HEADER not in get_metrics(client, TOKEN).headers
+    assert len(list_dumps(Config.PROFILING_DIR)) == 1
+
+
+def test_oldest_dumps_are_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILING_MAX_FILES', 2)
+    for i in range(4):
+        for suffix in (PROFILE_SUFFIX, SUMMARY_SUFFIX):
+            path = tmp_path / f'dump{i}{suffix}'
+            path.write_text('')
+            os.utime(path, (1000 + i, 1000 + i))
+    remove_old_dumps(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['dump2.prof', 'dump2.txt', 'dump3.prof', 'dump3.txt']
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_read_xml_file.py
+
+:Synopsis:
+    Checks that the streaming parser, read_xml_file(), builds the same
+    trees as mp_io.from_xml() on a hand-written document with mixed
+    content, comments and namespaced attributes, and on a generated one,
+    and that malformed documents and oversized uploads are refused.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import pytest
+
+from metapype.model import mp_io
+
+from webapp.home.metapype_client import read_xml_file
+from webapp.home.views import upload_within_limit, MULTIPART_OVERHEAD_BYTES
+
+from benchmarks.eml_generator import generate_eml
+
+
+SAMPLE = '''<?xml version="1.0" encoding="UTF-8"?>
+<eml:eml xmlns:eml="eml://ecoinformatics.org/eml-2.1.1"
+         xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+         xsi:schemaLocation="eml://ecoinformatics.org/eml-2.1.1 eml.xsd"
+         packageId="edi.1.1" system="https://pasta.edirepository.org">
+    <!-- A comment between elements -->
+    <dataset>
+        <title>
+            Nitrogen in  soils
+        </title>
+        <creator id="creator-1">
+            <individualName>
+                <givenName>Jane</givenName>
+                <surName>Doe</surName>
+            </individualName>
+        </creator>
+        <abstract>
+            <para>Samples were taken <emphasis>twice</emphasis> a year, in spring and fall.</para>
+            <para>Units are mg/kg &amp; &lt;1 means below detection.</para>
+        </abstract>
+        <keywordSet>
+            <keyword keywordType="theme">nitrogen</keyword>
+            <keyword/>
+        </keywordSet>
+    </dataset>
+</eml:eml>
+'''
+
+
+def outline(node=None):
+    # Content is compared stripped, and an empty content as none
+    content = (node.content or '').strip() or None
+    return (node.name, dict(node.attributes), content,
+            [outline(child) for child in node.children])
+
+
+def assert_same_tree(filename:str=None):
+    with open(filename, 'r') as fh:
+        xml = fh.read()
+    assert outline(read_xml_file(filename)) == outline(mp_io.from_xml(xml))
+
+
+def test_sample_document(tmp_path):
+    filename = tmp_path / 'sample.xml'
+    filename.write_text(SAMPLE)
+    assert_same_tree(str(filename))
+
+
+def test_generated_document(tmp_path):
+    filename = generate_eml(str(tmp_path / 'generated.xml'), data_tables=2, attributes=10,
+                            packageid='test.1.1')
+    assert_same_tree(filename)
+
+
+def test_size_limit(tmp_path):
+    filename = tmp_path / 'sample.xml'
+    filename.write_text(SAMPLE)
+    with pytest.raises(Exception, match='exceeds the limit'):
+        read_xml_file(str(filename), max_bytes=100)
+
+
+@pytest.mark.parametrize('xml', [
+    SAMPLE[:SAMPLE.index('</dataset>')],
+    SAMPLE.replace('</title>', '</titel>'),
+    ''
+])
+def test_malformed_document(tmp_path, xml):
+    filename = tmp_path / 'malformed.xml'
+    filename.write_text(xml)
+    with pytest.raises(Exception, match='Error parsing XML'):
+        read_xml_file(str(filename))
+
+
+@pytest.mark.parametrize('content_length, within_limit', [
+    (1000, True),
+    (1000 + MULTIPART_OVERHEAD_BYTES, True),
+    (1001 + MULTIPART_OVERHEAD_BYTES, False),
+    (None, False)
+])
+def test_upload_size_is_checked_before_reading(content_length, within_limit):
+    from webapp import app
+
+    if content_length is None:
+        # A chunked request doesn't declare its size
+        context = app.test_request_context('/eml/load_metadata', method='POST', data=b'x',
+                                           headers={'Transfer-Encoding': 'chunked'})
+    else:
+        context = app.test_request_context('/eml/load_metadata', method='POST', data=b'x' * content_length)
+    with context:
+        assert upload_within_limit(1000) == within_limit
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_retained_data.py
+
+:Synopsis:
+    Checks that retained data files are evicted least recently used first
+    to keep within the quota, that using a retained file keeps it, and
+    that a file larger than the quota is not retained.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import os
+
+import pytest
+
+from webapp.config import Config
+
+from webapp.home import retained_data
+from webapp.home.retained_data import (
+    get_retained_data_file, list_retained_data_files, remove_retained_data,
+    retain_data_file
+)
+
+
+PACKAGEID = 'test.1.1'
+
+
+@pytest.fixture
+def user_folder(tmp_path, monkeypatch):
+    folder = tmp_path / 'user'
+    folder.mkdir()
+    monkeypatch.setattr(retained_data, 'get_user_folder_name', lambda: str(folder))
+    monkeypatch.setattr(Config, 'RETAINED_DATA_QUOTA_BYTES', 250)
+    return str(folder)
+
+
+def upload(tmp_path, object_name:str=None, size:int=100):
+    path = tmp_path / f'upload-{object_name}'
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def retain(tmp_path, object_name:str=None, used:float=None, size:int=100):
+    retained_path = retain_data_file(PACKAGEID, upload(tmp_path, object_name, size), object_name)
+    if used is not None:
+        os.utime(retained_path, (used, used))
+    return retained_path
+
+
+def retained_names(user_folder:str=None):
+    return sorted(os.path.basename(path) for _, _, path in list_retained_data_files(user_folder))
+
+
+def test_least_recently_used_file_is_evicted(tmp_path, user_folder):
+    retain(tmp_path, 'a.csv', used=1000)
+    retain(tmp_path, 'b.csv', used=2000)
+    # Using a.csv makes b.csv the least recently used
+    assert get_retained_data_file(PACKAGEID, 'a.csv') is not None
+    retain(tmp_path, 'c.csv')
+    assert retained_names(user_folder) == ['a.csv', 'c.csv']
+    assert get_retained_data_file(PACKAGEID, 'b.csv') is None
+
+
+def test_file_larger_than_quota_is_not_retained(tmp_path, user_folder):
+    retain(tmp_path, 'a.csv')
+    data_file_path = upload(tmp_path, 'big.csv', size=300)
+    assert retain_data_file(PACKAGEID, data_file_path, 'big.csv') is None
+    # The upload is left where it was and nothing is evicted for it
+    assert os.path.isfile(data_file_path)
+    assert retained_names(user_folder) == ['a.csv']
+
+
+def test_remove_retained_data(tmp_path, user_folder):
+    retained_path = retain(tmp_path, 'a.csv')
+    assert not os.path.exists(tmp_path / 'upload-a.csv')
+    remove_retained_data(PACKAGEID)
+    assert not os.path.exists(retained_path)
+    assert get_retained_data_file(PACKAGEID, 'a.csv') is None
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_upload_scratch.py
+
+:Synopsis:
+    Checks the lifecycle of per-upload scratch directories, and that the
+    janitor removes abandoned directories by age and finished ones, oldest
+    first, to keep within the size quota, without removing uploads that
+    are still in progress.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import os
+
+import pytest
+
+from webapp.home import upload_scratch
+from webapp.home.upload_scratch import (
+    create_scratch_dir, read_scratch_state, remove_scratch_dir, set_scratch_state,
+    sweep_uploads_folder, CREATED, DONE, PROFILING, SCRATCH_STATE_FILE, UPLOADED
+)
+
+
+@pytest.fixture
+def uploads_folder(tmp_path, monkeypatch):
+    # The janitor would sweep the real user data folder
+    monkeypatch.setattr(upload_scratch, 'ensure_janitor_running', lambda: None)
+    folder = tmp_path / 'uploads'
+    folder.mkdir()
+    return str(folder)
+
+
+def make_upload(uploads_folder:str=None, state:str=None, created:float=None, size:int=0):
+    scratch_dir = create_scratch_dir(uploads_folder)
+    with open(f'{scratch_dir}/data.csv', 'wb') as fh:
+        fh.write(b'x' * size)
+    scratch_state = read_scratch_state(scratch_dir)
+    if created is not None:
+        scratch_state['created'] = created
+    upload_scratch._write_state(scratch_dir, scratch_state)
+    set_scratch_state(scratch_dir, state)
+    return scratch_dir
+
+
+def test_lifecycle(uploads_folder):
+    scratch_dir = create_scratch_dir(uploads_folder)
+    other_dir = create_scratch_dir(uploads_folder)
+    assert scratch_dir != other_dir
+    assert read_scratch_state(scratch_dir)['state'] == CREATED
+    for state in (UPLOADED, PROFILING, DONE):
+        set_scratch_state(scratch_dir, state)
+        assert read_scratch_state(scratch_dir)['state'] == state
+    remove_scratch_dir(scratch_dir)
+    assert not os.path.exists(scratch_dir)
+    assert os.path.isdir(other_dir)
+
+
+def test_abandoned_uploads_are_removed_by_age(uploads_folder):
+    now = 10000.0
+    stale_dir = make_upload(uploads_folder, PROFILING, created=now - 600)
+    fresh_dir = make_upload(uploads_folder, PROFILING, created=now - 60)
+    removed = sweep_uploads_folder(uploads_folder, max_age=300, now=now)
+    assert removed == [stale_dir]
+    assert os.path.isdir(fresh_dir)
+
+
+def test_unreadable_state_falls_back_to_the_directory_age(uploads_folder):
+    scratch_dir = create_scratch_dir(uploads_folder)
+    with open(f'{scratch_dir}/{SCRATCH_STATE_FILE}', 'w') as fh:
+        fh.write('{"state": "prof')
+    mtime = os.path.getmtime(scratch_dir)
+    assert read_scratch_state(scratch_dir) == {'state': CREATED, 'created': mtime}
+    assert sweep_uploads_folder(uploads_folder, max_age=300, now=mtime + 60) == []
+    assert sweep_uploads_folder(uploads_folder, max_age=300, now=mtime + 600) == [scratch_dir]
+
+
+def test_quota_removes_oldest_finished_uploads(uploads_folder):
+    now = 10000.0
+    oldest_active_dir = make_upload(uploads_folder, UPLOADED, created=now - 40, size=100)
+    old_done_dir = make_upload(uploads_folder, DONE, created=now - 30, size=100)
+    newer_done_dir = make_upload(uploads_folder, DONE, created=now - 20, size=100)
+    newest_done_dir = make_upload(uploads_folder, DONE, created=now - 10, size=100)
+    # Each upload also holds a state file of under 100 bytes
+    removed = sweep_uploads_folder(uploads_folder, max_age=300, max_bytes=400, now=now)
+    assert removed == [old_done_dir, newer_done_dir]
+    assert os.path.isdir(oldest_active_dir)
+    assert os.path.isdir(newest_done_dir)
+
+
+def test_loose_files_are_removed_by_age(uploads_folder):
+    loose_file = f'{uploads_folder}/data.csv'
+    with open(loose_file, 'w') as fh:
+        fh.write('a,b\n')
+    mtime = os.path.getmtime(loose_file)
+    assert sweep_uploads_folder(uploads_folder, max_age=300, now=mtime + 60) == []
+    assert sweep_uploads_folder(uploads_folder, max_age=300, now=mtime + 600) == [loose_file]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_validation.py
+
+:Synopsis:
+    Checks that check_subtree() finds the same rule violations as
+    validate.tree(), which doesn't look inside the metadata of an
+    additionalMetadata, whether or not results are memoized.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import pytest
+
+from metapype.eml2_1_1 import names, validate
+from metapype.model.node import Node
+
+from webapp.home.metapype_client import add_child, read_xml_file
+from webapp.home.validation import check_subtree, errors
+
+from benchmarks.eml_generator import generate_eml
+
+
+@pytest.fixture
+def eml_node(tmp_path):
+    xml_path = generate_eml(str(tmp_path / 'generated.xml'), data_tables=1, attributes=2,
+                            packageid='test.1.1')
+    eml_node = read_xml_file(xml_path)
+    additional_metadata_node = Node(names.ADDITIONALMETADATA, parent=eml_node)
+    add_child(eml_node, additional_metadata_node)
+    metadata_node = Node(names.METADATA, parent=additional_metadata_node)
+    additional_metadata_node.add_child(metadata_node)
+    # Not EML, so validate.tree() would reject these if it looked at them
+    unit_list_node = Node('unitList', parent=metadata_node)
+    metadata_node.add_child(unit_list_node)
+    unit_node = Node('unit', parent=unit_list_node)
+    unit_list_node.add_child(unit_node)
+    unit_node.add_attribute('id', 'nanomolesPerLiter')
+    return eml_node
+
+
+def tree_errors(eml_node:Node=None):
+    errs = []
+    validate.tree(eml_node, errs)
+    return sorted(err[1] for err in errs)
+
+
+@pytest.mark.parametrize('results', [None, {}])
+def test_additional_metadata_is_not_checked(eml_node, results):
+    messages = check_subtree(eml_node, results)
+    assert sorted(message.message for message in errors(messages)) == tree_errors(eml_node)
+    assert not {'unitList', 'unit'} & {message.node_name for message in messages}
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: test_validation_report.py
+
+:Synopsis:
+    Checks that a validation report is built without replacing the nodes
+    of a tree loaded by a request in the node store, and that the stored
+    report is not listed as a package.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+from metapype.model.node import Node
+
+from webapp.auth import user_data
+
+from webapp.config import Config
+
+from webapp.home.metapype_client import (
+    load_eml, read_xml_file, save_eml
+)
+from webapp.home.validation_report import read_report, update_report
+
+from benchmarks.eml_generator import generate_eml
+
+
+PACKAGEID = 'test.1.1'
+
+
+def save_package(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    user_folder = tmp_path / 'user'
+    user_folder.mkdir()
+    xml_path = generate_eml(str(tmp_path / 'generated.xml'), data_tables=1, attributes=5,
+                            packageid=PACKAGEID)
+    save_eml(PACKAGEID, read_xml_file(xml_path), 'json', str(user_folder))
+    return str(user_folder)
+
+
+def test_report_leaves_loaded_nodes_in_store(tmp_path, monkeypatch):
+    user_folder = save_package(tmp_path, monkeypatch)
+    eml_node = load_eml(PACKAGEID, user_folder)
+
+    report = update_report(PACKAGEID, user_folder)
+    assert report['packageid'] == PACKAGEID
+    assert read_report(PACKAGEID, user_folder) == report
+    assert Node.get_node_instance(eml_node.id) is eml_node
+
+
+def test_report_is_not_listed_as_a_package(tmp_path, monkeypatch):
+    user_folder = save_package(tmp_path, monkeypatch)
+    monkeypatch.setattr(user_data, 'get_user_folder_name', lambda: user_folder)
+    update_report(PACKAGEID, user_folder)
+    assert user_data.get_user_document_list() == [PACKAGEID]
@@ -3,6 +3,10 @@
 """:Mod: __init__
 
 :Synopsis:
+    The application itself is in webapp.application and is only built
+    when webapp.app is first used, e.g. by "from webapp import app" in
+    wsgi.py. Command-line tools such as validate_store and check_data_table
+    import webapp modules without starting the web application.
 
 :Author:
     servilla
@@ -11,38 +15,16 @@
 :Created:
     2/15/18
 """
-import logging
-import os
+import importlib
 
-import daiquiri
-from flask import Flask, session
-from flask_bootstrap import Bootstrap
-from flask_login import LoginManager
+# Defined by webapp.application and imported from webapp by other modules
+APPLICATION_NAMES = ('app', 'bootstrap', 'login')
 
-from webapp.config import Config
 
-cwd = os.path.dirname(os.path.realpath(__file__))
-logfile = cwd + '/metadata-eml.log'
-daiquiri.setup(level=logging.INFO,
-               outputs=(daiquiri.output.File(logfile), 'stdout',))
-logger = daiquiri.getLogger(__name__)
-
-app = Flask(__name__)
-app.config.from_object(Config)
-bootstrap = Bootstrap(app)
-login = LoginManager(app)
-login.login_view = 'auth.login'
-
-# Importing these modules causes the routes and error handlers to be associated
-# with the blueprint. It is important to note that the modules are imported at
-# the bottom of the webapp/__init__.py script to avoid errors due to circular 
-# dependencies.
-
-from webapp.auth.views import auth
-app.register_blueprint(auth, url_prefix='/eml/auth')
-
-from webapp.home.views import home
-app.register_blueprint(home, url_prefix='/eml')
-
-from webapp.errors.handler import errors
-app.register_blueprint(errors, url_prefix='/eml/error')
+def __getattr__(name):
+    # Module __getattr__ (PEP 562), called for attributes not yet defined.
+    # import_module() also returns the module while it is being imported,
+    # for the modules the application imports that use these names.
+    if name in APPLICATION_NAMES:
+        return getattr(importlib.import_module('webapp.application'), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
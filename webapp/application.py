@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+""":Mod: application
+
+:Synopsis:
+    The Flask application: logging, instrumentation and blueprints. Built
+    when webapp.app is first used (see webapp/__init__.py).
+
+:Author:
+    servilla
+    costa
+
+:Created:
+    2/15/18
+"""
+import logging
+import os
+
+import daiquiri
+from flask import Flask, session
+from flask_bootstrap import Bootstrap
+from flask_login import LoginManager
+
+from webapp.config import Config
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+logfile = cwd + '/metadata-eml.log'
+daiquiri.setup(level=logging.INFO,
+               outputs=(daiquiri.output.File(logfile), 'stdout',))
+logger = daiquiri.getLogger(__name__)
+
+# Named after the package, as when it was built in webapp/__init__.py
+app = Flask('webapp')
+app.config.from_object(Config)
+
+# Registered before timing so that writing a profile is not timed
+from webapp.instrumentation.profiling import init_profiling
+init_profiling(app)
+
+from webapp.instrumentation.timing import init_timing
+init_timing(app)
+
+from webapp.instrumentation.metrics import init_metrics
+init_metrics(app)
+
+from webapp.instrumentation.memory import init_memory
+init_memory(app)
+
+bootstrap = Bootstrap(app)
+login = LoginManager(app)
+login.login_view = 'auth.login'
+
+# Importing these modules causes the routes and error handlers to be associated
+# with the blueprint. It is important to note that the modules are imported at
+# the bottom of the webapp/application.py script to avoid errors due to circular 
+# dependencies.
+
+from webapp.auth.views import auth
+app.register_blueprint(auth, url_prefix='/eml/auth')
+
+from webapp.home.views import home
+app.register_blueprint(home, url_prefix='/eml')
+
+from webapp.instrumentation.views import instrumentation
+app.register_blueprint(instrumentation, url_prefix='/eml')
+
+from webapp.errors.handler import errors
+app.register_blueprint(errors, url_prefix='/eml/error')
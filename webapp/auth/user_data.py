@@ -14,18 +14,15 @@
 import daiquiri
 import os
 
-from flask import (
-    send_file
-)
-
 from flask_login import (
     current_user
 )
 
 from webapp.config import Config
 
+from webapp.home.document_store import remove_digest, USER_DATA_DIR
+
 logger = daiquiri.getLogger('user_data: ' + __name__)
-USER_DATA_DIR = 'user-data'
 
 
 def get_user_org():
@@ -64,7 +61,8 @@ def get_user_document_list():
         onlyfiles = [f for f in folder_contents if os.path.isfile(os.path.join(user_folder, f))]
         if onlyfiles:
             for filename in onlyfiles:
-                if filename and filename.endswith('.json'):
+                # Hidden files, such as validation reports, are not packages
+                if filename and filename.endswith('.json') and not filename.startswith('.'):
                     packageid = os.path.splitext(filename)[0]
                     packageids.append(packageid)
     except:
@@ -113,6 +111,8 @@ def delete_eml(packageid:str=''):
                     os.remove(xml_filename)
                 except Exception as e:
                     pass
+                remove_digest(json_filename)
+                remove_digest(xml_filename)
                 return None
             except Exception as e:
                 return str(e)
@@ -124,33 +124,6 @@ def delete_eml(packageid:str=''):
         return msg
 
 
-def download_eml(packageid:str=''):
-    if packageid:
-        user_folder = get_user_folder_name()
-        filename = f'{packageid}.xml'
-        pathname = f'{user_folder}/{filename}'
-        if os.path.exists(pathname):
-            relative_pathname = '../' + pathname
-            mimetype = 'application/xml'
-            try: 
-                return send_file(relative_pathname, 
-                    mimetype=mimetype, 
-                    as_attachment=True, 
-                    attachment_filename=filename, 
-                    add_etags=True, 
-                    cache_timeout=None, 
-                    conditional=False, 
-                    last_modified=None)
-            except Exception as e:
-                return str(e)
-        else:
-            msg = f'Data package not found: {packageid}'
-            return msg
-    else:
-        msg = f'No package ID was specified'
-        return msg
-
-
 def set_active_packageid(packageid: str):
     if packageid is not None:
         user_folder = get_user_folder_name()
@@ -12,8 +12,9 @@
     5/30/18
 """
 import daiquiri
-from flask import Blueprint, render_template
+from flask import Blueprint, flash, redirect, render_template, request
 from webapp import app
+from webapp.home.document_lock import Document_Lock_Timeout, Stale_Document_Error
 
 
 logger = daiquiri.getLogger('handler: ' + __name__)
@@ -32,3 +33,17 @@ def bad_request(error):
 @app.errorhandler(500)
 def bad_request(error):
     return render_template('500.html'), 500
+
+
+@app.errorhandler(Stale_Document_Error)
+def stale_document(error):
+    # Nothing was saved; reloading the page shows the other request's
+    # changes, and the user can resubmit
+    flash(f'Your changes were not saved because {error}. Please review the page and submit again.')
+    return redirect(request.url)
+
+
+@app.errorhandler(Document_Lock_Timeout)
+def document_lock_timeout(error):
+    flash(f'Your changes were not saved because {error}. Please submit again.')
+    return redirect(request.url)
@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: check_data_table.py
+
+:Synopsis:
+    Checks that a data file is congruent with the metadata describing it:
+    column count and order, numberType, numeric bounds, enumerated codes,
+    dateTime formatString, numberOfRecords, and size. The data file is
+    streamed in chunks, so memory use does not depend on the file size.
+
+    Can also be run as a batch command:
+
+        python -m webapp.home.check_data_table <eml.json|eml.xml> <data file>...
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+
+import pandas as pd
+
+from metapype.eml2_1_1 import names
+from metapype.model import mp_io
+from metapype.model.node import Node
+
+from webapp.home.load_data_table import (
+    data_file_extension, is_arrow_data_file, pa, pq
+)
+
+from webapp.home.metapype_client import (
+    attribute_name_from_attribute, mscale_from_attribute,
+    non_numeric_domain_from_measurement_scale
+)
+
+from webapp.home.retained_data import (
+    object_name_from_entity
+)
+
+from webapp.instrumentation.timing import timed
+
+
+CHUNK_SIZE = 100000
+
+MAX_SAMPLES = 5
+
+FIELD_DELIMITERS = {
+    'comma': ',',
+    'tab': '\t',
+    'space': ' ',
+}
+
+# EML formatString components and their strptime equivalents, longest first
+FORMAT_STRING_TOKENS = [
+    ('YYYY', '%Y'),
+    ('YY', '%y'),
+    ('MMM', '%b'),
+    ('MM', '%m'),
+    ('DD', '%d'),
+    ('hh', '%H'),
+    ('HH', '%H'),
+    ('mm', '%M'),
+    ('ss', '%S'),
+]
+
+# Checks reported by the checker
+COLUMN_COUNT = 'column count'
+COLUMN_NAME = 'column name'
+NUMBER_TYPE = 'numberType'
+BOUNDS = 'bounds'
+ENUMERATED_CODES = 'enumerated codes'
+FORMAT_STRING = 'formatString'
+NUMBER_OF_RECORDS = 'numberOfRecords'
+SIZE = 'size'
+
+
+Mismatch = collections.namedtuple(
+    'Mismatch',
+    ["attribute", "check", "message"],
+    rename=False)
+
+
+Attribute_Spec = collections.namedtuple(
+    'Attribute_Spec',
+    ["name", "mscale", "number_type", "minimum", "minimum_exclusive",
+     "maximum", "maximum_exclusive", "codes", "format_string",
+     "missing_value_codes"],
+    rename=False)
+
+
+def child_content(node:Node=None, *path):
+    for name in path:
+        if not node:
+            return None
+        node = node.find_child(name)
+    return node.content if node else None
+
+
+def to_number(value=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_string_to_strptime(format_string:str=None):
+    '''
+    Converts an EML formatString such as YYYY-MM-DDThh:mm:ss into a strptime
+    format. Returns None if the formatString has components that cannot be
+    translated, in which case the check is skipped.
+    '''
+    if not format_string:
+        return None
+    strptime_format = ''
+    i = 0
+    while i < len(format_string):
+        for token, directive in FORMAT_STRING_TOKENS:
+            if format_string.startswith(token, i):
+                strptime_format += directive
+                i += len(token)
+                break
+        else:
+            c = format_string[i]
+            if c.isalpha() and c != 'T':
+                return None
+            strptime_format += '%%' if c == '%' else c
+            i += 1
+    return strptime_format
+
+
+def attribute_spec(att_node:Node=None):
+    mscale = mscale_from_attribute(att_node)
+    number_type = None
+    minimum = maximum = None
+    minimum_exclusive = maximum_exclusive = False
+    codes = None
+    format_string = None
+
+    mscale_node = att_node.find_child(names.MEASUREMENTSCALE)
+    if mscale in (names.RATIO, names.INTERVAL):
+        numeric_domain_node = mscale_node.find_child(mscale).find_child(names.NUMERICDOMAIN)
+        if numeric_domain_node:
+            number_type = child_content(numeric_domain_node, names.NUMBERTYPE)
+            bounds_node = numeric_domain_node.find_child(names.BOUNDS)
+            if bounds_node:
+                minimum_node = bounds_node.find_child(names.MINIMUM)
+                if minimum_node:
+                    minimum = to_number(minimum_node.content)
+                    minimum_exclusive = (minimum_node.attribute_value('exclusive') or '').lower() == 'true'
+                maximum_node = bounds_node.find_child(names.MAXIMUM)
+                if maximum_node:
+                    maximum = to_number(maximum_node.content)
+                    maximum_exclusive = (maximum_node.attribute_value('exclusive') or '').lower() == 'true'
+    elif mscale in (names.NOMINAL, names.ORDINAL):
+        nnd_node = non_numeric_domain_from_measurement_scale(mscale_node)
+        if nnd_node:
+            enumerated_domain_node = nnd_node.find_child(names.ENUMERATEDDOMAIN)
+            if enumerated_domain_node and \
+               (enumerated_domain_node.attribute_value('enforced') or 'yes') == 'yes':
+                codes = set()
+                for cd_node in enumerated_domain_node.find_all_children(names.CODEDEFINITION):
+                    code = child_content(cd_node, names.CODE)
+                    if code is not None:
+                        codes.add(code)
+    elif mscale == names.DATETIME:
+        format_string = child_content(mscale_node, names.DATETIME, names.FORMATSTRING)
+
+    missing_value_codes = set()
+    for mvc_node in att_node.find_all_children(names.MISSINGVALUECODE):
+        code = child_content(mvc_node, names.CODE)
+        if code is not None:
+            missing_value_codes.add(code)
+
+    return Attribute_Spec(name=attribute_name_from_attribute(att_node),
+                          mscale=mscale,
+                          number_type=number_type,
+                          minimum=minimum,
+                          minimum_exclusive=minimum_exclusive,
+                          maximum=maximum,
+                          maximum_exclusive=maximum_exclusive,
+                          codes=codes,
+                          format_string=format_string,
+                          missing_value_codes=missing_value_codes)
+
+
+def read_chunks(dt_node:Node=None, data_file_path:str=None, chunksize:int=CHUNK_SIZE):
+    '''
+    Yields the data file as data frames of raw string values, with nulls in
+    columnar formats rendered as blank cells.
+    '''
+    if is_arrow_data_file(data_file_path):
+        if pa is None:
+            raise Exception('Parquet and Feather files require the pyarrow package')
+        if data_file_extension(data_file_path) == 'parquet':
+            batches = pq.ParquetFile(data_file_path).iter_batches(batch_size=chunksize)
+        else:
+            reader = pa.ipc.open_file(pa.memory_map(data_file_path, 'r'))
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        for batch in batches:
+            data_frame = batch.to_pandas()
+            yield data_frame.astype(str).where(data_frame.notna(), '')
+    else:
+        delimiter = child_content(dt_node, names.PHYSICAL, names.DATAFORMAT, names.TEXTFORMAT,
+                                  names.SIMPLEDELIMITED, names.FIELDDELIMITER)
+        if delimiter:
+            delimiter = FIELD_DELIMITERS.get(delimiter, delimiter)
+        elif data_file_extension(data_file_path) == 'tsv':
+            delimiter = '\t'
+        else:
+            delimiter = ','
+        yield from pd.read_csv(data_file_path, sep=delimiter, comment='#', dtype=str,
+                               keep_default_na=False, chunksize=chunksize)
+
+
+class Attribute_Check(object):
+    '''
+    Accumulates the results of checking one attribute across chunks.
+    '''
+
+    def __init__(self, spec:Attribute_Spec):
+        self.spec = spec
+        self.strptime_format = format_string_to_strptime(spec.format_string)
+        self.counts = collections.Counter()
+        self.samples = collections.defaultdict(list)
+        self.minimum = None
+        self.maximum = None
+
+    def flag(self, check:str, values:pd.Series):
+        if not values.empty:
+            self.counts[check] += len(values)
+            samples = self.samples[check]
+            if len(samples) < MAX_SAMPLES:
+                samples.extend(values.unique()[:MAX_SAMPLES - len(samples)].tolist())
+
+    def check(self, column:pd.Series):
+        spec = self.spec
+        column = column.str.strip()
+        values = column[~(column.eq('') | column.isin(spec.missing_value_codes))]
+
+        if spec.number_type or spec.minimum is not None or spec.maximum is not None:
+            numbers = pd.to_numeric(values, errors='coerce')
+            invalid = numbers.isna()
+            if spec.number_type in ('natural', 'whole', 'integer'):
+                invalid |= numbers % 1 != 0
+                if spec.number_type == 'natural':
+                    invalid |= numbers < 1
+                elif spec.number_type == 'whole':
+                    invalid |= numbers < 0
+            self.flag(NUMBER_TYPE, values[invalid])
+            numbers = numbers.dropna()
+            if not numbers.empty:
+                if self.minimum is None or numbers.min() < self.minimum:
+                    self.minimum = numbers.min()
+                if self.maximum is None or numbers.max() > self.maximum:
+                    self.maximum = numbers.max()
+
+        if spec.codes is not None:
+            self.flag(ENUMERATED_CODES, values[~values.isin(spec.codes)])
+
+        if self.strptime_format:
+            dates = pd.to_datetime(values, format=self.strptime_format, errors='coerce')
+            self.flag(FORMAT_STRING, values[dates.isna()])
+
+    def mismatches(self):
+        spec = self.spec
+        mismatches = []
+        descriptions = {
+            NUMBER_TYPE: f'values that are not of numberType {spec.number_type or "real"}',
+            ENUMERATED_CODES: 'values that are not enumerated codes',
+            FORMAT_STRING: f'values that do not match formatString {spec.format_string}',
+        }
+        for check, description in descriptions.items():
+            if self.counts[check]:
+                samples = ', '.join(repr(sample) for sample in self.samples[check])
+                mismatches.append(Mismatch(spec.name, check,
+                                           f'{self.counts[check]} {description}, e.g. {samples}'))
+        if spec.minimum is not None and self.minimum is not None:
+            if self.minimum < spec.minimum or (spec.minimum_exclusive and self.minimum == spec.minimum):
+                mismatches.append(Mismatch(spec.name, BOUNDS,
+                                           f'Minimum value {self.minimum} is outside the minimum bound {spec.minimum}'))
+        if spec.maximum is not None and self.maximum is not None:
+            if self.maximum > spec.maximum or (spec.maximum_exclusive and self.maximum == spec.maximum):
+                mismatches.append(Mismatch(spec.name, BOUNDS,
+                                           f'Maximum value {self.maximum} is outside the maximum bound {spec.maximum}'))
+        if spec.format_string and not self.strptime_format:
+            mismatches.append(Mismatch(spec.name, FORMAT_STRING,
+                                       f'formatString {spec.format_string} could not be checked'))
+        return mismatches
+
+
+@timed('check_data')
+def check_data_table(dt_node:Node=None, data_file_path:str=None, chunksize:int=CHUNK_SIZE):
+    '''
+    Checks a data file against the data table node describing it and returns
+    a list of Mismatch entries. An empty list means no mismatches were found.
+    '''
+    mismatches = []
+    if not dt_node or not data_file_path:
+        return mismatches
+
+    size = child_content(dt_node, names.PHYSICAL, names.SIZE)
+    if size:
+        file_size = os.path.getsize(data_file_path)
+        if str(file_size) != size.strip():
+            mismatches.append(Mismatch('', SIZE, f'File is {file_size} bytes but size is {size}'))
+
+    specs = []
+    attribute_list_node = dt_node.find_child(names.ATTRIBUTELIST)
+    if attribute_list_node:
+        specs = [attribute_spec(att_node) for att_node in
+                 attribute_list_node.find_all_children(names.ATTRIBUTE)]
+    checks = [Attribute_Check(spec) for spec in specs]
+
+    row_count = 0
+    columns = None
+    for chunk in read_chunks(dt_node, data_file_path, chunksize):
+        if columns is None:
+            columns = list(chunk.columns)
+        row_count += chunk.shape[0]
+        for i, attribute_check in enumerate(checks[:len(columns)]):
+            attribute_check.check(chunk.iloc[:, i])
+
+    columns = columns or []
+    if len(columns) != len(specs):
+        mismatches.append(Mismatch('', COLUMN_COUNT,
+                                   f'File has {len(columns)} columns but there are {len(specs)} attributes'))
+    for column, spec in zip(columns, specs):
+        if str(column).strip() != (spec.name or '').strip():
+            mismatches.append(Mismatch(spec.name, COLUMN_NAME,
+                                       f'Column {column} is in the position of attribute {spec.name}'))
+    for attribute_check in checks:
+        mismatches.extend(attribute_check.mismatches())
+
+    number_of_records = child_content(dt_node, names.NUMBEROFRECORDS)
+    if number_of_records and number_of_records.strip() != str(row_count):
+        mismatches.append(Mismatch('', NUMBER_OF_RECORDS,
+                                   f'File has {row_count} records but numberOfRecords is {number_of_records}'))
+
+    return mismatches
+
+
+def load_metadata_file(metadata_file:str=None):
+    if metadata_file.endswith('.json'):
+        with open(metadata_file, 'r') as json_file:
+            return mp_io.from_json(json.load(json_file))
+    with open(metadata_file, 'r') as xml_file:
+        return mp_io.from_xml(xml_file.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check data files against the data tables that describe them.')
+    parser.add_argument('metadata_file', help='EML document in JSON or XML format')
+    parser.add_argument('data_files', nargs='+',
+                        help='Data files, matched to data tables by their objectName')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    eml_node = load_metadata_file(args.metadata_file)
+    dataset_node = eml_node.find_child(names.DATASET)
+    dt_nodes = dataset_node.find_all_children(names.DATATABLE) if dataset_node else []
+    dt_nodes_by_object_name = {object_name_from_entity(dt_node): dt_node for dt_node in dt_nodes}
+
+    status = 0
+    for data_file in args.data_files:
+        dt_node = dt_nodes_by_object_name.get(os.path.basename(data_file))
+        if not dt_node:
+            print(f'{data_file}: no data table has this objectName')
+            status = 1
+            continue
+        mismatches = check_data_table(dt_node, data_file, args.chunksize)
+        if not mismatches:
+            print(f'{data_file}: OK')
+        for mismatch in mismatches:
+            status = 1
+            attribute = f' [{mismatch.attribute}]' if mismatch.attribute else ''
+            print(f'{data_file}{attribute} {mismatch.check}: {mismatch.message}')
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: document_lock.py
+
+:Synopsis:
+    Per-document locking across uWSGI worker processes. Saves of a
+    package take an exclusive fcntl lock on a lock file in the user's
+    folder. The version of the JSON file a tree was loaded from is
+    remembered, and a save checks under the lock that the file has not
+    been replaced since, so the last of two concurrent writers no longer
+    silently discards the other's changes.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import contextlib
+import fcntl
+import os
+import threading
+import time
+import weakref
+
+import daiquiri
+
+from metapype.model.node import Node
+
+from webapp.config import Config
+
+from webapp.home.document_store import file_stamp
+
+
+logger = daiquiri.getLogger('document_lock: ' + __name__)
+
+LOCK_PREFIX = '.'
+LOCK_SUFFIX = '.lock'
+LOCK_POLL_INTERVAL = 0.05
+
+_local = threading.local()
+# eml node -> {packageid: version of the JSON file it was loaded from}
+_loaded_versions = weakref.WeakKeyDictionary()
+_versions_lock = threading.Lock()
+
+
+class Document_Lock_Timeout(Exception):
+    pass
+
+
+class Stale_Document_Error(Exception):
+    pass
+
+
+def get_lock_filename(packageid:str=None, user_folder:str=None):
+    return f'{user_folder}/{LOCK_PREFIX}{packageid}{LOCK_SUFFIX}'
+
+
+def _held_locks():
+    if not hasattr(_local, 'held'):
+        _local.held = {}
+    return _local.held
+
+
+@contextlib.contextmanager
+def document_lock(packageid:str=None, user_folder:str=None, timeout:float=None):
+    '''
+    Holds an exclusive lock on the package. The lock is reentrant within a
+    thread: flock locks taken through separate file descriptors would
+    otherwise block each other in the same process.
+    '''
+    if timeout is None:
+        timeout = Config.DOCUMENT_LOCK_TIMEOUT
+    filename = get_lock_filename(packageid, user_folder)
+    held = _held_locks()
+    if filename in held:
+        held[filename][1] += 1
+        try:
+            yield
+        finally:
+            held[filename][1] -= 1
+        return
+
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise Document_Lock_Timeout(f'{packageid} is being saved by another request')
+                time.sleep(LOCK_POLL_INTERVAL)
+        held[filename] = [fd, 1]
+        try:
+            yield
+        finally:
+            del held[filename]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def record_version(eml_node:Node=None, packageid:str=None, stamp:list=None):
+    '''
+    Remembers the version of the package's JSON file that the tree was
+    read from or written to, as the stamp taken on that file's handle:
+    stat-ing the name afterwards could see another worker's save.
+    '''
+    if eml_node is None or not packageid:
+        return
+    with _versions_lock:
+        _loaded_versions.setdefault(eml_node, {})[packageid] = stamp
+
+
+def check_version(eml_node:Node=None, packageid:str=None, json_filename:str=None):
+    '''
+    Raises Stale_Document_Error if the tree was loaded from the package's
+    JSON file and the file has since been replaced. Trees that were not
+    loaded as this package (new packages, imports, Save As) are not checked.
+    Must be called with the document lock held.
+    '''
+    if eml_node is None or not packageid:
+        return
+    with _versions_lock:
+        versions = _loaded_versions.get(eml_node)
+        if not versions or packageid not in versions:
+            return
+        loaded_version = versions[packageid]
+    if loaded_version != file_stamp(json_filename):
+        logger.warning(f'Rejected a stale save of {packageid}')
+        raise Stale_Document_Error(f'{packageid} was changed by another request')
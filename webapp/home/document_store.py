@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: document_store.py
+
+:Synopsis:
+    Low-level writes of the JSON and XML documents in a user's folder.
+    A digest of each document's content is recorded in a sidecar file
+    together with the stat of the document it describes, so a save that
+    would rewrite a document with identical content can be skipped.
+
+    Documents are written to a temporary file in the same directory and
+    renamed over the original, so a worker killed mid-write leaves the
+    previous version in place. Config.DOCUMENT_FSYNC chooses how the
+    writes are made durable against a crash of the machine itself:
+
+        always  fsync each file before the rename and its directory after
+        batch   fsync written files and directories in the background,
+                at most Config.DOCUMENT_FSYNC_INTERVAL seconds later
+        never   leave it to the operating system
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+
+import daiquiri
+
+from webapp.config import Config
+
+
+logger = daiquiri.getLogger('document_store: ' + __name__)
+
+# The directory of the users' folders; defined here rather than in
+# user_data.py so that command-line tools need not import Flask
+USER_DATA_DIR = 'user-data'
+
+DIGEST_SUFFIX = '.digest'
+DIGEST_SIZE = 16
+
+TEMP_PREFIX = '.'
+TEMP_SUFFIX = '.tmp'
+
+# Values of Config.DOCUMENT_FSYNC
+FSYNC_ALWAYS = 'always'
+FSYNC_BATCH = 'batch'
+FSYNC_NEVER = 'never'
+
+_flusher_lock = threading.Lock()
+_flusher_thread = None
+_flusher_pid = None
+_pending_paths = set()
+
+
+def _current_umask():
+    # os.umask() can only be read by setting it, which would race with
+    # threads creating files, so it is read once when the module loads
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_umask = _current_umask()
+
+
+def _stamp(stat_result:os.stat_result=None):
+    return [stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns]
+
+
+def file_stamp(filename:str=None):
+    try:
+        return _stamp(os.stat(filename))
+    except OSError:
+        return None
+
+
+def fd_stamp(fd:int=None):
+    '''
+    Returns the stamp of an open file. Documents are replaced by renaming,
+    so this is the stamp of the version being read or written through fd,
+    whatever has since been renamed over its name.
+    '''
+    return _stamp(os.fstat(fd))
+
+
+def content_digest(chunks=None):
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for chunk in chunks:
+        digest.update(chunk.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_digest_filename(filename:str=None):
+    return f'{filename}{DIGEST_SUFFIX}'
+
+
+def read_digest(filename:str=None):
+    try:
+        with open(get_digest_filename(filename), 'r') as fh:
+            return json.load(fh)
+    except Exception:
+        return {}
+
+
+def record_digest(filename:str=None, digest:str=None, stamp:list=None):
+    try:
+        recorded = json.dumps({'digest': digest, 'stamp': stamp})
+        atomic_write(get_digest_filename(filename), (recorded,))
+    except OSError as e:
+        logger.error(e)
+
+
+def remove_digest(filename:str=None):
+    try:
+        os.remove(get_digest_filename(filename))
+    except OSError:
+        pass
+
+
+def is_unchanged(filename:str=None, digest:str=None, recorded:dict=None):
+    '''
+    True if the document on disk is known to have the given content: the
+    recorded digest matches and the document has not been touched since
+    the digest was recorded.
+    '''
+    if recorded is None:
+        recorded = read_digest(filename)
+    return recorded.get('digest') == digest and \
+           recorded.get('stamp') is not None and \
+           recorded.get('stamp') == file_stamp(filename)
+
+
+def fsync_path(path:str=None):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.error(e)
+
+
+def file_mode(filename:str=None):
+    '''
+    Returns the permission bits for a new version of filename: those of
+    the existing file, or the umask's default for a new file.
+    '''
+    try:
+        return stat.S_IMODE(os.stat(filename).st_mode)
+    except OSError:
+        return 0o666 & ~_umask
+
+
+def atomic_write(filename:str=None, chunks=None):
+    '''
+    Writes the chunks to a temporary file next to filename and renames it 
+    over filename, applying the configured fsync policy. mkstemp() creates
+    the temporary file with mode 0600, so it is given the mode of the file
+    it replaces first. Returns the stamp of the written file.
+    '''
+    directory = os.path.dirname(filename) or '.'
+    fd, temp_filename = tempfile.mkstemp(dir=directory, 
+                                         prefix=f'{TEMP_PREFIX}{os.path.basename(filename)}.',
+                                         suffix=TEMP_SUFFIX)
+    try:
+        os.fchmod(fd, file_mode(filename))
+        with os.fdopen(fd, 'w') as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+            fh.flush()
+            if Config.DOCUMENT_FSYNC == FSYNC_ALWAYS:
+                os.fsync(fh.fileno())
+            stamp = fd_stamp(fh.fileno())
+        os.replace(temp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(temp_filename)
+        except OSError:
+            pass
+        raise
+    if Config.DOCUMENT_FSYNC == FSYNC_ALWAYS:
+        fsync_path(directory)
+    elif Config.DOCUMENT_FSYNC == FSYNC_BATCH:
+        schedule_fsync(filename)
+    return stamp
+
+
+def schedule_fsync(filename:str=None):
+    ensure_flusher_running()
+    with _flusher_lock:
+        _pending_paths.add(filename)
+        _pending_paths.add(os.path.dirname(filename) or '.')
+
+
+def flush_pending():
+    with _flusher_lock:
+        paths = list(_pending_paths)
+        _pending_paths.clear()
+    # Files before directories, so that a renamed file is durable before 
+    # the directory entry that points to it
+    for path in sorted(paths, key=os.path.isdir):
+        if os.path.exists(path):
+            fsync_path(path)
+
+
+def _flusher():
+    while True:
+        time.sleep(Config.DOCUMENT_FSYNC_INTERVAL)
+        try:
+            flush_pending()
+        except Exception as e:
+            logger.error(e)
+
+
+def ensure_flusher_running():
+    # Started per process id, as for the upload janitor, since threads do
+    # not survive the fork of uWSGI workers
+    global _flusher_thread, _flusher_pid
+    with _flusher_lock:
+        if _flusher_pid == os.getpid() and _flusher_thread and _flusher_thread.is_alive():
+            return
+        _pending_paths.clear()
+        _flusher_thread = threading.Thread(target=_flusher, name='document-fsync', daemon=True)
+        _flusher_thread.start()
+        _flusher_pid = os.getpid()
+
+
+def remove_stale_temp_files(folder:str=None, max_age:float=None, now:float=None):
+    '''
+    Removes temporary files left in a user folder by workers that were 
+    killed mid-write.
+    '''
+    removed = []
+    if not folder or not os.path.isdir(folder):
+        return removed
+    if now is None:
+        now = time.time()
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.startswith(TEMP_PREFIX) and entry.name.endswith(TEMP_SUFFIX):
+            try:
+                if now - entry.stat().st_mtime > max_age:
+                    os.remove(entry.path)
+                    removed.append(entry.path)
+            except OSError:
+                pass
+    return removed
+
+
+def write_document(filename:str=None, chunks=None):
+    '''
+    Writes the chunks to the document, recording the digest of what was
+    written. Returns the stamp of the written document.
+    '''
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+    def digested(chunks):
+        for chunk in chunks:
+            digest.update(chunk.encode('utf-8'))
+            yield chunk
+
+    stamp = atomic_write(filename, digested(chunks))
+    record_digest(filename, digest.hexdigest(), stamp)
+    return stamp
+
+
+def save_document(filename:str=None, chunks=None):
+    '''
+    Writes the document unless it already has this content. Returns
+    whether the document was written and the stamp of the document with
+    this content. The chunks are iterated twice when the content has
+    changed, so pass a sequence or a cheap-to-repeat source.
+    '''
+    digest = content_digest(chunks)
+    recorded = read_digest(filename)
+    if is_unchanged(filename, digest, recorded):
+        return False, recorded['stamp']
+    return True, write_document(filename, chunks)
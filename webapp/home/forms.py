@@ -342,13 +342,26 @@ class KeywordForm(FlaskForm):
 
 
 class LoadDataForm(FlaskForm):
-    pass
+    retain = BooleanField('Keep a copy of the data file on the server for later checks', default=False)
+    temporal_coverage = SelectField('Temporal Coverage from Date Columns',
+                                    choices=[('none', 'Do not add'),
+                                             ('entity', 'Add to the data table'),
+                                             ('dataset', 'Add to the dataset')])
+    geographic_coverage = SelectField('Geographic Coverage from Latitude/Longitude Columns',
+                                      choices=[('none', 'Do not add'),
+                                               ('entity', 'Add to the data table'),
+                                               ('dataset', 'Add to the dataset')])
+    stations = BooleanField('Also add each distinct station as a point', default=False)
 
 
 class LoadMetadataForm(FlaskForm):
     pass
 
 
+class ImportArchiveForm(FlaskForm):
+    overwrite = BooleanField('Replace documents that already exist', default=False)
+
+
 class MethodStepSelectForm(FlaskForm):
     pass
 
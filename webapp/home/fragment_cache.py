@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: fragment_cache.py
+
+:Synopsis:
+    Per-subtree caches of serialized XML fragments and of validation
+    results, so that exporting or validating a package after a small edit
+    only re-does the work for the subtrees that changed. Entries are keyed
+    by node id and stored with a hash of the subtree they were computed
+    from, covering the ids, names, attributes and content of all its nodes.
+    An entry is only used while the subtree still has that hash, so an edit
+    made anywhere, by any code, makes the entries of the edited node and
+    its ancestors misses without the edit having to be reported.
+
+    Each process keeps fragments for a few packages. A package's fragments
+    are only trusted for trees loaded from, or saved to, the JSON file whose
+    stamp they were recorded against, so a save by another worker process
+    simply causes a cache miss.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import collections
+import sys
+import threading
+
+import daiquiri
+
+from metapype.model.node import Node
+
+from webapp.config import Config
+
+from webapp.home.document_store import file_stamp
+
+from webapp.instrumentation.metrics import record_cache_lookup
+
+
+logger = daiquiri.getLogger('fragment_cache: ' + __name__)
+
+_lock = threading.Lock()
+_caches = collections.OrderedDict()
+
+
+class Package_Fragments(object):
+
+    def __init__(self, stamp=None):
+        self.stamp = stamp
+        self.root_ids = set()
+        # node id -> (subtree hash, (level, tuple of serialized chunks))
+        self.fragments = {}
+        # node id -> (subtree hash, validation messages for the subtree)
+        self.validation = {}
+
+    def subtree_caches(self):
+        return (self.fragments, self.validation)
+
+
+class Tree_Entries(object):
+    '''
+    One of a package's caches as seen from one tree: looks like a dict of
+    entries by node id, but only returns an entry if it was stored for a
+    subtree with the same hash as the node's subtree in this tree. The
+    hashes are computed on first use.
+    '''
+
+    def __init__(self, entries:dict=None, root_node:Node=None):
+        self.entries = entries
+        self.root_node = root_node
+        self._hashes = None
+        # Entries of nodes whose hash is not known, kept for this tree only
+        self._local = {}
+
+    @property
+    def hashes(self):
+        if self._hashes is None:
+            self._hashes = subtree_hashes(self.root_node)
+            # Drops the entries of nodes that are no longer in the tree;
+            # other threads may be adding entries, so the keys are copied
+            for node_id in list(self.entries):
+                if node_id not in self._hashes:
+                    self.entries.pop(node_id, None)
+        return self._hashes
+
+    def get(self, node_id:str=None, default=None):
+        entry = self.entries.get(node_id)
+        if entry is not None and entry[0] == self.hashes.get(node_id):
+            return entry[1]
+        return self._local.get(node_id, default)
+
+    def __getitem__(self, node_id:str=None):
+        value = self.get(node_id)
+        if value is None:
+            raise KeyError(node_id)
+        return value
+
+    def __setitem__(self, node_id:str=None, value=None):
+        subtree_hash = self.hashes.get(node_id)
+        if subtree_hash is None:
+            self._local[node_id] = value
+        else:
+            self.entries[node_id] = (subtree_hash, value)
+
+    def setdefault(self, node_id:str=None, default=None):
+        value = self.get(node_id)
+        if value is None:
+            self[node_id] = value = default
+        return value
+
+
+def subtree_hashes(node:Node=None):
+    '''
+    Returns a hash of the subtree of each node that has children, by node
+    id. Each hash covers the node's id, name, content and attributes and
+    the hashes of its children, in order. Leaves are hashed inline, as
+    most nodes are leaves; EML trees are shallow, so recursion is safe.
+    '''
+    hashes = {}
+
+    def visit(node):
+        child_values = []
+        for child in node.children:
+            if child.children:
+                child_values.append(visit(child))
+            else:
+                attributes = child.attributes
+                child_values.append(hash((child.id, child.name, child.content,
+                                          tuple(attributes.items()) if attributes else None)))
+        attributes = node.attributes
+        value = hash((node.id, node.name, node.content,
+                      tuple(attributes.items()) if attributes else None, tuple(child_values)))
+        hashes[node.id] = value
+        return value
+
+    visit(node)
+    return hashes
+
+
+def _new_cache(packageid:str=None, stamp=None):
+    cache = Package_Fragments(stamp)
+    _caches[packageid] = cache
+    _caches.move_to_end(packageid)
+    while len(_caches) > Config.XML_FRAGMENT_CACHE_PACKAGES:
+        _caches.popitem(last=False)
+    return cache
+
+
+def attach_fragments(eml_node:Node=None, packageid:str=None, stamp:list=None):
+    '''
+    Called when a tree has been loaded from the package's JSON file, with
+    the stamp of the file it was read from. Keeps the package's fragments
+    if they were recorded against the same file.
+    '''
+    if eml_node is None or not packageid:
+        return
+    with _lock:
+        cache = _caches.get(packageid)
+        if cache is None or cache.stamp != stamp:
+            cache = _new_cache(packageid, stamp)
+        else:
+            _caches.move_to_end(packageid)
+        cache.root_ids.add(eml_node.id)
+
+
+def _get_cache(eml_node:Node=None, packageid:str=None, json_filename:str=None):
+    if eml_node is None or not packageid:
+        return None
+    with _lock:
+        cache = _caches.get(packageid)
+        if cache is None or eml_node.id not in cache.root_ids:
+            return None
+        if cache.stamp != file_stamp(json_filename):
+            return None
+        return cache
+
+
+def get_fragments(eml_node:Node=None, packageid:str=None, json_filename:str=None):
+    '''
+    Returns the fragment entries to use when serializing eml_node for the
+    package, or None if the tree was not loaded or saved as that package or
+    the package has since been saved by another process.
+    '''
+    cache = _get_cache(eml_node, packageid, json_filename)
+    record_cache_lookup('xml_fragments', cache is not None)
+    return Tree_Entries(cache.fragments, eml_node) if cache is not None else None
+
+
+def has_fragments(eml_node:Node=None, packageid:str=None, json_filename:str=None):
+    # As get_fragments(), for saves that only need to know whether the
+    # fragments are valid; not counted as a cache lookup
+    return _get_cache(eml_node, packageid, json_filename) is not None
+
+
+def get_validation_results(eml_node:Node=None, packageid:str=None, json_filename:str=None):
+    # As for get_fragments()
+    cache = _get_cache(eml_node, packageid, json_filename)
+    record_cache_lookup('validation', cache is not None)
+    return Tree_Entries(cache.validation, eml_node) if cache is not None else None
+
+
+def record_save(eml_node:Node=None, packageid:str=None, stamp:list=None, keep:bool=False):
+    '''
+    Called after the tree has been written to the package's JSON file, with
+    the stamp of the written file. If the fragments were valid before the
+    write (keep), they still describe the tree and are carried over to the
+    new file; otherwise the package starts again with an empty cache bound
+    to this tree.
+    '''
+    if eml_node is None or not packageid:
+        return
+    with _lock:
+        cache = _caches.get(packageid)
+        if keep and cache is not None:
+            cache.stamp = stamp
+            _caches.move_to_end(packageid)
+        else:
+            cache = _new_cache(packageid, stamp)
+        cache.root_ids.add(eml_node.id)
+
+
+def cache_stats():
+    '''
+    Returns the number of packages cached in this process, their fragment
+    and validation entries, and an estimate of the bytes the entries hold.
+    '''
+    with _lock:
+        packages = len(_caches)
+        fragments = [value for cache in _caches.values() for _, value in cache.fragments.values()]
+        validation = [value for cache in _caches.values() for _, value in cache.validation.values()]
+    size = 0
+    # A fragment's chunks are shared with the fragments of its ancestors
+    seen = set()
+    for _, chunks in fragments:
+        size += sys.getsizeof(chunks)
+        for chunk in chunks:
+            if id(chunk) not in seen:
+                seen.add(id(chunk))
+                size += sys.getsizeof(chunk)
+    # Messages are shared with the results of the ancestors too
+    for results in validation:
+        for messages in results.values():
+            size += sys.getsizeof(messages)
+            for message in messages:
+                if id(message) not in seen:
+                    seen.add(id(message))
+                    size += sys.getsizeof(message)
+    return {
+        'packages': packages,
+        'fragment_entries': len(fragments),
+        'validation_entries': len(validation),
+        'bytes': size
+    }
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: import_archive.py
+
+:Synopsis:
+    Bulk import of EML documents from a zip archive. The XML members of
+    the archive are extracted into an upload scratch directory and parsed
+    in a process pool; the parent process writes each document into the
+    user's document store under its packageId and reports a result for
+    every member of the archive.
+
+    The pool's processes are spawned rather than forked (see
+    process_pool.py).
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import collections
+import concurrent.futures
+import os
+import zipfile
+
+import daiquiri
+from werkzeug.utils import secure_filename
+
+from webapp.auth.user_data import (
+    get_user_document_list, get_user_folder_name
+)
+
+from webapp.config import Config
+
+from webapp.home.document_lock import document_lock
+
+from webapp.home.metapype_client import (
+    read_xml_file, save_eml_str, serialize_eml
+)
+
+from webapp.home.process_pool import spawn_context
+
+
+logger = daiquiri.getLogger('import_archive: ' + __name__)
+
+# Outcomes of importing one member of an archive
+IMPORTED = 'imported'
+REPLACED = 'replaced'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+Import_Result = collections.namedtuple(
+    'Import_Result',
+    ["filename", "packageid", "status", "message"],
+    rename=False)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def is_eml_member(info:zipfile.ZipInfo=None):
+    name = info.filename
+    basename = os.path.basename(name)
+    return not info.is_dir() and \
+           not name.startswith('__MACOSX/') and \
+           not basename.startswith('.') and \
+           basename.lower().endswith('.xml')
+
+
+def extract_eml_members(archive_path:str=None, scratch_dir:str=None):
+    '''
+    Extracts the XML members of a zip archive into the scratch directory
+    and returns a list of (member name, extracted path) tuples in archive
+    order. Members are written under sanitized, numbered names, so paths
+    in the archive cannot escape the scratch directory or collide. The
+    member count and the number of bytes actually decompressed are checked
+    against the configured limits, rather than the sizes the archive
+    claims for itself.
+    '''
+    members = []
+    total_bytes = 0
+    with zipfile.ZipFile(archive_path) as archive:
+        infos = [info for info in archive.infolist() if is_eml_member(info)]
+        if len(infos) > Config.MAX_IMPORT_ARCHIVE_FILES:
+            raise Exception(f"The archive contains {len(infos)} XML files; "
+                            f"at most {Config.MAX_IMPORT_ARCHIVE_FILES} can be imported at once")
+        for i, info in enumerate(infos):
+            filename = secure_filename(os.path.basename(info.filename)) or 'metadata.xml'
+            path = f'{scratch_dir}/{i:05d}_{filename}'
+            with archive.open(info) as src, open(path, 'wb') as dst:
+                while True:
+                    buffer = src.read(COPY_BUFFER_SIZE)
+                    if not buffer:
+                        break
+                    total_bytes += len(buffer)
+                    if total_bytes > Config.MAX_IMPORT_ARCHIVE_BYTES:
+                        raise Exception(f"The archive expands to more than "
+                                        f"{Config.MAX_IMPORT_ARCHIVE_BYTES} bytes")
+                    dst.write(buffer)
+            members.append((info.filename, path))
+    return members
+
+
+def parse_eml_file(path:str=None):
+    '''
+    Runs in a worker process. Returns (packageid, json_str, xml_str, error)
+    so that only strings cross the process boundary; the Node tree itself
+    stays in the worker.
+    '''
+    try:
+        eml_node = read_xml_file(path)
+        if not eml_node:
+            return None, None, None, 'No EML content found'
+        packageid = eml_node.attribute_value('packageId')
+        if not packageid:
+            return None, None, None, 'Unable to determine packageId'
+        json_str = serialize_eml(eml_node, 'json')
+        xml_str = serialize_eml(eml_node, 'xml')
+        return packageid, json_str, xml_str, None
+    except Exception as e:
+        return None, None, None, str(e)
+
+
+def is_valid_packageid(packageid:str=None):
+    # The packageId becomes a file name in the user's folder
+    return packageid and os.path.basename(packageid) == packageid and not packageid.startswith('.')
+
+
+def import_archive(archive_path:str=None, scratch_dir:str=None, overwrite:bool=False):
+    '''
+    Imports every EML document in a zip archive into the current user's
+    document store. Returns a list of Import_Result, one per XML member.
+    A document whose packageId already exists is skipped unless overwrite
+    is set; within one archive, the first document with a given packageId
+    wins.
+    '''
+    results = []
+    members = extract_eml_members(archive_path, scratch_dir)
+    if not members:
+        return results
+
+    user_folder = get_user_folder_name()
+    existing_packageids = set(get_user_document_list())
+    imported_packageids = set()
+
+    max_workers = min(Config.IMPORT_ARCHIVE_WORKERS, len(members))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=spawn_context) as executor:
+        paths = [path for _, path in members]
+        for (member_name, _), parsed in zip(members, executor.map(parse_eml_file, paths)):
+            packageid, json_str, xml_str, error = parsed
+            if error:
+                results.append(Import_Result(member_name, packageid, FAILED, error))
+            elif not is_valid_packageid(packageid):
+                results.append(Import_Result(member_name, packageid, FAILED,
+                                             'The packageId cannot be used as a document name'))
+            elif packageid in imported_packageids:
+                results.append(Import_Result(member_name, packageid, SKIPPED,
+                                             'An earlier file in the archive has the same packageId'))
+            elif packageid in existing_packageids and not overwrite:
+                results.append(Import_Result(member_name, packageid, SKIPPED,
+                                             'A document with this packageId already exists'))
+            else:
+                try:
+                    with document_lock(packageid, user_folder):
+                        save_eml_str(packageid=packageid, metadata_str=json_str, format='json', user_folder=user_folder)
+                        save_eml_str(packageid=packageid, metadata_str=xml_str, format='xml', user_folder=user_folder)
+                    status = REPLACED if packageid in existing_packageids else IMPORTED
+                    results.append(Import_Result(member_name, packageid, status, ''))
+                    imported_packageids.add(packageid)
+                except Exception as e:
+                    logger.error(e)
+                    results.append(Import_Result(member_name, packageid, FAILED, str(e)))
+    return results
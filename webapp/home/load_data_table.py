@@ -12,10 +12,22 @@
     5/9/19
 """
 
+import collections
 import os
 import re
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as pds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pds = None
+    pq = None
+
 from metapype.eml2_1_1.exceptions import MetapypeRuleError
 from metapype.eml2_1_1 import export
 from metapype.eml2_1_1 import evaluate
@@ -26,9 +38,14 @@ from metapype.model import mp_io
 from metapype.model.node import Node
 
 from webapp.home.metapype_client import ( 
-    add_child
+    add_child, build_subtree, create_geographic_coverage,
+    create_temporal_coverage, Node_Spec
 )
 
+from webapp.instrumentation.memory import track_data_frame
+
+from webapp.instrumentation.timing import timed
+
 
 def get_file_size(full_path:str=''):
     file_size = None
@@ -56,133 +73,564 @@ def is_datetime_column(col:str=None):
     return is_datetime
 
 
-def load_data_table(dataset_node:Node=None, uploads_path:str=None, data_file:str=''):
+# Sentinel values commonly used to flag missing data, mapped to the
+# codeExplanation emitted for them. Blank cells are always treated as
+# missing but are not emitted as a missingValueCode.
+MISSING_VALUE_CODES = {
+    '-9999': 'Missing value',
+    '-9999.0': 'Missing value',
+    '-999': 'Missing value',
+    '-999.0': 'Missing value',
+    'NA': 'Not available',
+    'N/A': 'Not available',
+    'NaN': 'Not a number',
+    'nan': 'Not a number',
+    'NULL': 'Null value',
+}
+
+BOOLEAN_VALUES = ['true', 'false']
+
+# Columnar formats that are profiled from their file metadata rather than
+# by reading the data, mapped to the formatName used in the EML
+ARROW_FORMATS = {
+    'parquet': 'Apache Parquet',
+    'feather': 'Apache Arrow IPC',
+    'arrow': 'Apache Arrow IPC',
+}
+
+
+# Column names recognized as holding latitudes and longitudes
+LATITUDE_NAMES = {'lat', 'latitude'}
+LONGITUDE_NAMES = {'lon', 'long', 'lng', 'longitude'}
+
+# Above this many distinct stations, only the bounding box is added
+MAX_STATIONS = 50
+
+
+# minimum and maximum hold the range of values found in numeric and date
+# columns, when it can be determined
+Column_Profile = collections.namedtuple(
+    'Column_Profile',
+    ["name", "dtype", "missing_value_codes", "minimum", "maximum"],
+    defaults=(None, None),
+    rename=False)
+
+
+def find_missing_value_codes(column:pd.Series=None):
+    '''
+    Returns a dict of the candidate missing value codes found in the column
+    along with their explanations. The column is expected to hold the raw
+    string values as read from the data file.
+    '''
+    missing_value_codes = {}
+    if column is not None:
+        counts = column[column.isin(MISSING_VALUE_CODES)].value_counts()
+        for code in counts.index:
+            missing_value_codes[code] = MISSING_VALUE_CODES[code]
+    return missing_value_codes
+
+
+def is_missing_value(column:pd.Series=None, missing_value_codes:dict=None):
+    # column holds stripped string values
+    return column.eq('') | column.isin(missing_value_codes or {})
+
+
+def infer_column_dtype(column:pd.Series=None):
+    '''
+    Infers a dtype string ('bool', 'int64', 'float64', or 'object') for a
+    column of raw string values from which missing values have already been 
+    removed. For numeric columns the parsed numbers are returned as well.
+    '''
+    dtype = 'object'
+    numbers = None
+    if column is not None and not column.empty:
+        if column.str.lower().isin(BOOLEAN_VALUES).all():
+            dtype = 'bool'
+        else:
+            numbers = pd.to_numeric(column, errors='coerce')
+            if numbers.notna().all():
+                if column.str.contains('[.eE]').any():
+                    dtype = 'float64'
+                else:
+                    dtype = 'int64'
+            else:
+                numbers = None
+    return dtype, numbers
+
+
+def profile_columns(data_frame:pd.DataFrame=None):
+    '''
+    Profiles the columns of a data frame of raw string values, detecting 
+    missing value codes and excluding them, along with blank cells, before 
+    the column type is inferred.
+    '''
+    profiles = []
+    if data_frame is not None:
+        for col in data_frame.columns:
+            column = data_frame[col].str.strip()
+            missing_value_codes = find_missing_value_codes(column)
+            is_missing = is_missing_value(column, missing_value_codes)
+            values = column[~is_missing]
+            dtype, numbers = infer_column_dtype(values)
+            minimum = None
+            maximum = None
+            if numbers is not None:
+                minimum = numbers.min()
+                maximum = numbers.max()
+            elif dtype == 'object' and is_datetime_column(col):
+                dates = pd.to_datetime(values, errors='coerce').dropna()
+                if not dates.empty:
+                    minimum = dates.min()
+                    maximum = dates.max()
+            profiles.append(Column_Profile(name=col,
+                                           dtype=dtype,
+                                           missing_value_codes=missing_value_codes,
+                                           minimum=minimum,
+                                           maximum=maximum))
+    return profiles
+
+
+def is_date_profile(profile:Column_Profile=None):
+    return profile.dtype.startswith('datetime') or \
+           (profile.dtype == 'object' and is_datetime_column(profile.name))
+
+
+def temporal_range(profiles:list=None):
+    '''
+    Returns the earliest and latest dates found across the date columns, 
+    formatted as calendar dates, or (None, None) if there are none.
+    '''
+    begin_date = None
+    end_date = None
+    if profiles:
+        for profile in profiles:
+            if is_date_profile(profile) and profile.minimum is not None:
+                # Parquet statistics may be dates or datetimes, which do not
+                # compare with each other, so normalize them to timestamps
+                minimum = pd.Timestamp(profile.minimum).tz_localize(None)
+                maximum = pd.Timestamp(profile.maximum).tz_localize(None)
+                if begin_date is None or minimum < begin_date:
+                    begin_date = minimum
+                if end_date is None or maximum > end_date:
+                    end_date = maximum
+    if begin_date is not None:
+        return begin_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+    return None, None
+
+
+def find_or_add_coverage(parent_node:Node=None):
+    coverage_node = parent_node.find_child(names.COVERAGE)
+    if not coverage_node:
+        coverage_node = Node(names.COVERAGE, parent=parent_node)
+        add_child(parent_node, coverage_node)
+    return coverage_node
+
+
+def add_temporal_coverage(parent_node:Node=None, profiles:list=None):
+    tc_node = None
+    begin_date, end_date = temporal_range(profiles)
+    if parent_node and begin_date:
+        coverage_node = find_or_add_coverage(parent_node)
+        tc_node = Node(names.TEMPORALCOVERAGE, parent=coverage_node)
+        create_temporal_coverage(tc_node, begin_date, end_date)
+        add_child(coverage_node, tc_node)
+    return tc_node
+
+
+def data_file_extension(filename:str=''):
+    extension = ''
+    if filename and '.' in filename:
+        extension = filename.rsplit('.', 1)[1].lower()
+    return extension
+
+
+def field_delimiter(filename:str=''):
+    return '\t' if data_file_extension(filename) == 'tsv' else ','
+
+
+def is_arrow_data_file(filename:str=''):
+    return data_file_extension(filename) in ARROW_FORMATS
+
+
+def arrow_type_to_dtype(arrow_type=None):
+    dtype = 'object'
+    if arrow_type is not None:
+        if pa.types.is_boolean(arrow_type):
+            dtype = 'bool'
+        elif pa.types.is_integer(arrow_type):
+            dtype = 'int64'
+        elif pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+            dtype = 'float64'
+        elif pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+            dtype = 'datetime64'
+    return dtype
+
+
+def profile_parquet_file(full_path:str=None):
+    '''
+    Profiles a Parquet file using only its footer: the schema, the row count,
+    and the per row group min/max statistics. No data pages are read.
+    '''
+    parquet_file = pq.ParquetFile(full_path)
+    metadata = parquet_file.metadata
+    schema = parquet_file.schema_arrow
+
+    # Statistics are kept per leaf column, so map top-level field names to
+    # their column index. Nested fields get no statistics.
+    column_indexes = {}
+    for i in range(metadata.num_columns):
+        column_indexes[metadata.schema.column(i).path] = i
+
+    profiles = []
+    for field in schema:
+        dtype = arrow_type_to_dtype(field.type)
+        minimum = None
+        maximum = None
+        i = column_indexes.get(field.name)
+        if i is not None and dtype in ('int64', 'float64', 'datetime64'):
+            for rg in range(metadata.num_row_groups):
+                stats = metadata.row_group(rg).column(i).statistics
+                if stats is not None and not stats.has_min_max and stats.num_values == 0:
+                    continue  # an all-null row group says nothing about bounds
+                if stats is None or not stats.has_min_max:
+                    minimum = maximum = None
+                    break
+                if minimum is None or stats.min < minimum:
+                    minimum = stats.min
+                if maximum is None or stats.max > maximum:
+                    maximum = stats.max
+        profiles.append(Column_Profile(name=field.name,
+                                       dtype=dtype,
+                                       missing_value_codes={},
+                                       minimum=minimum,
+                                       maximum=maximum))
+
+    # The statistics of dates held as strings compare them as strings, so
+    # the range of those columns is found by reading just those columns
+    date_columns = [profile.name for profile in profiles
+                    if profile.dtype == 'object' and is_date_profile(profile)]
+    bounds = arrow_column_bounds(pds.dataset(full_path, format='parquet'), date_columns)
+    profiles = [profile._replace(minimum=bounds[profile.name][0], maximum=bounds[profile.name][1])
+                if profile.name in bounds else profile for profile in profiles]
+    return profiles, metadata.num_rows
+
+
+def needs_bounds(name:str=None, dtype:str=None):
+    # The columns whose range is used to derive coverage
+    if dtype in ('int64', 'float64'):
+        return is_latitude_column(name) or is_longitude_column(name)
+    return is_date_profile(Column_Profile(name=name, dtype=dtype, missing_value_codes={}))
+
+
+def arrow_column_bounds(dataset=None, columns:list=None):
+    '''
+    Returns {column: (minimum, maximum)} for the given columns of an Arrow
+    dataset, reading only those columns, a record batch at a time. String
+    columns are parsed as dates. Nulls and unparseable strings are ignored;
+    a column with no values has no entry.
+    '''
+    bounds = {}
+    if not columns:
+        return bounds
+    for batch in dataset.to_batches(columns=columns):
+        for name, array in zip(batch.schema.names, batch.columns):
+            if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+                dates = pd.to_datetime(array.to_pandas(), errors='coerce').dropna()
+                if dates.empty:
+                    continue
+                minimum = dates.min()
+                maximum = dates.max()
+            else:
+                min_max = pc.min_max(array)
+                minimum = min_max['min'].as_py()
+                maximum = min_max['max'].as_py()
+                if minimum is None:
+                    continue
+            if name in bounds:
+                minimum = min(minimum, bounds[name][0])
+                maximum = max(maximum, bounds[name][1])
+            bounds[name] = (minimum, maximum)
+    return bounds
+
+
+def profile_feather_file(full_path:str=None):
+    '''
+    Profiles a Feather (Arrow IPC) file from its schema. The rows are
+    counted from the record batch metadata, so the batches are not read
+    or decompressed. The file has no statistics, so the range of the
+    columns needed for coverage is found by reading just those columns.
+    '''
+    dataset = pds.dataset(full_path, format='ipc')
+    row_count = dataset.count_rows()
+    dtypes = [(field.name, arrow_type_to_dtype(field.type)) for field in dataset.schema]
+    bounds = arrow_column_bounds(dataset, [name for name, dtype in dtypes if needs_bounds(name, dtype)])
+    profiles = []
+    for name, dtype in dtypes:
+        minimum, maximum = bounds.get(name, (None, None))
+        profiles.append(Column_Profile(name=name,
+                                       dtype=dtype,
+                                       missing_value_codes={},
+                                       minimum=minimum,
+                                       maximum=maximum))
+    return profiles, row_count
+
+
+def profile_arrow_file(full_path:str=None, data_file:str=''):
+    if pa is None:
+        raise Exception('Parquet and Feather files require the pyarrow package')
+    if data_file_extension(data_file) == 'parquet':
+        return profile_parquet_file(full_path)
+    else:
+        return profile_feather_file(full_path)
+
+
+def bounds_spec(minimum=None, maximum=None):
+    spec = None
+    if minimum is not None or maximum is not None:
+        children = []
+        if minimum is not None:
+            children.append(Node_Spec(names.MINIMUM, str(minimum), {'exclusive': 'false'}))
+        if maximum is not None:
+            children.append(Node_Spec(names.MAXIMUM, str(maximum), {'exclusive': 'false'}))
+        spec = Node_Spec(names.BOUNDS, children=children)
+    return spec
+
+
+def missing_value_code_specs(missing_value_codes:dict=None):
+    specs = []
+    if missing_value_codes:
+        for code, code_explanation in missing_value_codes.items():
+            specs.append(Node_Spec(names.MISSINGVALUECODE, children=[
+                Node_Spec(names.CODE, code),
+                Node_Spec(names.CODEEXPLANATION, code_explanation)]))
+    return specs
+
+
+def measurement_scale_spec(profile:Column_Profile=None):
+    col = profile.name
+    dtype = profile.dtype
+
+    nominal_spec = Node_Spec(names.NOMINAL, children=[
+        Node_Spec(names.NONNUMERICDOMAIN)])
+    datetime_spec = Node_Spec(names.DATETIME, children=[
+        Node_Spec(names.FORMATSTRING, '')])
+
+    if dtype == 'bool':
+        scale_spec = nominal_spec
+    elif dtype.startswith('datetime'):
+        scale_spec = datetime_spec
+    elif dtype == 'object':
+        if is_datetime_column(col):
+            scale_spec = datetime_spec
+        else:
+            scale_spec = nominal_spec
+    elif dtype.startswith('float') or dtype.startswith('int'):
+        number_type = 'real'
+        if dtype.startswith('int'):
+            number_type = 'integer'
+        scale_spec = Node_Spec(names.RATIO, children=[
+            Node_Spec(names.NUMERICDOMAIN, children=[
+                Node_Spec(names.NUMBERTYPE, number_type),
+                bounds_spec(profile.minimum, profile.maximum)])])
+    else:
+        scale_spec = None
+
+    return Node_Spec(names.MEASUREMENTSCALE, children=[scale_spec])
+
+
+def attribute_spec(profile:Column_Profile=None):
+    col = profile.name
+    return Node_Spec(names.ATTRIBUTE, children=[
+        Node_Spec(names.ATTRIBUTENAME, col),
+        Node_Spec(names.ATTRIBUTELABEL, col),
+        Node_Spec(names.ATTRIBUTEDEFINITION, f'Attribute definition for {col}'),
+        measurement_scale_spec(profile),
+        *missing_value_code_specs(profile.missing_value_codes)])
+
+
+def is_latitude_column(col:str=None):
+    return is_coordinate_column(col, LATITUDE_NAMES, 'latitude')
+
+
+def is_longitude_column(col:str=None):
+    return is_coordinate_column(col, LONGITUDE_NAMES, 'longitude')
+
+
+def is_coordinate_column(col:str=None, coordinate_names:set=None, suffix:str=''):
+    is_coordinate = False
+    if col:
+        for word in re.split('[^a-z]+', str(col).lower()):
+            if word in coordinate_names or word.endswith(suffix):
+                is_coordinate = True
+    return is_coordinate
+
+
+def find_coordinate_columns(profiles:list=None):
+    '''
+    Returns the names of the first latitude and longitude columns, recognized
+    by name and by having values within the valid range, or (None, None).
+    '''
+    lat_col = None
+    lon_col = None
+    if profiles:
+        for profile in profiles:
+            if profile.dtype not in ('int64', 'float64') or profile.minimum is None:
+                continue
+            if not lat_col and is_latitude_column(profile.name) and \
+               -90 <= profile.minimum and profile.maximum <= 90:
+                lat_col = profile.name
+            elif not lon_col and is_longitude_column(profile.name) and \
+               -180 <= profile.minimum and profile.maximum <= 180:
+                lon_col = profile.name
+    if lat_col and lon_col:
+        return lat_col, lon_col
+    return None, None
+
+
+def find_stations(coordinates:pd.DataFrame=None, max_stations:int=MAX_STATIONS):
+    '''
+    Returns the distinct (latitude, longitude) pairs in a two column data 
+    frame, or None if there are more than max_stations of them.
+    '''
+    stations = None
+    if coordinates is not None:
+        coordinates = coordinates.apply(pd.to_numeric, errors='coerce').dropna().drop_duplicates()
+        if len(coordinates) <= max_stations:
+            stations = list(coordinates.itertuples(index=False, name=None))
+    return stations
+
+
+def present_coordinates(data_frame:pd.DataFrame=None, profiles:list=None,
+                        lat_col:str=None, lon_col:str=None):
+    '''
+    Returns the latitude and longitude columns of a data frame of raw
+    string values, with blank cells and the columns' missing value codes
+    replaced by NaN, so that they are not taken for stations.
+    '''
+    missing_value_codes = {profile.name: profile.missing_value_codes for profile in profiles}
+    columns = {}
+    for col in (lat_col, lon_col):
+        column = data_frame[col].str.strip()
+        columns[col] = column.mask(is_missing_value(column, missing_value_codes.get(col)))
+    return pd.DataFrame(columns)
+
+
+def read_arrow_columns(full_path:str=None, data_file:str='', columns:list=None):
+    if data_file_extension(data_file) == 'parquet':
+        table = pq.read_table(full_path, columns=columns)
+    else:
+        table = pds.dataset(full_path, format='ipc').to_table(columns=columns)
+    return table.to_pandas()
+
+
+def add_geographic_coverage(parent_node:Node=None, description:str=None,
+                            wbc=None, ebc=None, nbc=None, sbc=None):
+    coverage_node = find_or_add_coverage(parent_node)
+    gc_node = Node(names.GEOGRAPHICCOVERAGE, parent=coverage_node)
+    create_geographic_coverage(gc_node, description, str(wbc), str(ebc), str(nbc), str(sbc))
+    add_child(coverage_node, gc_node)
+    return gc_node
+
+
+def add_geographic_coverages(parent_node:Node=None, profiles:list=None, data_file:str='',
+                             coordinates=None):
+    '''
+    Adds a geographicCoverage with the bounding box of the latitude and 
+    longitude columns. coordinates, if given, is a callable returning those
+    two columns as a data frame; each distinct station in them is then added
+    as a point coverage as well.
+    '''
+    gc_nodes = []
+    lat_col, lon_col = find_coordinate_columns(profiles)
+    if parent_node and lat_col:
+        lat = next(profile for profile in profiles if profile.name == lat_col)
+        lon = next(profile for profile in profiles if profile.name == lon_col)
+        description = f'Bounding box of columns {lat_col} and {lon_col} in {data_file}'
+        gc_nodes.append(add_geographic_coverage(parent_node, description,
+                                                lon.minimum, lon.maximum,
+                                                lat.maximum, lat.minimum))
+        if coordinates:
+            stations = find_stations(coordinates(lat_col, lon_col))
+            if stations:
+                for station_lat, station_lon in stations:
+                    description = f'Station at latitude {station_lat}, longitude {station_lon}'
+                    gc_nodes.append(add_geographic_coverage(parent_node, description,
+                                                            station_lon, station_lon,
+                                                            station_lat, station_lat))
+    return gc_nodes
+
+
+@timed('profile_data')
+def load_data_table(dataset_node:Node=None, uploads_path:str=None, data_file:str='',
+                    temporal_coverage:str=None, geographic_coverage:str=None,
+                    stations:bool=False):
+    '''
+    Profiles a data file and adds a dataTable describing it to the dataset.
+    If temporal_coverage is 'entity' or 'dataset', a temporalCoverage spanning
+    the dates found in the date columns is also added to the data table or 
+    to the dataset, respectively. Likewise, geographic_coverage adds the 
+    bounding box of the latitude and longitude columns and, if stations is
+    set, a point coverage for each distinct station.
+
+    Returns the dataTable node and a list of messages for the user about
+    requested coverage that could not be derived from the file.
+    '''
     full_path = f'{uploads_path}/{data_file}'
-    datatable_node = Node(names.DATATABLE, parent=dataset_node)
-    add_child(dataset_node, datatable_node)
-
-    physical_node = Node(names.PHYSICAL, parent=datatable_node)
-    add_child(datatable_node, physical_node)
-    physical_node.add_attribute('system', 'EDI')
-
-    entity_name_node = Node(names.ENTITYNAME, parent=datatable_node)
-    add_child(datatable_node, entity_name_node)
-    entity_name = entity_name_from_data_file(data_file)
-    entity_name_node.content = entity_name
-
-    object_name_node = Node(names.OBJECTNAME, parent=physical_node)
-    add_child(physical_node, object_name_node)
-    object_name_node.content = data_file
 
+    if is_arrow_data_file(data_file):
+        profiles, row_count = profile_arrow_file(full_path, data_file)
+        coordinates = lambda lat_col, lon_col: \
+            read_arrow_columns(full_path, data_file, [lat_col, lon_col])
+        format_spec = Node_Spec(names.EXTERNALLYDEFINEDFORMAT, children=[
+            Node_Spec(names.FORMATNAME, ARROW_FORMATS[data_file_extension(data_file)])])
+    else:
+        # Read every cell as a string so that missing value codes can be
+        # detected and excluded before the column types are inferred
+        data_frame = pd.read_csv(full_path, comment='#', dtype=str,
+                                 keep_default_na=False,
+                                 sep=field_delimiter(data_file))
+        track_data_frame(data_frame)
+        row_count = data_frame.shape[0]
+        profiles = profile_columns(data_frame)
+        coordinates = lambda lat_col, lon_col: \
+            present_coordinates(data_frame, profiles, lat_col, lon_col)
+        format_spec = Node_Spec(names.TEXTFORMAT, children=[
+            Node_Spec(names.NUMHEADERLINES, '1'),
+            Node_Spec(names.NUMFOOTERLINES, '0')])
+
+    size_spec = None
     file_size = get_file_size(full_path)
     if file_size is not None:
-        size_node = Node(names.SIZE, parent=physical_node)
-        add_child(physical_node, size_node)
-        size_node.add_attribute('unit', 'byte')
-        size_node.content = str(file_size)
-
-    data_format_node = Node(names.DATAFORMAT, parent=physical_node)
-    add_child(physical_node, data_format_node)
-
-    text_format_node = Node(names.TEXTFORMAT, parent=data_format_node)
-    add_child(data_format_node, text_format_node)
-
-    num_header_lines_node = Node(names.NUMHEADERLINES, parent=text_format_node)
-    add_child(text_format_node, num_header_lines_node)
-    num_header_lines_node.content = '1'
-    
-    num_footer_lines_node = Node(names.NUMFOOTERLINES, parent=text_format_node)
-    add_child(text_format_node, num_footer_lines_node)
-    num_footer_lines_node.content = '0'
-
-    data_frame = pd.read_csv(full_path, comment='#')
-
-    if data_frame is not None:
-
-        number_of_records = Node(names.NUMBEROFRECORDS, parent=datatable_node)
-        add_child(datatable_node, number_of_records)
-        row_count = data_frame.shape[0]
-        number_of_records.content = f'{row_count}'
-
-        attribute_list_node = Node(names.ATTRIBUTELIST, parent=datatable_node)
-        add_child(datatable_node, attribute_list_node)
-
-        columns = data_frame.columns
-
-        for col in columns:
-            dtype = str(data_frame[col].dtype)
-            print(f'{col}: {dtype}')
-
-            attribute_node = Node(names.ATTRIBUTE, parent=attribute_list_node)
-            add_child(attribute_list_node, attribute_node)
-        
-            attribute_name_node = Node(names.ATTRIBUTENAME, parent=attribute_node)
-            add_child(attribute_node, attribute_name_node)
-            attribute_name_node.content = col
-        
-            att_label_node = Node(names.ATTRIBUTELABEL, parent=attribute_node)
-            add_child(attribute_node, att_label_node)
-            att_label_node.content = col
-        
-            att_def_node = Node(names.ATTRIBUTEDEFINITION, parent=attribute_node)
-            add_child(attribute_node, att_def_node)
-            att_def_node.content = f'Attribute definition for {col}'
-        
-            ms_node = Node(names.MEASUREMENTSCALE, parent=attribute_node)
-            add_child(attribute_node, ms_node)
-
-            if dtype == 'bool':
-
-                nominal_node = Node(names.NOMINAL, parent=ms_node)
-                add_child(ms_node, nominal_node)
-
-                non_numeric_domain_node = Node(names.NONNUMERICDOMAIN, parent=nominal_node)
-                add_child(nominal_node, non_numeric_domain_node)
-
-            elif dtype == 'object':
-
-                if is_datetime_column(col):
-                    datetime_node = Node(names.DATETIME, parent=ms_node)
-                    add_child(ms_node, datetime_node)
-
-                    format_string_node = Node(names.FORMATSTRING, parent=datetime_node)
-                    add_child(datetime_node, format_string_node)
-                    format_string_node.content = ''
-
-                else:
-                    nominal_node = Node(names.NOMINAL, parent=ms_node)
-                    add_child(ms_node, nominal_node)
-
-                    non_numeric_domain_node = Node(names.NONNUMERICDOMAIN, parent=nominal_node)
-                    add_child(nominal_node, non_numeric_domain_node)
-
-            elif dtype.startswith('float') or dtype.startswith('int'):
-
-                number_type = 'real'
-                if dtype.startswith('int'):
-                    number_type = 'integer'
-
-                ratio_node = Node(names.RATIO, parent=ms_node)
-                add_child(ms_node, ratio_node)
-
-                numeric_domain_ratio_node = Node(names.NUMERICDOMAIN, parent=ratio_node)
-                add_child(ratio_node, numeric_domain_ratio_node)
-
-                number_type_ratio_node = Node(names.NUMBERTYPE, parent=numeric_domain_ratio_node)
-                add_child(numeric_domain_ratio_node, number_type_ratio_node)
-                number_type_ratio_node.content = number_type
+        size_spec = Node_Spec(names.SIZE, str(file_size), {'unit': 'byte'})
+
+    # The whole data table is described by one spec and built in a single
+    # pass; only its root is inserted with the rule-aware add_child()
+    datatable_spec = Node_Spec(names.DATATABLE, children=[
+        Node_Spec(names.ENTITYNAME, entity_name_from_data_file(data_file)),
+        Node_Spec(names.PHYSICAL, attributes={'system': 'EDI'}, children=[
+            Node_Spec(names.OBJECTNAME, data_file),
+            size_spec,
+            Node_Spec(names.DATAFORMAT, children=[format_spec])]),
+        Node_Spec(names.ATTRIBUTELIST, children=[
+            attribute_spec(profile) for profile in profiles]),
+        Node_Spec(names.NUMBEROFRECORDS, f'{row_count}')])
+
+    datatable_node = build_subtree(datatable_spec, parent_node=dataset_node)
+    add_child(dataset_node, datatable_node)
 
-    delete_data_files(uploads_path)
+    messages = []
+    coverage_parents = {'entity': datatable_node, 'dataset': dataset_node}
 
-    return datatable_node
+    if temporal_coverage in coverage_parents:
+        if not add_temporal_coverage(coverage_parents[temporal_coverage], profiles):
+            messages.append(f'No dates were found in {data_file}, so no temporal coverage was added')
 
+    if not stations:
+        coordinates = None
+    if geographic_coverage in coverage_parents:
+        if not add_geographic_coverages(coverage_parents[geographic_coverage], profiles, data_file,
+                                        coordinates):
+            messages.append(f'No latitude and longitude columns were found in {data_file}, '
+                            f'so no geographic coverage was added')
 
-def delete_data_files(data_folder:str=None):
-    if data_folder:
-        for data_file in os.listdir(data_folder):
-            file_path = os.path.join(data_folder, data_file)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-            except Exception as e:
-                print(e)
+    return datatable_node, messages
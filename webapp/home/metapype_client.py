@@ -16,9 +16,10 @@ import daiquiri
 import html
 import json
 import os
+from xml.etree import ElementTree
 
 from flask import (
-    send_file
+    Response, send_file, stream_with_context
 )
 
 from flask_login import (
@@ -31,7 +32,38 @@ from webapp.auth.user_data import (
 
 from webapp.config import Config
 
-from metapype.eml2_1_1 import export, evaluate, validate, names, rule
+from webapp.instrumentation.metrics import (
+    record_document_save, record_load
+)
+
+from webapp.instrumentation.timing import (
+    phase_timer, timed
+)
+
+from webapp.home.document_lock import (
+    check_version, document_lock, record_version
+)
+
+from webapp.home.document_store import (
+    fd_stamp, save_document
+)
+
+from webapp.home.fragment_cache import (
+    attach_fragments, get_fragments, get_validation_results, has_fragments,
+    record_save
+)
+
+from webapp.home.validation import (
+    check_subtree, errors
+)
+
+from webapp.home.validation_report import schedule_report
+
+from webapp.home.xml_writer import (
+    eml_chunks, iter_eml
+)
+
+from metapype.eml2_1_1 import export, evaluate, names, rule
 from metapype.model.node import Node, Shift
 from metapype.model import mp_io
 
@@ -477,6 +509,69 @@ def add_child(parent_node:Node, child_node:Node):
         parent_node.add_child(child_node, index=index)
 
 
+Node_Spec = collections.namedtuple(
+    'Node_Spec',
+    ["name", "content", "attributes", "children"],
+    defaults=(None, None, None),
+    rename=False)
+
+
+# Most node ids drawn from the system's random source at a time by
+# node_ids(); blocks start small so small subtrees don't pay for unused ids
+MAX_NODE_ID_BLOCK = 1024
+
+
+def new_node_ids(count:int=1):
+    '''
+    Returns count random (version 4) UUID strings made from a single read
+    of the system's random source. Node() otherwise makes a time-based
+    uuid1 for each node, which dominates the cost of building large
+    subtrees.
+    '''
+    h = os.urandom(16 * count).hex()
+    return [f'{h[i:i + 8]}-{h[i + 8:i + 12]}-4{h[i + 13:i + 16]}-'
+            f'{"89ab"[int(h[i + 16], 16) & 3]}{h[i + 17:i + 20]}-{h[i + 20:i + 32]}'
+            for i in range(0, 32 * count, 32)]
+
+
+def node_ids(block_size:int=16):
+    while True:
+        yield from new_node_ids(block_size)
+        block_size = min(2 * block_size, MAX_NODE_ID_BLOCK)
+
+
+def build_subtree(spec:Node_Spec=None, parent_node:Node=None):
+    '''
+    Builds a whole subtree from a Node_Spec in a single pass and returns its
+    root node. The children of each spec must already be listed in schema
+    order: they are appended in that order without the per-child rule lookup
+    done by add_child(), and node ids are generated in blocks rather than
+    one uuid1 per node, which is what makes building wide subtrees such as
+    an attributeList cheap (see benchmarks.bench_subtree). The root node is
+    not added to parent_node; use add_child() for that so it lands at the
+    right position.
+    '''
+    if not spec:
+        return None
+    ids = node_ids()
+    root_node = Node(spec.name, id=next(ids), parent=parent_node)
+    stack = [(root_node, spec)]
+    while stack:
+        node, node_spec = stack.pop()
+        if node_spec.content is not None:
+            node.content = node_spec.content
+        if node_spec.attributes:
+            for name, value in node_spec.attributes.items():
+                node.add_attribute(name, value)
+        if node_spec.children:
+            for child_spec in node_spec.children:
+                if child_spec:
+                    child_node = Node(child_spec.name, id=next(ids), parent=node)
+                    node.add_child(child_node)
+                    stack.append((child_node, child_spec))
+    return root_node
+
+
 def move_up(parent_node:Node, child_node:Node):
     if parent_node and child_node:
         parent_node.shift(child_node, Shift.LEFT)
@@ -542,17 +637,26 @@ def compose_simple_label(rp_node:Node=None, child_node_name:str=''):
     return label
 
 
-def load_eml(packageid:str=None):
+@timed('load_eml')
+def load_eml(packageid:str=None, user_folder:str=None):
     eml_node = None
-    user_folder = get_user_folder_name()
+    if not user_folder:
+        user_folder = get_user_folder_name()
     if not user_folder:
         user_folder = '.'
     filename = f"{user_folder}/{packageid}.json"
     if os.path.isfile(filename):
         try:
             with open(filename, "r") as json_file:
+                # Taken on the handle, as a save may replace the file once read
+                stamp = fd_stamp(json_file.fileno())
                 json_obj = json.load(json_file)
+                json_bytes = json_file.tell()
+            with phase_timer('parse_json'):
                 eml_node = mp_io.from_json(json_obj)
+            attach_fragments(eml_node, packageid, stamp)
+            record_version(eml_node, packageid, stamp)
+            record_load(eml_node, json_bytes)
         except Exception as e:
             logger.error(e)
     return eml_node
@@ -586,36 +690,96 @@ def save_old_to_new(old_packageid:str=None, new_packageid:str=None, eml_node:Nod
     return msg
 
 
-def save_both_formats(packageid:str=None, eml_node:Node=None):
-    save_eml(packageid=packageid, eml_node=eml_node, format='json')
-    save_eml(packageid=packageid, eml_node=eml_node, format='xml')
+@timed('save')
+def save_both_formats(packageid:str=None, eml_node:Node=None, user_folder:str=None):
+    # Held across both saves so another request cannot save in between
+    user_folder = os.path.dirname(get_eml_filename(packageid, 'json', user_folder))
+    with document_lock(packageid, user_folder):
+        save_eml(packageid=packageid, eml_node=eml_node, format='json', user_folder=user_folder)
+        save_eml(packageid=packageid, eml_node=eml_node, format='xml', user_folder=user_folder)
+    schedule_report(packageid, user_folder)
+
 
+def save_eml(packageid:str=None, eml_node:Node=None, format:str='json', user_folder:str=None):
+    with phase_timer(f'save_{format}'):
+        _save_eml(packageid, eml_node, format, user_folder)
 
-def save_eml(packageid:str=None, eml_node:Node=None, format:str='json'):
+
+def _save_eml(packageid:str=None, eml_node:Node=None, format:str='json', user_folder:str=None):
     if packageid:
         if eml_node is not None:
+            json_filename = get_eml_filename(packageid, 'json', user_folder)
             metadata_str = None
-
-            if format == 'json':
-                metadata_str = mp_io.to_json(eml_node)
-            elif format == 'xml':
-                xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
-                xml_str = export.to_xml(eml_node)
-                metadata_str = xml_declaration + xml_str
-            
-            if metadata_str:
-                user_folder = get_user_folder_name()
-                if not user_folder:
-                    user_folder = '.'
-                filename = f'{user_folder}/{packageid}.{format}'
-                with open(filename, "w") as fh:
-                    fh.write(metadata_str)
+            if format != 'xml':
+                # Serialized before taking the lock to keep the lock short
+                metadata_str = serialize_eml(eml_node, format)
+            with document_lock(packageid, os.path.dirname(json_filename)):
+                check_version(eml_node, packageid, json_filename)
+                if format == 'xml':
+                    xml_filename = get_eml_filename(packageid, format, user_folder)
+                    fragments = get_fragments(eml_node, packageid, json_filename)
+                    if fragments is not None:
+                        # The cached chunks are cheap to digest before deciding to write
+                        chunks = eml_chunks(eml_node, fragments)
+                    else:
+                        # Kept as a list of large chunks so that they can be digested
+                        # and then written without rendering the document twice
+                        chunks = list(iter_eml(eml_node))
+                    written, _ = save_document(xml_filename, chunks)
+                    record_document_save(format, xml_filename, written)
+                elif metadata_str:
+                    # Whether the cached fragments still describe this tree
+                    keep = has_fragments(eml_node, packageid, json_filename)
+                    written, stamp = save_eml_str(packageid=packageid, metadata_str=metadata_str, format=format,
+                                                  user_folder=user_folder)
+                    record_document_save(format, get_eml_filename(packageid, format, user_folder), written)
+                    record_save(eml_node, packageid, stamp, keep=keep)
+                    record_version(eml_node, packageid, stamp)
         else:
             raise Exception(f"No EML node was supplied for saving EML.")
     else:
         raise Exception(f"No packageid value was supplied for saving EML.")
 
 
+def serialize_eml(eml_node:Node=None, format:str='json'):
+    metadata_str = None
+    if format == 'json':
+        metadata_str = mp_io.to_json(eml_node)
+    elif format == 'xml':
+        metadata_str = ''.join(iter_eml(eml_node))
+    return metadata_str
+
+
+def get_eml_filename(packageid:str=None, format:str='json', user_folder:str=None):
+    if not user_folder:
+        user_folder = get_user_folder_name()
+    if not user_folder:
+        user_folder = '.'
+    return f'{user_folder}/{packageid}.{format}'
+
+
+def save_eml_str(packageid:str=None, metadata_str:str=None, format:str='json', user_folder:str=None):
+    filename = get_eml_filename(packageid, format, user_folder)
+    return save_document(filename, (metadata_str,))
+
+
+def stream_eml(packageid:str=None):
+    '''
+    Returns a response that serializes the package's EML as it is sent, or 
+    a message string if the package cannot be loaded.
+    '''
+    if not packageid:
+        return 'No package ID was specified'
+    eml_node = load_eml(packageid=packageid)
+    if not eml_node:
+        return f'Data package not found: {packageid}'
+    fragments = get_fragments(eml_node, packageid, get_eml_filename(packageid, 'json'))
+    response = Response(stream_with_context(iter_eml(eml_node, fragments=fragments)), 
+                        mimetype='application/xml')
+    response.headers['Content-Disposition'] = f'attachment; filename="{packageid}.xml"'
+    return response
+
+
 def evaluate_node(node:Node):
     msg = 'pass'
     if node:
@@ -623,18 +787,46 @@ def evaluate_node(node:Node):
     return msg
 
 
-def validate_tree(node:Node):
+def validate_tree(node:Node, packageid:str=None, user_folder:str=None):
+    '''
+    Returns the first rule violation in the subtree, or a message saying it
+    is valid. If packageid is given and the tree was loaded as that package,
+    results are memoized per subtree across calls and requests.
+    '''
     msg = ''
     if node:
-        try:
-            validate.tree(node)
+        messages = check_subtree(node, get_package_validation_results(node, packageid, user_folder),
+                                 evaluate_nodes=False)
+        validation_errors = errors(messages)
+        if validation_errors:
+            msg = validation_errors[0].message
+        else:
             msg = f"{node.name} node is valid"
-        except Exception as e:
-            msg = str(e)
 
     return msg
 
 
+def check_tree(node:Node, packageid:str=None, user_folder:str=None):
+    '''
+    Returns the validation errors and evaluation warnings for the subtree
+    as a list of Validation_Message, memoized as for validate_tree().
+    '''
+    messages = []
+    if node:
+        messages = list(check_subtree(node, get_package_validation_results(node, packageid, user_folder)))
+    return messages
+
+
+def get_package_validation_results(node:Node=None, packageid:str=None, user_folder:str=None):
+    results = None
+    if node and packageid:
+        root_node = node
+        while root_node.parent is not None:
+            root_node = root_node.parent
+        results = get_validation_results(root_node, packageid, get_eml_filename(packageid, 'json', user_folder))
+    return results
+
+
 def create_access(parent_node:Node=None):
     access_node = Node(names.ACCESS, parent=parent_node)
     add_child(parent_node, access_node)
@@ -1966,3 +2158,55 @@ def read_xml(xml:str=None):
         raise Exception("No XML string provided")
 
     return eml_node
+
+
+@timed('parse_xml')
+def read_xml_file(filename:str=None, max_bytes:int=None):
+    '''
+    Parses an EML file into a Node tree incrementally with iterparse, so 
+    neither the XML text nor a DOM of the whole document is held in memory:
+    each element is cleared as soon as its node is complete. Namespace 
+    prefixes are dropped from element names, namespaced attributes and 
+    comments are skipped, content is whitespace-stripped, and text that 
+    follows a child element in mixed content is dropped; the tests compare
+    the trees built with those of mp_io.from_xml(). Files larger than 
+    max_bytes (default Config.MAX_METADATA_FILE_BYTES) are rejected before
+    parsing.
+    '''
+    if not filename:
+        raise Exception("No XML file provided")
+    if max_bytes is None:
+        max_bytes = Config.MAX_METADATA_FILE_BYTES
+    file_size = os.path.getsize(filename)
+    if max_bytes and file_size > max_bytes:
+        raise Exception(f"XML file is {file_size} bytes, which exceeds the limit of {max_bytes} bytes")
+
+    eml_node = None
+    nodes = []
+    try:
+        for event, element in ElementTree.iterparse(filename, events=('start', 'end')):
+            if event == 'start':
+                name = element.tag[element.tag.find('}') + 1:]
+                parent_node = nodes[-1] if nodes else None
+                node = Node(name, parent=parent_node)
+                for attribute_name, value in element.attrib.items():
+                    if '}' not in attribute_name:
+                        node.add_attribute(attribute_name, value)
+                if parent_node:
+                    # Document order is schema order, so no rule lookup is needed
+                    parent_node.add_child(node)
+                else:
+                    eml_node = node
+                nodes.append(node)
+            else:
+                node = nodes.pop()
+                if element.text is not None:
+                    content = element.text.strip()
+                    if content:
+                        node.content = content
+                element.clear()
+    except ElementTree.ParseError as e:
+        logger.error(e)
+        raise Exception(f"Error parsing XML: {e}")
+
+    return eml_node
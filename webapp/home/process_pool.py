@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: process_pool.py
+
+:Synopsis:
+    The multiprocessing context for work that a uWSGI worker hands to
+    other processes. Processes are spawned rather than forked: a worker
+    runs background threads, and a forked child could inherit a lock one
+    of them held, such as a logging, cache or metrics lock, and deadlock.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import multiprocessing
+import os
+import sys
+
+
+def python_executable():
+    # Under uWSGI, sys.executable is the uwsgi binary rather than Python
+    python = os.path.join(sys.exec_prefix, 'bin', 'python3')
+    return python if os.path.exists(python) else sys.executable
+
+
+spawn_context = multiprocessing.get_context('spawn')
+spawn_context.set_executable(python_executable())
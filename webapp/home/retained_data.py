@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: retained_data.py
+
+:Synopsis:
+    Opt-in retention of uploaded data files so that later checks on a data
+    table (re-profiling, congruence checks, checksums, previews) do not
+    require the file to be uploaded again. Retained files are stored per
+    package under the name given by the data table's objectName. Each user
+    has a byte quota, enforced by evicting the least recently used files.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import os
+import shutil
+
+import daiquiri
+
+from metapype.eml2_1_1 import names
+from metapype.model.node import Node
+
+from webapp.auth.user_data import (
+    get_user_folder_name
+)
+
+from webapp.config import Config
+
+
+logger = daiquiri.getLogger('retained_data: ' + __name__)
+
+RETAINED_DATA_DIR = 'retained'
+
+
+def get_retained_data_folder_name(packageid:str=None, user_folder:str=None):
+    if not user_folder:
+        user_folder = get_user_folder_name()
+    retained_folder_name = f'{user_folder}/{RETAINED_DATA_DIR}'
+    if packageid:
+        retained_folder_name = f'{retained_folder_name}/{packageid}'
+    return retained_folder_name
+
+
+def object_name_from_entity(entity_node:Node=None):
+    object_name = ''
+    if entity_node:
+        physical_node = entity_node.find_child(names.PHYSICAL)
+        if physical_node:
+            object_name_node = physical_node.find_child(names.OBJECTNAME)
+            if object_name_node and object_name_node.content:
+                object_name = object_name_node.content
+    return object_name
+
+
+def retain_data_file(packageid:str=None, data_file_path:str=None, object_name:str=None):
+    '''
+    Moves an uploaded data file into the retention store and evicts least
+    recently used files until the user is back within quota. Returns the
+    path of the retained file, or None if the file alone exceeds the quota.
+    '''
+    retained_path = None
+    if packageid and data_file_path and object_name:
+        user_folder = get_user_folder_name()
+        file_size = os.path.getsize(data_file_path)
+        if file_size > Config.RETAINED_DATA_QUOTA_BYTES:
+            logger.info(f'Not retaining {object_name}: {file_size} bytes exceeds the quota')
+            return None
+        retained_folder = get_retained_data_folder_name(packageid, user_folder)
+        os.makedirs(retained_folder, exist_ok=True)
+        retained_path = f'{retained_folder}/{os.path.basename(object_name)}'
+        os.replace(data_file_path, retained_path)
+        touch_retained_data_file(retained_path)
+        evict_retained_data(user_folder, Config.RETAINED_DATA_QUOTA_BYTES, keep=retained_path)
+    return retained_path
+
+
+def get_retained_data_file(packageid:str=None, object_name:str=None):
+    '''
+    Returns the path of the retained copy of a data file, or None. A hit
+    counts as a use for the purposes of LRU eviction.
+    '''
+    retained_path = None
+    if packageid and object_name:
+        path = f'{get_retained_data_folder_name(packageid)}/{os.path.basename(object_name)}'
+        if os.path.isfile(path):
+            touch_retained_data_file(path)
+            retained_path = path
+    return retained_path
+
+
+def touch_retained_data_file(path:str=None):
+    # The modification time records the last use; access times are not
+    # reliable on filesystems mounted with noatime or relatime.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def list_retained_data_files(user_folder:str=None):
+    retained_files = []
+    retained_folder = get_retained_data_folder_name(user_folder=user_folder)
+    if os.path.isdir(retained_folder):
+        for dirpath, dirnames, filenames in os.walk(retained_folder):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                    retained_files.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    pass
+    return retained_files
+
+
+def evict_retained_data(user_folder:str=None, max_bytes:int=None, keep:str=None):
+    evicted = []
+    retained_files = list_retained_data_files(user_folder)
+    total_size = sum(size for _, size, _ in retained_files)
+    for mtime, size, path in sorted(retained_files):
+        if total_size <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.unlink(path)
+            evicted.append(path)
+            logger.info(f'Evicted retained data file {path}')
+        except FileNotFoundError:
+            pass  # already evicted by another worker
+        total_size -= size
+    return evicted
+
+
+def remove_retained_data(packageid:str=None):
+    if packageid:
+        shutil.rmtree(get_retained_data_folder_name(packageid), ignore_errors=True)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: upload_scratch.py
+
+:Synopsis:
+    Per-upload scratch directories. Each upload is saved into its own
+    directory under the user's uploads folder so that concurrent uploads
+    by the same user cannot clobber each other. A small state file tracks
+    the lifecycle of each directory, and a background janitor removes
+    directories that exceed the configured age or per-user size quota.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import daiquiri
+
+from webapp.config import Config
+
+from webapp.home.document_store import remove_stale_temp_files, USER_DATA_DIR
+
+
+logger = daiquiri.getLogger('upload_scratch: ' + __name__)
+
+SCRATCH_STATE_FILE = '.scratch.json'
+
+# Lifecycle states of a scratch directory
+CREATED = 'created'
+UPLOADED = 'uploaded'
+PROFILING = 'profiling'
+DONE = 'done'
+FAILED = 'failed'
+
+ACTIVE_STATES = (CREATED, UPLOADED, PROFILING)
+
+_janitor_lock = threading.Lock()
+_janitor_thread = None
+_janitor_pid = None
+
+
+def create_scratch_dir(uploads_folder:str=None):
+    ensure_janitor_running()
+    scratch_dir = f'{uploads_folder}/{uuid.uuid4().hex}'
+    os.makedirs(scratch_dir)
+    _write_state(scratch_dir, {'state': CREATED, 'created': time.time(), 'pid': os.getpid()})
+    return scratch_dir
+
+
+def set_scratch_state(scratch_dir:str=None, state:str=None):
+    if scratch_dir and state:
+        scratch_state = read_scratch_state(scratch_dir)
+        scratch_state['state'] = state
+        scratch_state['updated'] = time.time()
+        # The state is only set by the request that owns the directory
+        scratch_state.setdefault('pid', os.getpid())
+        _write_state(scratch_dir, scratch_state)
+
+
+def read_scratch_state(scratch_dir:str=None):
+    scratch_state = {}
+    try:
+        with open(f'{scratch_dir}/{SCRATCH_STATE_FILE}', 'r') as f:
+            scratch_state = json.load(f)
+    except Exception:
+        # The state file is written just after the directory is created,
+        # so a directory without one may belong to an upload that is only
+        # starting. It is treated as created at the directory's
+        # modification time, which leaves it to be removed by age.
+        try:
+            scratch_state = {'state': CREATED, 'created': os.path.getmtime(scratch_dir)}
+        except OSError:
+            pass
+    return scratch_state
+
+
+def remove_scratch_dir(scratch_dir:str=None):
+    if scratch_dir:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def _write_state(scratch_dir:str, scratch_state:dict):
+    # Written to a temporary file and renamed, so that the janitor never
+    # reads a partly written state
+    filename = f'{scratch_dir}/{SCRATCH_STATE_FILE}'
+    temp_filename = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_filename, 'w') as f:
+            json.dump(scratch_state, f)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(temp_filename)
+        except OSError:
+            pass
+        raise
+
+
+def scratch_dir_size(scratch_dir:str=None):
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(scratch_dir):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return size
+
+
+def sweep_uploads_folder(uploads_folder:str=None, max_age:float=None, max_bytes:int=None, now:float=None):
+    '''
+    Removes the scratch directories in a user's uploads folder that are older
+    than max_age seconds, then removes the oldest finished directories until
+    the folder is within max_bytes. Directories still in an active state are
+    only ever removed by age. Loose files left by older versions of the
+    application are removed by age as well.
+    '''
+    removed = []
+    if not uploads_folder or not os.path.isdir(uploads_folder):
+        return removed
+    if now is None:
+        now = time.time()
+
+    scratch_dirs = []
+    for entry in os.scandir(uploads_folder):
+        if entry.is_dir():
+            scratch_state = read_scratch_state(entry.path)
+            created = scratch_state.get('created', now)
+            if max_age is not None and now - created > max_age:
+                remove_scratch_dir(entry.path)
+                removed.append(entry.path)
+            else:
+                scratch_dirs.append((created, entry.path, scratch_state.get('state')))
+        elif entry.is_file():
+            try:
+                if max_age is not None and now - entry.stat().st_mtime > max_age:
+                    os.unlink(entry.path)
+                    removed.append(entry.path)
+            except OSError:
+                pass
+
+    if max_bytes is not None:
+        sizes = {path: scratch_dir_size(path) for _, path, _ in scratch_dirs}
+        total_size = sum(sizes.values())
+        for created, path, state in sorted(scratch_dirs):
+            if total_size <= max_bytes:
+                break
+            if state not in ACTIVE_STATES:
+                remove_scratch_dir(path)
+                removed.append(path)
+                total_size -= sizes[path]
+    return removed
+
+
+def sweep_user_data(user_data_dir:str=USER_DATA_DIR):
+    removed = []
+    if os.path.isdir(user_data_dir):
+        for entry in os.scandir(user_data_dir):
+            if entry.is_dir():
+                removed.extend(sweep_uploads_folder(f'{entry.path}/uploads',
+                                                    max_age=Config.UPLOAD_SCRATCH_MAX_AGE,
+                                                    max_bytes=Config.UPLOAD_SCRATCH_MAX_BYTES))
+                removed.extend(remove_stale_temp_files(entry.path, max_age=Config.UPLOAD_SCRATCH_MAX_AGE))
+    for path in removed:
+        logger.info(f'Janitor removed {path}')
+    return removed
+
+
+def _janitor():
+    while True:
+        try:
+            sweep_user_data()
+        except Exception as e:
+            logger.error(e)
+        time.sleep(Config.UPLOAD_JANITOR_INTERVAL)
+
+
+def ensure_janitor_running():
+    '''
+    Starts the janitor thread in this process if it is not already running.
+    Threads do not survive a fork, so this is checked per process id rather
+    than once at import time, which happens in the uWSGI master.
+    '''
+    global _janitor_thread, _janitor_pid
+    with _janitor_lock:
+        if _janitor_pid == os.getpid() and _janitor_thread and _janitor_thread.is_alive():
+            return
+        _janitor_thread = threading.Thread(target=_janitor, name='upload-janitor', daemon=True)
+        _janitor_thread.start()
+        _janitor_pid = os.getpid()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: validate_store.py
+
+:Synopsis:
+    Command-line validation of every package in a user-data directory,
+    e.g. to find the packages that a metapype upgrade has made invalid.
+    Each JSON document is loaded with mp_io.from_json() and checked node by
+    node with the metapype validation and evaluation rules in a process
+    pool. A summary with per-package timings is written as CSV and/or
+    JSON. It only reads the directory, so it can be run offline against a
+    copy of user-data:
+
+        python -m webapp.home.validate_store user-data --csv report.csv
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import daiquiri
+
+from metapype.model import mp_io
+
+from webapp.home.document_store import USER_DATA_DIR
+
+from webapp.home.validation import (
+    check_subtree, ERROR, WARNING
+)
+
+
+logger = daiquiri.getLogger('validate_store: ' + __name__)
+
+VALID = 'valid'
+INVALID = 'invalid'
+FAILED = 'failed'
+
+SUMMARY_FIELDS = ['user', 'packageid', 'status', 'errors', 'warnings', 'nodes',
+                  'load_seconds', 'validate_seconds', 'first_error']
+
+
+def list_documents(user_data_dir:str=USER_DATA_DIR):
+    '''
+    Returns (user, packageid, path) for every JSON document in the store,
+    skipping the hidden files the application keeps next to them.
+    '''
+    documents = []
+    for user_entry in sorted(os.scandir(user_data_dir), key=lambda entry: entry.name):
+        if not user_entry.is_dir():
+            continue
+        for entry in sorted(os.scandir(user_entry.path), key=lambda entry: entry.name):
+            if entry.is_file() and entry.name.endswith('.json') and not entry.name.startswith('.'):
+                packageid = entry.name[:-len('.json')]
+                documents.append((user_entry.name, packageid, entry.path))
+    return documents
+
+
+def validate_document(document:tuple=None):
+    '''
+    Runs in a worker process and returns one summary row.
+    '''
+    user, packageid, path = document
+    row = dict.fromkeys(SUMMARY_FIELDS, '')
+    row.update({'user': user, 'packageid': packageid})
+    try:
+        start = time.perf_counter()
+        with open(path, 'r') as fh:
+            eml_node = mp_io.from_json(json.load(fh))
+        loaded = time.perf_counter()
+        messages = check_subtree(eml_node)
+        validated = time.perf_counter()
+    except Exception as e:
+        row.update({'status': FAILED, 'first_error': str(e)})
+        return row
+
+    nodes = 0
+    stack = [eml_node]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        stack.extend(node.children)
+    errors = [message for message in messages if message.kind == ERROR]
+    warnings = [message for message in messages if message.kind == WARNING]
+    row.update({
+        'status': INVALID if errors else VALID,
+        'errors': len(errors),
+        'warnings': len(warnings),
+        'nodes': nodes,
+        'load_seconds': round(loaded - start, 4),
+        'validate_seconds': round(validated - loaded, 4),
+        'first_error': errors[0].message if errors else ''
+    })
+    return row
+
+
+def validate_store(user_data_dir:str=USER_DATA_DIR, processes:int=None, max_tasks_per_child:int=None):
+    documents = list_documents(user_data_dir)
+    # Workers are replaced periodically because every loaded node stays in
+    # metapype's node store for the life of the process
+    with multiprocessing.Pool(processes=processes, maxtasksperchild=max_tasks_per_child) as pool:
+        rows = list(pool.imap_unordered(validate_document, documents))
+    rows.sort(key=lambda row: (row['user'], row['packageid']))
+    return rows
+
+
+def write_csv(rows:list=None, filename:str=None):
+    with open(filename, 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(rows:list=None, filename:str=None, elapsed:float=None):
+    summary = {
+        'packages': len(rows),
+        'valid': sum(1 for row in rows if row['status'] == VALID),
+        'invalid': sum(1 for row in rows if row['status'] == INVALID),
+        'failed': sum(1 for row in rows if row['status'] == FAILED),
+        'elapsed_seconds': elapsed,
+        'results': rows
+    }
+    with open(filename, 'w') as fh:
+        json.dump(summary, fh, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Validate every EML document in a user-data directory.')
+    parser.add_argument('user_data_dir', nargs='?', default=USER_DATA_DIR,
+                        help='User-data directory, or a copy of one')
+    parser.add_argument('--csv', help='Write the per-package summary to this CSV file')
+    parser.add_argument('--json', help='Write the summary and totals to this JSON file')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--max-tasks-per-child', type=int, default=50)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = validate_store(args.user_data_dir, args.processes, args.max_tasks_per_child)
+    elapsed = round(time.perf_counter() - start, 3)
+
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.json:
+        write_json(rows, args.json, elapsed)
+
+    counts = {status: sum(1 for row in rows if row['status'] == status) for status in (VALID, INVALID, FAILED)}
+    for row in rows:
+        if row['status'] != VALID:
+            print(f"{row['user']}/{row['packageid']} {row['status']}: {row['first_error']}")
+    print(f"{len(rows)} packages in {elapsed} seconds: {counts[VALID]} valid, "
+          f"{counts[INVALID]} invalid, {counts[FAILED]} failed")
+    return 1 if counts[INVALID] or counts[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
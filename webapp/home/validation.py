@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: validation.py
+
+:Synopsis:
+    Validation and evaluation of a Node tree, one node at a time, with the
+    messages for each non-leaf subtree memoized in a results dictionary
+    (see fragment_cache.py). A node's rule check only looks at the node and
+    its children, and the memoized results of a subtree are only used while
+    the subtree is unchanged, so after an edit only the changed subtree and
+    its ancestors are checked again.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import collections
+
+import daiquiri
+
+from metapype.eml2_1_1 import evaluate, names, validate
+from metapype.model.node import Node
+
+
+logger = daiquiri.getLogger('validation: ' + __name__)
+
+# Kinds of Validation_Message
+ERROR = 'error'
+WARNING = 'warning'
+
+Validation_Message = collections.namedtuple(
+    'Validation_Message',
+    ["kind", "node_id", "node_name", "message"],
+    rename=False)
+
+
+def is_leaf(node:Node=None):
+    # As in validate.tree(), the content of additionalMetadata's metadata
+    # isn't EML, so its children aren't checked
+    return not node.children or node.name == names.METADATA
+
+
+def evaluation_messages(evaluation=None):
+    # evaluate.node() returns None, a message, or a collection of warnings
+    if evaluation is None:
+        return []
+    if isinstance(evaluation, str):
+        return [evaluation]
+    if isinstance(evaluation, dict):
+        evaluation = evaluation.values()
+    messages = []
+    for warning in evaluation:
+        if isinstance(warning, (tuple, list)) and len(warning) > 1:
+            messages.append(str(warning[1]))
+        else:
+            messages.append(str(warning))
+    return messages
+
+
+def check_node(node:Node=None, evaluate_nodes:bool=True):
+    '''
+    Returns the messages for the node itself: the first rule violation, if
+    any, and, if evaluate_nodes is set, its evaluation warnings.
+    '''
+    messages = []
+    try:
+        validate.node(node)
+    except Exception as e:
+        messages.append(Validation_Message(ERROR, node.id, node.name, str(e)))
+    if evaluate_nodes:
+        try:
+            for message in evaluation_messages(evaluate.node(node)):
+                messages.append(Validation_Message(WARNING, node.id, node.name, message))
+        except Exception as e:
+            logger.error(e)
+    return messages
+
+
+def check_subtree(node:Node=None, results:dict=None, evaluate_nodes:bool=True):
+    '''
+    Returns a tuple of the Validation_Messages for the whole subtree, in
+    document order. Results for non-leaf subtrees are taken from, and
+    stored in, the results dictionary; pass None to check without a memo.
+    '''
+    if node is None:
+        return ()
+    if results is None:
+        results = {}
+    key = evaluate_nodes
+    cached = results.get(node.id)
+    if cached is not None and key in cached:
+        return cached[key]
+    if is_leaf(node):
+        return tuple(check_node(node, evaluate_nodes))
+
+    root_node = node
+    stack = [(node, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            messages = check_node(node, evaluate_nodes)
+            for child in node.children:
+                if is_leaf(child):
+                    messages.extend(check_node(child, evaluate_nodes))
+                else:
+                    messages.extend(results[child.id][key])
+            results.setdefault(node.id, {})[key] = tuple(messages)
+            continue
+        stack.append((node, True))
+        for child in node.children:
+            if not is_leaf(child):
+                cached = results.get(child.id)
+                if cached is None or key not in cached:
+                    stack.append((child, False))
+    return results[root_node.id][key]
+
+
+def errors(messages=None):
+    return [message for message in messages if message.kind == ERROR]
+
+
+def warnings(messages=None):
+    return [message for message in messages if message.kind == WARNING]
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: validation_report.py
+
+:Synopsis:
+    Full-document validation and quality reports, built in the background.
+    Each save of a package schedules a report; saves that follow in quick
+    succession push the report back, so a burst of edits produces one
+    report. A report lists every validation error and evaluation warning
+    and is stored next to the document, keyed by the version (content
+    digest) of the JSON file it was built from, so the report page can
+    serve it without validating anything.
+
+    Reports are built in a spawned process (see process_pool.py). Parsing
+    the document in the worker would register the report's copy of each
+    node in the node store under the id of the node a request loaded, so
+    the request's lookups by id would find the copy.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import concurrent.futures
+import json
+import os
+import threading
+import time
+
+import daiquiri
+
+from metapype.model import mp_io
+
+from webapp.config import Config
+
+from webapp.home.document_store import (
+    atomic_write, content_digest, file_stamp, read_digest
+)
+
+from webapp.home.process_pool import spawn_context
+
+from webapp.home.validation import (
+    check_subtree, ERROR, WARNING
+)
+
+
+logger = daiquiri.getLogger('validation_report: ' + __name__)
+
+REPORT_PREFIX = '.'
+REPORT_SUFFIX = '.report.json'
+
+_condition = threading.Condition()
+# (user_folder, packageid) -> monotonic time at which the report is due
+_pending = {}
+_reporter_thread = None
+_reporter_pid = None
+
+
+def get_report_filename(packageid:str=None, user_folder:str=None):
+    return f'{user_folder}/{REPORT_PREFIX}{packageid}{REPORT_SUFFIX}'
+
+
+def document_version(json_filename:str=None):
+    '''
+    The content digest of the JSON document, taken from its digest sidecar
+    when that still describes the file. None if there is no document.
+    '''
+    stamp = file_stamp(json_filename)
+    if stamp is None:
+        return None
+    recorded = read_digest(json_filename)
+    if recorded.get('stamp') == stamp and recorded.get('digest'):
+        return recorded['digest']
+    with open(json_filename, 'r') as fh:
+        return content_digest((fh.read(),))
+
+
+def read_report(packageid:str=None, user_folder:str=None):
+    try:
+        with open(get_report_filename(packageid, user_folder), 'r') as fh:
+            return json.load(fh)
+    except Exception:
+        return None
+
+
+def node_path(node=None):
+    names = []
+    while node is not None:
+        names.append(node.name)
+        node = node.parent
+    return '/'.join(reversed(names))
+
+
+def build_report(packageid:str=None, user_folder:str=None):
+    '''
+    Runs in a spawned process, see update_report(). Returns the report as
+    a dictionary, so only plain data crosses the process boundary.
+    '''
+    json_filename = f'{user_folder}/{packageid}.json'
+    version = document_version(json_filename)
+    if version is None:
+        return None
+    start = time.perf_counter()
+    with open(json_filename, 'r') as fh:
+        json_obj = json.load(fh)
+    eml_node = mp_io.from_json(json_obj)
+    messages = check_subtree(eml_node)
+
+    nodes = {}
+    stack = [eml_node]
+    while stack:
+        node = stack.pop()
+        nodes[node.id] = node
+        stack.extend(node.children)
+
+    def entry(message):
+        return {'node_id': message.node_id, 'node_name': message.node_name,
+                'path': node_path(nodes.get(message.node_id)), 'message': message.message}
+
+    return {
+        'packageid': packageid,
+        'version': version,
+        'created': time.time(),
+        'elapsed': round(time.perf_counter() - start, 3),
+        'errors': [entry(message) for message in messages if message.kind == ERROR],
+        'warnings': [entry(message) for message in messages if message.kind == WARNING]
+    }
+
+
+def update_report(packageid:str=None, user_folder:str=None):
+    '''
+    Builds and stores the report for the current version of the package,
+    unless it is already stored (another worker may have built it).
+    '''
+    report = read_report(packageid, user_folder)
+    version = document_version(f'{user_folder}/{packageid}.json')
+    if version is None or (report and report.get('version') == version):
+        return report
+    # A process per report, so the tree is freed with the process
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=spawn_context) as executor:
+        report = executor.submit(build_report, packageid, user_folder).result()
+    if report:
+        atomic_write(get_report_filename(packageid, user_folder), (json.dumps(report),))
+        logger.info(f"Validation report for {packageid}: {len(report['errors'])} errors, "
+                    f"{len(report['warnings'])} warnings in {report['elapsed']} seconds")
+    return report
+
+
+def get_validation_report(packageid:str=None, user_folder:str=None):
+    '''
+    Returns (report, current): the stored report, which may be for an older
+    version or None, and whether it is for the current version. A report
+    that is missing or out of date is scheduled right away.
+    '''
+    report = read_report(packageid, user_folder)
+    version = document_version(f'{user_folder}/{packageid}.json')
+    current = version is not None and report is not None and report.get('version') == version
+    if version is not None and not current:
+        schedule_report(packageid, user_folder, delay=0)
+    return report, current
+
+
+def remove_report(packageid:str=None, user_folder:str=None):
+    try:
+        os.remove(get_report_filename(packageid, user_folder))
+    except OSError:
+        pass
+
+
+def schedule_report(packageid:str=None, user_folder:str=None, delay:float=None):
+    if not packageid or not user_folder:
+        return
+    if delay is None:
+        delay = Config.VALIDATION_REPORT_DELAY
+    ensure_reporter_running()
+    with _condition:
+        _pending[(user_folder, packageid)] = time.monotonic() + delay
+        _condition.notify()
+
+
+def _next_due():
+    with _condition:
+        while True:
+            now = time.monotonic()
+            due = [key for key, due_time in _pending.items() if due_time <= now]
+            if due:
+                for key in due:
+                    del _pending[key]
+                return due
+            timeout = min(_pending.values()) - now if _pending else None
+            _condition.wait(timeout)
+
+
+def _reporter():
+    while True:
+        for user_folder, packageid in _next_due():
+            try:
+                update_report(packageid, user_folder)
+            except Exception as e:
+                logger.error(f'Validation report for {packageid} failed: {e}')
+
+
+def ensure_reporter_running():
+    # Started per process id, as for the upload janitor
+    global _reporter_thread, _reporter_pid
+    with _condition:
+        if _reporter_pid == os.getpid() and _reporter_thread and _reporter_thread.is_alive():
+            return
+        _pending.clear()
+        _reporter_thread = threading.Thread(target=_reporter, name='validation-report', daemon=True)
+        _reporter_thread.start()
+        _reporter_pid = os.getpid()
@@ -20,7 +20,7 @@ import os.path
 from datetime import date
 
 from flask import (
-    Blueprint, flash, render_template, redirect, request, 
+    Blueprint, flash, jsonify, render_template, redirect, request, 
     url_for, session
 )
 
@@ -28,8 +28,10 @@ from flask_login import (
     current_user, login_required
 )
 
+from webapp.config import Config
+
 from webapp.auth.user_data import (
-    delete_eml, download_eml, get_active_packageid, get_user_document_list,
+    delete_eml, get_active_packageid, get_user_document_list, get_user_folder_name,
     get_user_uploads_folder_name, get_user_uploads
 )
 
@@ -47,7 +49,8 @@ from webapp.home.forms import (
     OtherEntitySelectForm, OtherEntityForm, PublicationPlaceForm,
     form_md5, is_dirty_form,
     AttributeDateTimeForm, AttributeIntervalRatioForm, 
-    AttributeNominalOrdinalForm, LoadDataForm, LoadMetadataForm
+    AttributeNominalOrdinalForm, LoadDataForm, LoadMetadataForm,
+    ImportArchiveForm
 )
 
 from webapp.home.intellectual_rights import (
@@ -55,11 +58,41 @@ from webapp.home.intellectual_rights import (
 )
 
 
+from webapp.home.check_data_table import (
+    check_data_table as check_data_file
+)
+
+
+from webapp.home.import_archive import (
+    import_archive as import_eml_archive
+)
+
+
 from webapp.home.load_data_table import (
     load_data_table
 )
 
 
+from webapp.home.retained_data import (
+    get_retained_data_file, object_name_from_entity, remove_retained_data, 
+    retain_data_file
+)
+
+
+from webapp.instrumentation.metrics import record_upload
+
+
+from webapp.home.upload_scratch import (
+    create_scratch_dir, remove_scratch_dir, set_scratch_state,
+    UPLOADED, PROFILING, DONE, FAILED
+)
+
+
+from webapp.home.validation_report import (
+    get_validation_report, remove_report
+)
+
+
 from webapp.home.metapype_client import ( 
     load_eml, list_responsible_parties, save_both_formats, 
     evaluate_node, validate_tree, add_child, remove_child, create_eml, 
@@ -80,7 +113,7 @@ from webapp.home.metapype_client import (
     save_old_to_new, list_access_rules, create_access_rule,
     list_other_entities, create_other_entity, create_pubplace,
     create_access, non_numeric_domain_from_measurement_scale,
-    code_definition_from_attribute, read_xml
+    code_definition_from_attribute, read_xml_file, stream_eml
 )
 
 from metapype.eml2_1_1 import export
@@ -90,6 +123,9 @@ from werkzeug.utils import secure_filename
 
 
 logger = daiquiri.getLogger('views: ' + __name__)
+
+# Room for the multipart boundaries and the other fields of an upload form
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
 home = Blueprint('home', __name__, template_folder='templates')
 
 
@@ -153,6 +189,8 @@ def delete():
         if isinstance(return_value, str):
             flash(return_value)
         else:
+            remove_retained_data(packageid)
+            remove_report(packageid, get_user_folder_name())
             flash(f'Deleted {packageid}')
         new_page = 'delete'   # Return the Response object
         return redirect(url_for(f'home.{new_page}'))
@@ -254,7 +292,7 @@ def download():
     # Process POST
     if form.validate_on_submit():
         packageid = form.packageid.data
-        return_value = download_eml(packageid=packageid)
+        return_value = stream_eml(packageid=packageid)
         if isinstance(return_value, str):
             flash(return_value)
         else:
@@ -269,7 +307,7 @@ def download():
 def download_current():
     current_packageid = get_active_packageid()
     if current_packageid:
-        return_value = download_eml(packageid=current_packageid)
+        return_value = stream_eml(packageid=current_packageid)
         if isinstance(return_value, str):
             flash(return_value)
         else:
@@ -277,7 +315,13 @@ def download_current():
 
 
 def allowed_data_file(filename):
-    ALLOWED_EXTENSIONS = set(['csv', 'tsv', 'txt', 'xml'])    
+    ALLOWED_EXTENSIONS = set(['csv', 'tsv', 'txt', 'xml', 'parquet', 'feather', 'arrow'])
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def allowed_archive_file(filename):
+    ALLOWED_EXTENSIONS = set(['zip'])
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -288,6 +332,17 @@ def allowed_metadata_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def upload_within_limit(max_bytes:int=None):
+    '''
+    Checks the declared size of an upload request before its body is read,
+    so that an oversized file is refused without being written to disk.
+    '''
+    if not max_bytes:
+        return True
+    content_length = request.content_length
+    return content_length is not None and content_length <= max_bytes + MULTIPART_OVERHEAD_BYTES
+
+
 '''
 This function is deprecated. It was originally used as a first 
 step in a two-step process for data table upload, but that process 
@@ -397,13 +452,38 @@ def load_data():
             if filename is None or filename == '':
                 flash('No selected file')           
             elif allowed_data_file(filename):
-                file.save(os.path.join(uploads_folder, filename))
-                data_file = filename
-                data_file_path = f'{uploads_folder}/{data_file}'
-                flash(f'Loaded {data_file_path}')
-                eml_node = load_eml(packageid=packageid)
-                dataset_node = eml_node.find_child(names.DATASET)
-                dt_node = load_data_table(dataset_node, uploads_folder, data_file)
+                scratch_dir = create_scratch_dir(uploads_folder)
+                try:
+                    file.save(os.path.join(scratch_dir, filename))
+                    set_scratch_state(scratch_dir, UPLOADED)
+                    record_upload('data', os.path.join(scratch_dir, filename))
+                    data_file = filename
+                    flash(f'Loaded {data_file}')
+                    eml_node = load_eml(packageid=packageid)
+                    dataset_node = eml_node.find_child(names.DATASET)
+                    set_scratch_state(scratch_dir, PROFILING)
+                    try:
+                        dt_node, messages = load_data_table(dataset_node, scratch_dir, data_file,
+                                                            temporal_coverage=form.temporal_coverage.data,
+                                                            geographic_coverage=form.geographic_coverage.data,
+                                                            stations=form.stations.data)
+                    except Exception as e:
+                        logger.error(e)
+                        set_scratch_state(scratch_dir, FAILED)
+                        flash(f'Unable to load data from file {filename}: {e}')
+                        return redirect(request.url)
+                    set_scratch_state(scratch_dir, DONE)
+                    for message in messages:
+                        flash(message)
+                    if form.retain.data:
+                        object_name = object_name_from_entity(dt_node)
+                        data_file_path = os.path.join(scratch_dir, data_file)
+                        if retain_data_file(packageid, data_file_path, object_name):
+                            flash(f'Retained a copy of {data_file}')
+                        else:
+                            flash(f'{data_file} is too large to retain')
+                finally:
+                    remove_scratch_dir(scratch_dir)
                 save_both_formats(packageid=packageid, eml_node=eml_node)
                 return redirect(url_for('home.data_table', packageid=packageid, node_id=dt_node.id))
             else:
@@ -422,6 +502,10 @@ def load_metadata():
     uploads_folder = get_user_uploads_folder_name()
 
     # Process POST
+    if request.method == 'POST' and not upload_within_limit(Config.MAX_METADATA_FILE_BYTES):
+        flash(f'Metadata files are limited to {Config.MAX_METADATA_FILE_BYTES} bytes')
+        return redirect(request.url)
+
     if  request.method == 'POST' and form.validate_on_submit():
         # Check if the post request has the file part
         if 'file' not in request.files:
@@ -435,25 +519,30 @@ def load_metadata():
             if filename is None or filename == '':
                 flash('No selected file')           
             elif allowed_metadata_file(filename):
-                file.save(os.path.join(uploads_folder, filename))
+                scratch_dir = create_scratch_dir(uploads_folder)
                 metadata_file = filename
-                metadata_file_path = f'{uploads_folder}/{metadata_file}'
-                with open(metadata_file_path, 'r') as file:
-                    metadata_str = file.read()
+                metadata_file_path = f'{scratch_dir}/{metadata_file}'
+                eml_node = None
+                try:
+                    file.save(metadata_file_path)
+                    set_scratch_state(scratch_dir, UPLOADED)
+                    record_upload('metadata', metadata_file_path)
                     try:
-                        eml_node = read_xml(metadata_str)
+                        eml_node = read_xml_file(metadata_file_path)
                     except Exception as e:
                         flash(e)
-                    if eml_node:
-                        packageid = eml_node.attribute_value('packageId')
-                        if packageid:
-                            current_user.set_packageid(packageid)
-                            save_both_formats(packageid=packageid, eml_node=eml_node)
-                            return redirect(url_for('home.title', packageid=packageid))
-                        else:
-                            flash(f'Unable to determine packageid from file {filename}')
+                finally:
+                    remove_scratch_dir(scratch_dir)
+                if eml_node:
+                    packageid = eml_node.attribute_value('packageId')
+                    if packageid:
+                        current_user.set_packageid(packageid)
+                        save_both_formats(packageid=packageid, eml_node=eml_node)
+                        return redirect(url_for('home.title', packageid=packageid))
                     else:
-                        flash(f'Unable to load metadata from file {filename}')
+                        flash(f'Unable to determine packageid from file {filename}')
+                else:
+                    flash(f'Unable to load metadata from file {filename}')
             else:
                 flash(f'{filename} is not a supported data file type')
                 return redirect(request.url)
@@ -462,6 +551,69 @@ def load_metadata():
                            form=form)
 
 
+@home.route('/import_archive', methods=['GET', 'POST'])
+@login_required
+def import_archive():
+    form = ImportArchiveForm()
+    uploads_folder = get_user_uploads_folder_name()
+    results = None
+
+    # Process POST
+    if  request.method == 'POST' and form.validate_on_submit():
+        # Check if the post request has the file part
+        if 'file' not in request.files:
+            flash('No file part')
+            return redirect(request.url)
+
+        file = request.files['file']
+        if file:
+            filename = secure_filename(file.filename)
+
+            if filename is None or filename == '':
+                flash('No selected file')
+            elif allowed_archive_file(filename):
+                scratch_dir = create_scratch_dir(uploads_folder)
+                archive_path = f'{scratch_dir}/{filename}'
+                try:
+                    file.save(archive_path)
+                    set_scratch_state(scratch_dir, UPLOADED)
+                    record_upload('archive', archive_path)
+                    set_scratch_state(scratch_dir, PROFILING)
+                    results = import_eml_archive(archive_path, scratch_dir, form.overwrite.data)
+                    set_scratch_state(scratch_dir, DONE)
+                    for message in messages:
+                        flash(message)
+                    if not results:
+                        flash(f'No XML files were found in {filename}')
+                except Exception as e:
+                    set_scratch_state(scratch_dir, FAILED)
+                    logger.error(e)
+                    flash(f'Unable to import {filename}: {e}')
+                finally:
+                    remove_scratch_dir(scratch_dir)
+            else:
+                flash(f'{filename} is not a zip archive')
+                return redirect(request.url)
+    # Process GET
+    return render_template('import_archive.html', title='Import Data Packages',
+                           form=form, results=results)
+
+
+@home.route('/validation_report/<packageid>', methods=['GET'])
+@login_required
+def validation_report(packageid=None):
+    report, current = get_validation_report(packageid, get_user_folder_name())
+    return render_template('validation_report.html', title='Validation Report',
+                           packageid=packageid, report=report, current=current)
+
+
+@home.route('/validation_report/<packageid>/json', methods=['GET'])
+@login_required
+def validation_report_json(packageid=None):
+    report, current = get_validation_report(packageid, get_user_folder_name())
+    return jsonify({'packageid': packageid, 'current': current, 'report': report})
+
+
 @home.route('/close', methods=['GET', 'POST'])
 @login_required
 def close():
@@ -512,6 +664,8 @@ def data_table(packageid=None, node_id=None):
 
         if 'Attributes' in request.form:
             next_page = 'home.attribute_select'
+        elif 'Check' in request.form:
+            next_page = 'home.check_data_table'
         elif 'Access' in request.form:
             next_page = 'home.entity_access_select'
         elif 'Methods' in request.form:
@@ -639,6 +793,35 @@ def data_table(packageid=None, node_id=None):
                            atts=atts)
 
 
+@home.route('/check_data_table/<packageid>/<dt_node_id>', methods=['GET'])
+@login_required
+def check_data_table(packageid=None, dt_node_id=None):
+    entity_name = ''
+    data_file = None
+    mismatches = []
+
+    eml_node = load_eml(packageid=packageid)
+    dt_node = Node.get_node_instance(dt_node_id) if eml_node else None
+    if dt_node:
+        entity_name = entity_name_from_data_table(dt_node)
+        object_name = object_name_from_entity(dt_node)
+        data_file_path = get_retained_data_file(packageid, object_name)
+        if data_file_path:
+            data_file = object_name
+            try:
+                mismatches = check_data_file(dt_node, data_file_path)
+            except Exception as e:
+                logger.error(e)
+                flash(f'Unable to check {data_file}: {e}')
+    else:
+        flash(f'No data table found with node id {dt_node_id}')
+
+    return render_template('check_data_table.html', title='Check Data Table',
+                           packageid=packageid, dt_node_id=dt_node_id,
+                           entity_name=entity_name, data_file=data_file,
+                           mismatches=mismatches)
+
+
 def compose_atts(att_list:list=[]):
     atts = ''
     if att_list:
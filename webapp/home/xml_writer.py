@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: xml_writer.py
+
+:Synopsis:
+    Generator-based EML serializer. The Node tree is written out in
+    chunks of roughly CHUNK_SIZE characters, so a document can be sent to
+    a response stream or a file handle without first building the whole
+    XML string in memory. The output has the same layout as
+    metapype's export.to_xml().
+
+    When given a fragment dictionary (see fragment_cache.py), subtrees
+    whose serialized form is cached are written from the cache.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+from xml.sax.saxutils import escape
+
+import daiquiri
+
+from metapype.model.node import Node
+
+
+logger = daiquiri.getLogger('xml_writer: ' + __name__)
+
+CHUNK_SIZE = 64 * 1024
+MERGE_SIZE = 4 * 1024
+SPACE = '    '
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+EML_BOILERPLATE = (
+    'xmlns:eml="eml://ecoinformatics.org/eml-2.1.1" '
+    'xmlns:stmml="http://www.xml-cml.org/schema/stmml-1.1" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="eml://ecoinformatics.org/eml-2.1.1 '
+    'http://nis.lternet.edu/schemas/EML/eml-2.1.1/eml.xsd"'
+)
+ATTRIBUTE_ENTITIES = {'"': '&quot;'}
+
+
+def escape_content(content=None):
+    text = str(content)
+    # Content that has already been escaped is written as is
+    if isinstance(content, str) and all(x not in text for x in ('&amp;', '&lt;', '&gt;')):
+        text = escape(text)
+        # <para> markup is kept in node content rather than as child nodes
+        text = text.replace('&lt;para&gt;', '<para>').replace('&lt;/para&gt;', '</para>')
+    return text
+
+
+def tag_name(node:Node=None, level:int=0):
+    if level == 0 and node.name == 'eml':
+        return 'eml:eml'
+    return node.name
+
+
+def open_tag(node:Node=None, level:int=0):
+    attributes = ''
+    for name, value in node.attributes.items():
+        attributes += f' {name}="{escape(str(value), ATTRIBUTE_ENTITIES)}"'
+    if level == 0 and node.name == 'eml':
+        attributes += ' ' + EML_BOILERPLATE
+    return f'<{tag_name(node, level)}{attributes}>'
+
+
+def is_leaf(node:Node=None):
+    # Nodes with content are written on one line, as export.to_xml() does
+    return node.content is not None or not node.children
+
+
+def leaf_line(node:Node=None, level:int=0):
+    indent = SPACE * level
+    close_tag = f'</{tag_name(node, level)}>\n'
+    if node.content is not None:
+        return indent + open_tag(node, level) + escape_content(node.content) + close_tag
+    return indent + open_tag(node, level) + close_tag
+
+
+def iter_parts(node:Node=None, level:int=0):
+    '''
+    Yields the serialized document one element line at a time. The tree is
+    walked with an explicit stack, so document depth is not limited by the
+    recursion limit.
+    '''
+    stack = [(node, level, False)]
+    while stack:
+        node, level, closing = stack.pop()
+        indent = SPACE * level
+        if closing:
+            yield indent + f'</{tag_name(node, level)}>\n'
+        elif is_leaf(node):
+            yield leaf_line(node, level)
+        else:
+            yield indent + open_tag(node, level) + '\n'
+            stack.append((node, level, True))
+            for child in reversed(node.children):
+                stack.append((child, level + 1, False))
+
+
+def _cached_chunks(node:Node=None, level:int=0, fragments:dict=None):
+    cached = fragments.get(node.id)
+    if cached is not None and cached[0] == level:
+        return cached[1]
+    return None
+
+
+def _assemble_fragment(node:Node=None, level:int=0, fragments:dict=None):
+    '''
+    Serializes a non-leaf node from the cached fragments of its non-leaf 
+    children. Small pieces are merged into chunks of about MERGE_SIZE; 
+    larger child chunks are shared by reference rather than copied, so each
+    level of nesting costs pointers instead of another copy of the text.
+    '''
+    indent = SPACE * level
+    chunks = []
+    parts = [indent + open_tag(node, level) + '\n']
+    size = len(parts[0])
+    for child in node.children:
+        if is_leaf(child):
+            child_chunks = (leaf_line(child, level + 1),)
+        else:
+            child_chunks = fragments[child.id][1]
+        if len(child_chunks) == 1 and len(child_chunks[0]) < MERGE_SIZE:
+            parts.append(child_chunks[0])
+            size += len(child_chunks[0])
+        else:
+            if parts:
+                chunks.append(''.join(parts))
+                parts = []
+                size = 0
+            chunks.extend(child_chunks)
+        if size >= MERGE_SIZE:
+            chunks.append(''.join(parts))
+            parts = []
+            size = 0
+    parts.append(indent + f'</{tag_name(node, level)}>\n')
+    chunks.append(''.join(parts))
+    return tuple(chunks)
+
+
+def fragment_chunks(node:Node=None, level:int=0, fragments:dict=None):
+    '''
+    Returns the serialized subtree as a tuple of chunks, re-rendering only 
+    the subtrees that have no fragment in the cache and storing fragments 
+    for every non-leaf node it renders.
+    '''
+    if is_leaf(node):
+        return (leaf_line(node, level),)
+    chunks = _cached_chunks(node, level, fragments)
+    if chunks is not None:
+        return chunks
+    root_node = node
+    stack = [(node, level, False)]
+    while stack:
+        node, level, expanded = stack.pop()
+        if expanded:
+            fragments[node.id] = (level, _assemble_fragment(node, level, fragments))
+            continue
+        stack.append((node, level, True))
+        for child in node.children:
+            if not is_leaf(child) and _cached_chunks(child, level + 1, fragments) is None:
+                stack.append((child, level + 1, False))
+    return fragments[root_node.id][1]
+
+
+def eml_chunks(eml_node:Node=None, fragments:dict=None):
+    '''
+    The whole document, declaration included, as a tuple of cached chunks
+    that can be iterated more than once without rendering anything again.
+    '''
+    return (XML_DECLARATION,) + fragment_chunks(eml_node, 0, fragments)
+
+
+def iter_xml(node:Node=None, level:int=0, chunk_size:int=CHUNK_SIZE, fragments:dict=None):
+    if fragments is not None:
+        parts = fragment_chunks(node, level, fragments)
+    else:
+        parts = iter_parts(node, level)
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_eml(eml_node:Node=None, chunk_size:int=CHUNK_SIZE, fragments:dict=None):
+    yield XML_DECLARATION
+    yield from iter_xml(eml_node, 0, chunk_size, fragments)
+
+
+def write_eml(eml_node:Node=None, fh=None, chunk_size:int=CHUNK_SIZE, fragments:dict=None):
+    for chunk in iter_eml(eml_node, chunk_size, fragments):
+        fh.write(chunk)
@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: __init__.py
+
+:Synopsis:
+    Request timing and other instrumentation of the web application.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import daiquiri
+
+logger = daiquiri.getLogger('__init__.py: ' + __name__)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: memory.py
+
+:Synopsis:
+    Accounting of what each worker holds in memory, to tell which workers
+    need recycling and what keeps their memory from being freed. Every
+    Config.MEMORY_ACCOUNTING_INTERVAL seconds a background thread in each
+    worker logs, and reports as metrics labelled with its process id:
+
+        the worker's resident set size
+        the entries of the metapype node store and their estimated size
+        the EML trees in the store, split into those still in use and
+        those that nothing but the store refers to any more, with the
+        nodes removed from trees but not from the store counted apart
+        the packages and entries of the fragment cache
+        the data frames read by load_data_table that are still alive
+
+    Sizes are estimates: the nodes are measured with sys.getsizeof() on a
+    sample of Config.MEMORY_ACCOUNTING_SAMPLE of them, and a tree is in use
+    if its root has more references than the store and its children
+    account for, which relies on CPython's reference counts.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import os
+import random
+import sys
+import threading
+import time
+import weakref
+
+import daiquiri
+
+from metapype.model.node import Node
+
+from webapp.config import Config
+
+from webapp.home.fragment_cache import cache_stats
+
+from webapp.instrumentation.metrics import set_gauge
+
+
+logger = daiquiri.getLogger('memory: ' + __name__)
+
+IN_USE = 'in_use'
+UNREFERENCED = 'unreferenced'
+DETACHED = 'detached'
+TREE_STATES = (IN_USE, UNREFERENCED, DETACHED)
+
+_lock = threading.Lock()
+# Data frames are not hashable, so they are keyed by id
+_data_frames = weakref.WeakValueDictionary()
+_accountant_thread = None
+_accountant_pid = None
+
+
+def track_data_frame(data_frame=None):
+    '''
+    Called by load_data_table with each data frame it reads, so that frames
+    kept alive after profiling show up in the accounting.
+    '''
+    with _lock:
+        _data_frames[id(data_frame)] = data_frame
+
+
+def data_frame_stats():
+    with _lock:
+        data_frames = list(_data_frames.values())
+    size = 0
+    for data_frame in data_frames:
+        try:
+            size += int(data_frame.memory_usage(index=True, deep=True).sum())
+        except Exception:
+            pass
+    return {'retained': len(data_frames), 'bytes': size}
+
+
+def resident_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def node_bytes(node=None):
+    size = sys.getsizeof(node)
+    attributes = getattr(node, '__dict__', {})
+    size += sys.getsizeof(attributes)
+    for value in attributes.values():
+        if isinstance(value, str):
+            size += sys.getsizeof(value)
+        elif isinstance(value, dict):
+            size += sys.getsizeof(value)
+            size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+        elif isinstance(value, list):
+            size += sys.getsizeof(value)
+    return size
+
+
+def _reference_counts(objects:list=None):
+    return [sys.getrefcount(obj) for obj in objects]
+
+
+def _reference_baseline():
+    # The references an object held only by the store has when counted the
+    # way node_store_stats() counts them: the store, the snapshot and the
+    # list of roots
+    probe = object()
+    held = {id(probe): probe}
+    snapshot = list(held.values())
+    del probe
+    candidates = [obj for obj in snapshot]
+    return _reference_counts(candidates)[0]
+
+
+def _subtree_size(node=None):
+    nodes = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        stack.extend(node.children)
+    return nodes
+
+
+def node_store_stats(sample:int=None):
+    '''
+    Returns the number of nodes in the node store, an estimate of their
+    size, and the number of trees and of nodes in each state.
+    '''
+    if sample is None:
+        sample = Config.MEMORY_ACCOUNTING_SAMPLE
+    # Requests add to the store while this runs
+    snapshot = list(Node.store.values())
+    entries = len(snapshot)
+    average = 0
+    if snapshot:
+        measured = random.sample(snapshot, min(sample, entries))
+        average = sum(node_bytes(node) for node in measured) / len(measured)
+        # The sample's references would make its roots look in use
+        del measured
+
+    trees = dict.fromkeys(TREE_STATES, 0)
+    nodes = dict.fromkeys(TREE_STATES, 0)
+    baseline = _reference_baseline()
+    roots = [node for node in snapshot if node.parent is None]
+    for root, references in zip(roots, _reference_counts(roots)):
+        children = sum(1 for child in root.children if child.parent is root)
+        state = IN_USE if references - children > baseline else UNREFERENCED
+        trees[state] += 1
+        nodes[state] += _subtree_size(root)
+    nodes[DETACHED] = max(entries - nodes[IN_USE] - nodes[UNREFERENCED], 0)
+
+    return {
+        'entries': entries,
+        'bytes': int(average * entries) + sys.getsizeof(Node.store),
+        'trees': trees,
+        'nodes': nodes,
+        'tree_bytes': {state: int(average * count) for state, count in nodes.items()}
+    }
+
+
+def memory_snapshot():
+    start = time.perf_counter()
+    snapshot = {
+        'resident_bytes': resident_bytes(),
+        'node_store': node_store_stats(),
+        'fragment_cache': cache_stats(),
+        'data_frames': data_frame_stats()
+    }
+    snapshot['seconds'] = time.perf_counter() - start
+    return snapshot
+
+
+def record_memory(snapshot:dict=None):
+    worker = str(os.getpid())
+    if snapshot['resident_bytes'] is not None:
+        set_gauge('worker_resident_bytes', snapshot['resident_bytes'], worker=worker)
+    node_store = snapshot['node_store']
+    set_gauge('node_store_entries', node_store['entries'], worker=worker)
+    set_gauge('node_store_bytes', node_store['bytes'], worker=worker)
+    for state in TREE_STATES:
+        if state != DETACHED:
+            set_gauge('node_trees', node_store['trees'][state], worker=worker, state=state)
+        set_gauge('node_tree_nodes', node_store['nodes'][state], worker=worker, state=state)
+        set_gauge('node_tree_bytes', node_store['tree_bytes'][state], worker=worker, state=state)
+    fragment_cache = snapshot['fragment_cache']
+    set_gauge('fragment_cache_packages', fragment_cache['packages'], worker=worker)
+    set_gauge('fragment_cache_entries', fragment_cache['fragment_entries'], worker=worker, cache='xml_fragments')
+    set_gauge('fragment_cache_entries', fragment_cache['validation_entries'], worker=worker, cache='validation')
+    set_gauge('fragment_cache_bytes', fragment_cache['bytes'], worker=worker)
+    data_frames = snapshot['data_frames']
+    set_gauge('data_frames_retained', data_frames['retained'], worker=worker)
+    set_gauge('data_frame_bytes', data_frames['bytes'], worker=worker)
+    set_gauge('memory_accounting_seconds', snapshot['seconds'], worker=worker)
+
+
+def _megabytes(size:int=None):
+    return 'unknown' if size is None else f'{size / 1024 ** 2:.1f} MB'
+
+
+def log_memory(snapshot:dict=None):
+    node_store = snapshot['node_store']
+    trees, nodes = node_store['trees'], node_store['nodes']
+    fragment_cache = snapshot['fragment_cache']
+    data_frames = snapshot['data_frames']
+    logger.info(f"Memory: RSS {_megabytes(snapshot['resident_bytes'])}; "
+                f"node store {node_store['entries']} nodes, ~{_megabytes(node_store['bytes'])}; "
+                f"trees in use {trees[IN_USE]} ({nodes[IN_USE]} nodes), "
+                f"unreferenced {trees[UNREFERENCED]} ({nodes[UNREFERENCED]} nodes), "
+                f"detached nodes {nodes[DETACHED]}; "
+                f"fragment cache {fragment_cache['packages']} packages, "
+                f"{fragment_cache['fragment_entries'] + fragment_cache['validation_entries']} entries, "
+                f"~{_megabytes(fragment_cache['bytes'])}; "
+                f"data frames {data_frames['retained']}, {_megabytes(data_frames['bytes'])}; "
+                f"took {snapshot['seconds']:.3f} s")
+
+
+def account_memory():
+    snapshot = memory_snapshot()
+    record_memory(snapshot)
+    log_memory(snapshot)
+    return snapshot
+
+
+def _accountant():
+    while True:
+        try:
+            account_memory()
+        except Exception as e:
+            logger.error(e)
+        time.sleep(Config.MEMORY_ACCOUNTING_INTERVAL)
+
+
+def ensure_accountant_running():
+    # Started per process id, as for the upload janitor
+    global _accountant_thread, _accountant_pid
+    if not Config.MEMORY_ACCOUNTING_INTERVAL:
+        return
+    with _lock:
+        if _accountant_pid == os.getpid() and _accountant_thread and _accountant_thread.is_alive():
+            return
+        _accountant_thread = threading.Thread(target=_accountant, name='memory-accounting', daemon=True)
+        _accountant_thread.start()
+        _accountant_pid = os.getpid()
+
+
+def init_memory(app=None):
+    app.before_request(ensure_accountant_running)
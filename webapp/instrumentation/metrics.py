@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: metrics.py
+
+:Synopsis:
+    Counters and histograms of the application's work, served in the
+    Prometheus text format at /eml/metrics. Each uWSGI worker keeps its own
+    values in memory and a background thread writes them, every
+    Config.METRICS_FLUSH_INTERVAL seconds, to a file named for the worker's
+    process id in Config.METRICS_DIR. The endpoint adds up the files of all
+    workers, so whichever worker serves a scrape reports the whole
+    application.
+
+    A worker that starts with the process id of an earlier one carries on
+    from that worker's file, and files of workers that have exited are kept
+    for Config.METRICS_RETENTION seconds, so counters do not go backwards
+    when uWSGI replaces a worker.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+import daiquiri
+from flask import request
+
+from webapp.config import Config
+
+from webapp.instrumentation.timing import request_timings, TOTAL
+
+
+logger = daiquiri.getLogger('metrics: ' + __name__)
+
+PREFIX = 'metadata_eml_'
+METRICS_FILE_PREFIX = 'metrics_'
+METRICS_FILE_SUFFIX = '.json'
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+GAUGE = 'gauge'
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+BYTES_BUCKETS = tuple(10 ** exponent for exponent in range(3, 11))
+NODES_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'requests_total': (COUNTER, 'Requests by endpoint and status', None),
+    'request_duration_seconds': (HISTOGRAM, 'Request latency by endpoint', SECONDS_BUCKETS),
+    'phase_duration_seconds': (HISTOGRAM, 'Time spent in each phase of request handling '
+                               '(loading, saving, parsing, profiling, rendering)', SECONDS_BUCKETS),
+    'document_loads_total': (COUNTER, 'EML documents loaded from JSON', None),
+    'document_load_bytes_total': (COUNTER, 'Bytes of JSON read by document loads', None),
+    'document_saves_total': (COUNTER, 'EML document saves by format and whether the '
+                             'document was written or already had the content', None),
+    'document_save_bytes_total': (COUNTER, 'Bytes of the documents written by saves', None),
+    'tree_nodes': (HISTOGRAM, 'Nodes in each EML tree loaded', NODES_BUCKETS),
+    'upload_bytes': (HISTOGRAM, 'Size of uploaded files by kind', BYTES_BUCKETS),
+    'cache_requests_total': (COUNTER, 'Lookups of the per-package caches by result', None),
+    'cache_hit_ratio': (GAUGE, 'Hits as a fraction of all lookups of each cache', None),
+    'worker_resident_bytes': (GAUGE, 'Resident set size of each worker', None),
+    'node_store_entries': (GAUGE, 'Nodes held in the metapype node store of each worker', None),
+    'node_store_bytes': (GAUGE, 'Estimated bytes of the nodes in the node store of each worker', None),
+    'node_trees': (GAUGE, 'EML trees in the node store of each worker, by whether anything '
+                   'but the store still refers to them', None),
+    'node_tree_nodes': (GAUGE, 'Nodes in the node store of each worker, by the state of their tree; '
+                        'detached nodes were removed from a tree but not from the store', None),
+    'node_tree_bytes': (GAUGE, 'Estimated bytes of the nodes in the node store of each worker, '
+                        'by the state of their tree', None),
+    'fragment_cache_packages': (GAUGE, 'Packages in the fragment cache of each worker', None),
+    'fragment_cache_entries': (GAUGE, 'Entries in the fragment cache of each worker', None),
+    'fragment_cache_bytes': (GAUGE, 'Estimated bytes held by the fragment cache of each worker', None),
+    'data_frames_retained': (GAUGE, 'Data frames read by load_data_table that are still alive '
+                             'in each worker', None),
+    'data_frame_bytes': (GAUGE, 'Bytes of the data frames read by load_data_table that are '
+                         'still alive in each worker', None),
+    'memory_accounting_seconds': (GAUGE, 'Time the last memory accounting of each worker took', None),
+}
+
+_lock = threading.Lock()
+# (name, ((label, value), ...)) -> counter value, or for a histogram
+# [per-bucket counts..., +Inf count, sum]
+_values = {}
+_dirty = False
+_metrics_pid = None
+_flusher_thread = None
+
+
+def _key(name:str=None, labels:dict=None):
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+def _new_histogram(name:str=None):
+    return [0] * (len(METRICS[name][2]) + 1) + [0.0]
+
+
+def inc(name:str=None, amount:float=1, **labels):
+    ensure_flusher_running()
+    global _dirty
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+        _dirty = True
+
+
+def observe(name:str=None, value:float=None, **labels):
+    ensure_flusher_running()
+    global _dirty
+    buckets = METRICS[name][2]
+    key = _key(name, labels)
+    with _lock:
+        histogram = _values.get(key)
+        if histogram is None:
+            histogram = _values[key] = _new_histogram(name)
+        # Counts per bucket; made cumulative when rendered
+        i = 0
+        while i < len(buckets) and value > buckets[i]:
+            i += 1
+        histogram[i] += 1
+        histogram[-1] += value
+        _dirty = True
+
+
+def set_gauge(name:str=None, value:float=None, **labels):
+    ensure_flusher_running()
+    global _dirty
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = value
+        _dirty = True
+
+
+def count_tree_nodes(node=None):
+    nodes = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        stack.extend(node.children)
+    return nodes
+
+
+def record_load(eml_node=None, json_bytes:int=0):
+    inc('document_loads_total')
+    inc('document_load_bytes_total', json_bytes)
+    observe('tree_nodes', count_tree_nodes(eml_node))
+
+
+def record_document_save(format:str=None, filename:str=None, written:bool=True):
+    inc('document_saves_total', format=format, result='written' if written else 'unchanged')
+    if written:
+        try:
+            inc('document_save_bytes_total', os.path.getsize(filename), format=format)
+        except OSError:
+            pass
+
+
+def record_upload(kind:str=None, filename:str=None):
+    try:
+        observe('upload_bytes', os.path.getsize(filename), kind=kind)
+    except OSError:
+        pass
+
+
+def record_cache_lookup(cache:str=None, hit:bool=False):
+    inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def _after_request(response):
+    timings = request_timings()
+    endpoint = request.endpoint or 'none'
+    inc('requests_total', endpoint=endpoint, status=str(response.status_code))
+    for phase, milliseconds, _ in timings:
+        if phase == TOTAL:
+            observe('request_duration_seconds', milliseconds / 1000, endpoint=endpoint, method=request.method)
+        else:
+            observe('phase_duration_seconds', milliseconds / 1000, phase=phase)
+    return response
+
+
+def init_metrics(app=None):
+    app.after_request(_after_request)
+
+
+def get_metrics_filename(pid:int=None):
+    return f'{Config.METRICS_DIR}/{METRICS_FILE_PREFIX}{pid}{METRICS_FILE_SUFFIX}'
+
+
+def _to_entries(values:dict=None):
+    return [[name, dict(labels), value] for (name, labels), value in values.items()]
+
+
+def _from_entries(entries:list=None):
+    values = {}
+    for name, labels, value in entries:
+        if name in METRICS:
+            values[_key(name, labels)] = value
+    return values
+
+
+def read_metrics_file(filename:str=None):
+    try:
+        with open(filename, 'r') as fh:
+            return _from_entries(json.load(fh))
+    except Exception:
+        return {}
+
+
+def flush():
+    '''
+    Writes this worker's values to its metrics file, if they have changed.
+    '''
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        entries = _to_entries(_values)
+        _dirty = False
+    os.makedirs(Config.METRICS_DIR, exist_ok=True)
+    filename = get_metrics_filename(os.getpid())
+    fd, temp_filename = tempfile.mkstemp(dir=Config.METRICS_DIR, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(entries, fh)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(temp_filename)
+        except OSError:
+            pass
+        raise
+
+
+def _flusher():
+    while True:
+        time.sleep(Config.METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            logger.error(e)
+
+
+def ensure_flusher_running():
+    # Started per process id, as for the upload janitor. A forked worker
+    # drops the values it inherited and picks up its own file, if any.
+    global _values, _dirty, _metrics_pid, _flusher_thread
+    if _metrics_pid == os.getpid():
+        return
+    with _lock:
+        if _metrics_pid == os.getpid():
+            return
+        _values = read_metrics_file(get_metrics_filename(os.getpid()))
+        _dirty = False
+        _flusher_thread = threading.Thread(target=_flusher, name='metrics-flush', daemon=True)
+        _flusher_thread.start()
+        _metrics_pid = os.getpid()
+
+
+def is_running(pid:int=None):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # It exists but belongs to someone else
+        pass
+    return True
+
+
+def collect(now:float=None):
+    '''
+    Returns the values of all workers added together, and removes the
+    files of workers that exited more than Config.METRICS_RETENTION
+    seconds ago. The gauges of workers that have exited are left out.
+    '''
+    flush()
+    if now is None:
+        now = time.time()
+    totals = {}
+    try:
+        entries = list(os.scandir(Config.METRICS_DIR))
+    except OSError:
+        entries = []
+    for entry in entries:
+        name = entry.name
+        if not (name.startswith(METRICS_FILE_PREFIX) and name.endswith(METRICS_FILE_SUFFIX)):
+            continue
+        try:
+            pid = int(name[len(METRICS_FILE_PREFIX):-len(METRICS_FILE_SUFFIX)])
+            running = is_running(pid)
+            if not running and now - entry.stat().st_mtime > Config.METRICS_RETENTION:
+                os.remove(entry.path)
+                continue
+        except (ValueError, OSError):
+            continue
+        for key, value in read_metrics_file(entry.path).items():
+            if not running and METRICS[key[0]][0] == GAUGE:
+                continue
+            if isinstance(value, list):
+                total = totals.get(key)
+                if total is None or len(total) != len(value):
+                    totals[key] = list(value)
+                else:
+                    totals[key] = [a + b for a, b in zip(total, value)]
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _cache_hit_ratios(values:dict=None):
+    lookups = {}
+    for (name, labels), value in values.items():
+        if name == 'cache_requests_total':
+            labels = dict(labels)
+            counts = lookups.setdefault(labels.get('cache'), [0, 0])
+            counts[0] += value if labels.get('result') == 'hit' else 0
+            counts[1] += value
+    return {_key('cache_hit_ratio', {'cache': cache}): hits / total
+            for cache, (hits, total) in lookups.items() if total}
+
+
+def _escape(value:str=None):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels_text(labels:tuple=(), extra:tuple=()):
+    labels = labels + extra
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value:float=None):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+def render_metrics(values:dict=None):
+    '''
+    Renders the values in the Prometheus text exposition format.
+    '''
+    values = dict(values)
+    values.update(_cache_hit_ratios(values))
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+        if not series:
+            continue
+        full_name = PREFIX + name
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} {kind}')
+        for labels, value in series:
+            if kind != HISTOGRAM:
+                lines.append(f'{full_name}{_labels_text(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                lines.append(f'{full_name}_bucket{_labels_text(labels, (("le", _number(float(bound))),))} '
+                             f'{cumulative}')
+            lines.append(f'{full_name}_sum{_labels_text(labels)} {_number(value[-1])}')
+            lines.append(f'{full_name}_count{_labels_text(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: profiling.py
+
+:Synopsis:
+    On-demand profiling of individual requests in production. When
+    Config.PROFILING_ENABLED is set, a request is run under cProfile if it
+    carries the profiling token, in the X-Profile-Token header or the
+    _profile query parameter, or if it is made by a user listed in
+    Config.PROFILING_USERS. The profile is written to Config.PROFILING_DIR
+    as a .prof file, loadable with pstats or snakeviz, together with a
+    .txt summary of the most expensive functions, and the response names
+    the file in an X-Profile-File header.
+
+    Only one request per worker process is profiled at a time, and the
+    dumps in the directory also serve as the rate limit shared by all
+    uWSGI workers: no more than Config.PROFILING_MAX_PER_WINDOW profiles
+    are written in any Config.PROFILING_WINDOW seconds. The oldest dumps
+    beyond Config.PROFILING_MAX_FILES are removed.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+
+import daiquiri
+from flask import g, request
+from flask_login import current_user
+
+from webapp.config import Config
+
+
+logger = daiquiri.getLogger('profiling: ' + __name__)
+
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+PROFILE_TOKEN_PARAMETER = '_profile'
+PROFILE_FILE_HEADER = 'X-Profile-File'
+PROFILE_SUFFIX = '.prof'
+SUMMARY_SUFFIX = '.txt'
+SUMMARY_LINES = 60
+
+# cProfile can only have one profiler active per process
+_profiler_lock = threading.Lock()
+
+
+def has_profiling_token():
+    token = Config.PROFILING_TOKEN
+    if not token:
+        return False
+    supplied = request.headers.get(PROFILE_TOKEN_HEADER) or request.args.get(PROFILE_TOKEN_PARAMETER)
+    return bool(supplied) and hmac.compare_digest(supplied, token)
+
+
+def get_profiled_username():
+    try:
+        if current_user.is_authenticated:
+            return current_user.get_username()
+    except Exception:
+        pass
+    return None
+
+
+def is_profiling_requested():
+    if not Config.PROFILING_ENABLED:
+        return False
+    if has_profiling_token():
+        return True
+    username = get_profiled_username()
+    return username is not None and username in Config.PROFILING_USERS
+
+
+def list_dumps(profiling_dir:str=None):
+    '''
+    Returns (mtime, path) of the profile dumps in the directory, oldest
+    first.
+    '''
+    dumps = []
+    try:
+        entries = list(os.scandir(profiling_dir))
+    except OSError:
+        return dumps
+    for entry in entries:
+        if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+            try:
+                dumps.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                pass
+    dumps.sort()
+    return dumps
+
+
+def is_rate_limited(profiling_dir:str=None, now:float=None):
+    if now is None:
+        now = time.time()
+    recent = [mtime for mtime, _ in list_dumps(profiling_dir) if now - mtime < Config.PROFILING_WINDOW]
+    return len(recent) >= Config.PROFILING_MAX_PER_WINDOW
+
+
+def remove_old_dumps(profiling_dir:str=None):
+    dumps = list_dumps(profiling_dir)
+    for _, path in dumps[:max(0, len(dumps) - Config.PROFILING_MAX_FILES)]:
+        for filename in (path, path[:-len(PROFILE_SUFFIX)] + SUMMARY_SUFFIX):
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+
+def get_dump_basename(endpoint:str=None, username:str=None):
+    # Unique, as a process profiles one request at a time
+    now = time.time()
+    timestamp = time.strftime('%Y%m%dT%H%M%S', time.localtime(now)) + f'.{int(now * 1000) % 1000:03d}'
+    name = f"{timestamp}_{endpoint or 'none'}_{username or 'anonymous'}_{os.getpid()}"
+    return re.sub(r'[^A-Za-z0-9._-]', '_', name)
+
+
+def write_dump(profiler:cProfile.Profile=None, elapsed:float=None, status:str=None):
+    os.makedirs(Config.PROFILING_DIR, exist_ok=True)
+    basename = get_dump_basename(request.endpoint, get_profiled_username())
+    path = f'{Config.PROFILING_DIR}/{basename}'
+    profiler.dump_stats(path + PROFILE_SUFFIX)
+
+    summary = io.StringIO()
+    summary.write(f'{request.method} {request.path} {status} in {elapsed:.3f} seconds\n\n')
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    with open(path + SUMMARY_SUFFIX, 'w') as fh:
+        fh.write(summary.getvalue())
+
+    remove_old_dumps(Config.PROFILING_DIR)
+    logger.info(f'Profiled {request.method} {request.path} in {elapsed:.3f} seconds: {basename}{PROFILE_SUFFIX}')
+    return basename + PROFILE_SUFFIX
+
+
+def _before_request():
+    if not is_profiling_requested():
+        return
+    if is_rate_limited(Config.PROFILING_DIR):
+        logger.warning(f'Profiling of {request.path} skipped: rate limit reached')
+        return
+    if not _profiler_lock.acquire(blocking=False):
+        logger.warning(f'Profiling of {request.path} skipped: another request is being profiled')
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except Exception as e:
+        # e.g., another profiling tool is active in the process
+        _profiler_lock.release()
+        logger.error(e)
+        return
+    g.profiler = profiler
+    g.profile_start = time.perf_counter()
+
+
+def _finish_profile(status:str=None):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return None
+    try:
+        profiler.disable()
+        elapsed = time.perf_counter() - g.pop('profile_start')
+        return write_dump(profiler, elapsed, status)
+    except Exception as e:
+        logger.error(e)
+        return None
+    finally:
+        _profiler_lock.release()
+
+
+def _after_request(response):
+    dump_filename = _finish_profile(response.status)
+    if dump_filename:
+        response.headers[PROFILE_FILE_HEADER] = dump_filename
+    return response
+
+
+def _teardown_request(exception=None):
+    # Only still profiling if the request failed before after_request
+    _finish_profile('failed' if exception else None)
+
+
+def init_profiling(app=None):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
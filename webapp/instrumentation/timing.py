@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: timing.py
+
+:Synopsis:
+    Per-request timing broken down by phase. Code marks a phase with the
+    timed() decorator or the phase_timer() context manager; the durations
+    are accumulated on flask.g for the current request and, when the
+    request ends, sent back in a Server-Timing header and logged as one
+    line with structured fields. Template rendering is timed through
+    Flask's template signals.
+
+    Phases may nest (e.g. parse_json runs inside load_eml), so they do not
+    add up to the total.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import contextlib
+import functools
+import time
+
+import daiquiri
+from flask import (
+    before_render_template, g, has_request_context, request, template_rendered
+)
+
+
+logger = daiquiri.getLogger('timing: ' + __name__)
+
+TOTAL = 'total'
+RENDER = 'render'
+
+
+def add_phase_time(phase:str=None, seconds:float=0.0):
+    if has_request_context():
+        timings = g.get('phase_timings')
+        if timings is not None:
+            entry = timings.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+
+@contextlib.contextmanager
+def phase_timer(phase:str=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_time(phase, time.perf_counter() - start)
+
+
+def timed(phase:str=None):
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with phase_timer(phase):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_timings():
+    '''
+    Returns the phase timings of the current request as a list of
+    (phase, milliseconds, count), with the request total last.
+    '''
+    timings = [(phase, round(seconds * 1000, 1), count)
+               for phase, (seconds, count) in g.get('phase_timings', {}).items()]
+    start = g.get('request_start')
+    if start is not None:
+        timings.append((TOTAL, round((time.perf_counter() - start) * 1000, 1), 1))
+    return timings
+
+
+def server_timing_header(timings:list=None):
+    return ', '.join(f'{phase};dur={milliseconds}' for phase, milliseconds, _ in timings)
+
+
+def _before_request():
+    g.request_start = time.perf_counter()
+    g.phase_timings = {}
+
+
+def _after_request(response):
+    timings = request_timings()
+    if timings:
+        response.headers['Server-Timing'] = server_timing_header(timings)
+        # Logged as keyword fields, which daiquiri keeps as record extras
+        fields = {f'{phase}_ms': milliseconds for phase, milliseconds, _ in timings}
+        logger.info(f'{request.method} {request.path} {response.status_code}',
+                    endpoint=request.endpoint, **fields)
+    return response
+
+
+def _before_render_template(sender, template, context, **extra):
+    if has_request_context():
+        g.render_start = time.perf_counter()
+
+
+def _template_rendered(sender, template, context, **extra):
+    if has_request_context() and g.get('render_start') is not None:
+        add_phase_time(RENDER, time.perf_counter() - g.pop('render_start'))
+
+
+def init_timing(app=None):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
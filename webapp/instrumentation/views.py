@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""":Mod: views
+
+:Synopsis:
+    The metrics endpoint scraped by Prometheus.
+
+:Author:
+    costa
+
+:Created:
+    10/19/26
+"""
+import daiquiri
+from flask import Blueprint, abort, request, Response
+
+from webapp.config import Config
+
+from webapp.instrumentation.metrics import collect, render_metrics
+
+
+logger = daiquiri.getLogger('views: ' + __name__)
+instrumentation = Blueprint('instrumentation', __name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@instrumentation.route('/metrics', methods=['GET'])
+def metrics():
+    # Not behind login, so that Prometheus can scrape it; only served to
+    # the configured addresses
+    if request.remote_addr not in Config.METRICS_ALLOWED_ADDRESSES:
+        abort(404)
+    return Response(render_metrics(collect()), content_type=PROMETHEUS_CONTENT_TYPE)